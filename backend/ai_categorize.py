@@ -0,0 +1,207 @@
+# ai_categorize.py
+# Second-pass categorization of the merchants the keyword rules missed.
+#
+# During ingestion, every record that would be stored as Miscellaneous/Low is
+# reduced to a merchant key (the UPI merchant, lowercased, without digits).
+# Distinct keys are looked up in the shared merchant_categories table first,
+# and only unknown ones are sent to the model, several per prompt, with a
+# bounded number of calls in flight and retries with exponential backoff.
+# Answers are saved to the table, so each merchant is classified once across
+# all users and uploads. AI guesses are stored with Medium confidence, which
+# keeps them in the review queue for the user to confirm.
+#
+# AICategorizer accepts any model object with a generate_content(prompt)
+# method returning something with a .text attribute, and any blocking
+# pymongo-style collection, so it can be exercised with fakes.
+import datetime
+import json
+import logging
+import os
+import random
+import re
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from dedup import DUPLICATE_KEY_ERROR
+from categories import MERCHANT_CATEGORY_MAP, extract_merchant_from_upi
+
+AI_CATEGORIZATION = os.environ.get("AI_CATEGORIZATION", "1") == "1"
+AI_MODEL_NAME = os.environ.get("AI_MODEL_NAME", "models/gemini-2.5-flash")
+# Merchants sent to the model in one prompt
+AI_BATCH_SIZE = int(os.environ.get("AI_BATCH_SIZE", 50))
+# Model calls in flight at once, per ingestion worker
+AI_CONCURRENCY = int(os.environ.get("AI_CONCURRENCY", 4))
+AI_MAX_RETRIES = int(os.environ.get("AI_MAX_RETRIES", 3))
+AI_BACKOFF_SECONDS = float(os.environ.get("AI_BACKOFF_SECONDS", 1.0))
+# Merchant categories each worker keeps in memory, least recently used dropped first
+AI_MEMO_MAX_ENTRIES = int(os.environ.get("AI_MEMO_MAX_ENTRIES", 10000))
+
+logger = logging.getLogger(__name__)
+
+MERCHANT_CATEGORY_COLLECTION = 'merchant_categories'
+FALLBACK_CATEGORY = 'Miscellaneous'
+AI_CATEGORIES = sorted(set(MERCHANT_CATEGORY_MAP.values())) + [FALLBACK_CATEGORY]
+MAX_MERCHANT_KEY_LENGTH = 100
+
+NON_WORD = re.compile(r"[\W\d_]+")
+
+
+# --- Helper function to reduce a description to a cacheable merchant key ---
+def merchant_key(description):
+    # Reference numbers and dates make otherwise equal merchants look distinct
+    merchant = extract_merchant_from_upi(str(description))
+    return NON_WORD.sub(' ', merchant.lower()).strip()[:MAX_MERCHANT_KEY_LENGTH]
+
+
+def new_ai_stats():
+    return {
+        'merchants': 0,
+        'cache_hits': 0,
+        'cache_misses': 0,
+        'api_calls': 0,
+        'api_seconds': 0.0,
+        'api_failures': 0,
+        'classified': 0,
+    }
+
+
+def build_prompt(merchants):
+    return f"""
+    You categorize merchants from bank statements for a personal finance app.
+    Allowed categories: {json.dumps(AI_CATEGORIES)}
+    For each merchant below, pick the single best category from the allowed list. Use "{FALLBACK_CATEGORY}" if unsure.
+    Reply with only a JSON object mapping each merchant, exactly as given, to its category.
+
+    Merchants:
+    {json.dumps(merchants)}
+    """
+
+
+# --- Helper function to read the model's answer, keeping only valid categories ---
+def parse_response(text, merchants):
+    text = text.strip()
+    # Models like to wrap JSON in a markdown code fence
+    if text.startswith('```'):
+        text = text.strip('`').removeprefix('json')
+    answer = json.loads(text)
+    wanted = set(merchants)
+    return {merchant: category for merchant, category in answer.items() if merchant in wanted and category in AI_CATEGORIES}
+
+
+class AICategorizer:
+    """Classifies merchant keys with a model, behind a persistent cache."""
+
+    def __init__(self, model, collection, batch_size=AI_BATCH_SIZE, concurrency=AI_CONCURRENCY,
+                 max_retries=AI_MAX_RETRIES, backoff=AI_BACKOFF_SECONDS, memo_size=AI_MEMO_MAX_ENTRIES):
+        self.model = model
+        self.collection = collection
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.memo_size = memo_size
+        self.known = OrderedDict()  # in-process LRU copy of the table entries seen so far
+
+    def classify_batch(self, merchants):
+        calls = 0
+        seconds = 0.0
+        for attempt in range(self.max_retries + 1):
+            calls += 1
+            start = time.perf_counter()
+            try:
+                response = self.model.generate_content(build_prompt(merchants))
+                seconds += time.perf_counter() - start
+                return parse_response(response.text, merchants), calls, True, seconds
+            except Exception as e:
+                seconds += time.perf_counter() - start
+                if attempt == self.max_retries:
+                    logger.warning("AI categorization failed", extra={'merchants': len(merchants), 'calls': calls, 'error': str(e)})
+                    return {}, calls, False, seconds
+                # Exponential backoff with jitter, so parallel workers spread out
+                time.sleep(self.backoff * 2 ** attempt * random.uniform(0.5, 1.5))
+
+    def save(self, categories):
+        now = datetime.datetime.now(datetime.timezone.utc)
+        ops = [
+            UpdateOne(
+                {'merchant': merchant},
+                {'$setOnInsert': {'category': category, 'model': AI_MODEL_NAME, 'created_at': now}},
+                upsert=True,
+            )
+            for merchant, category in categories.items()
+        ]
+        try:
+            self.collection.bulk_write(ops, ordered=False)
+        except BulkWriteError as e:
+            # Another worker saved the same merchant first
+            if any(error['code'] != DUPLICATE_KEY_ERROR for error in e.details['writeErrors']):
+                raise
+
+    def remember(self, categories):
+        for merchant, category in categories.items():
+            self.known[merchant] = category
+            self.known.move_to_end(merchant)
+        while len(self.known) > self.memo_size:
+            self.known.popitem(last=False)
+
+    def categorize(self, merchants):
+        stats = new_ai_stats()
+        wanted = {merchant for merchant in merchants if merchant}
+        stats['merchants'] = len(wanted)
+        found = {merchant: self.known[merchant] for merchant in wanted if merchant in self.known}
+        for merchant in found:
+            self.known.move_to_end(merchant)
+
+        missing = wanted - found.keys()
+        if missing:
+            for doc in self.collection.find({'merchant': {'$in': list(missing)}}, {'merchant': 1, 'category': 1}):
+                found[doc['merchant']] = doc['category']
+        stats['cache_hits'] = len(found)
+
+        missing = sorted(wanted - found.keys())
+        stats['cache_misses'] = len(missing)
+        if missing:
+            batches = [missing[start:start + self.batch_size] for start in range(0, len(missing), self.batch_size)]
+            classified = {}
+            with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+                for answer, calls, ok, seconds in pool.map(self.classify_batch, batches):
+                    classified.update(answer)
+                    stats['api_calls'] += calls
+                    stats['api_seconds'] += seconds
+                    stats['api_failures'] += calls - ok
+            if classified:
+                self.save(classified)
+            found.update(classified)
+            stats['classified'] = len(classified)
+
+        self.remember(found)
+        return found, stats
+
+    # --- Apply the model's categories to records the keyword rules missed ---
+    def categorize_records(self, records):
+        unmatched = [record for record in records if record['conf'] == 'Low']
+        keys = [merchant_key(record['desc']) for record in unmatched]
+        categories, stats = self.categorize(keys)
+        for record, key in zip(unmatched, keys):
+            category = categories.get(key, FALLBACK_CATEGORY)
+            # "Don't know" answers are cached too, but the row stays Low
+            if category != FALLBACK_CATEGORY:
+                record['cat'] = category
+                record['conf'] = 'Medium'
+        return stats
+
+
+def create_model():
+    # Imported here so processes that never call the model skip the heavy import
+    import google.generativeai as genai
+
+    genai.configure(api_key=os.environ.get("GOOGLE_API_KEY"))
+    return genai.GenerativeModel(AI_MODEL_NAME)
+
+
+def ai_enabled():
+    return AI_CATEGORIZATION and bool(os.environ.get("GOOGLE_API_KEY"))
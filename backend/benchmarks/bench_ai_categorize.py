@@ -0,0 +1,147 @@
+# bench_ai_categorize.py
+# Exercises the AI categorization stage with a fake model and reports, per
+# simulated upload, how many merchants hit the cache and how many model
+# calls were made.
+#
+# The fake model answers from a fixed merchant -> category table after a
+# configurable delay and fails a share of calls, so batching, concurrency
+# and retry/backoff are all in play. Results are checked against the table.
+# By default the merchant table lives in memory; pass --mongo to use a
+# scratch database at MONGO_URI instead.
+#
+# Run from the backend folder:  python benchmarks/bench_ai_categorize.py --uploads 5
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai_categorize import AI_CATEGORIES, FALLBACK_CATEGORY, AICategorizer, merchant_key
+from categories import categorize_many
+
+MERCHANTS_JSON = re.compile(r"Merchants:\s*(\[.*\])", re.S)
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    """Stands in for the Gemini model: same call shape, canned answers."""
+
+    def __init__(self, answers, latency, failure_rate, rng):
+        self.answers = answers
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.rng = rng
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def generate_content(self, prompt):
+        with self.lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            fail = self.rng.random() < self.failure_rate
+        try:
+            time.sleep(self.latency)
+            if fail:
+                raise RuntimeError("429 Resource has been exhausted")
+            merchants = json.loads(MERCHANTS_JSON.search(prompt).group(1))
+            answer = {merchant: self.answers.get(merchant, FALLBACK_CATEGORY) for merchant in merchants}
+            return FakeResponse("```json\n" + json.dumps(answer) + "\n```")
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+class MemoryCollection:
+    """Just enough of a pymongo collection for the merchant table."""
+
+    def __init__(self):
+        self.docs = {}
+
+    def find(self, query, projection=None):
+        return [self.docs[m] for m in query['merchant']['$in'] if m in self.docs]
+
+    def bulk_write(self, ops, ordered=True):
+        for op in ops:
+            merchant = op._filter['merchant']
+            self.docs.setdefault(merchant, {'merchant': merchant, **op._doc['$setOnInsert']})
+
+
+def make_upload(rng, merchant_pool, rows):
+    records = []
+    for i in range(rows):
+        merchant = rng.choice(merchant_pool)
+        records.append({'desc': f"UPI/{rng.randint(10**9, 10**10)}/pay/{merchant}{rng.randint(1, 99)}@okbank"})
+    categories, confidences = categorize_many([r['desc'] for r in records])
+    for record, category, confidence in zip(records, categories, confidences):
+        record['cat'], record['conf'] = category, confidence
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uploads", type=int, default=5)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--merchants", type=int, default=2000, help="distinct unknown merchants across all uploads")
+    parser.add_argument("--new-per-upload", type=int, default=400, help="merchants first seen in each upload")
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per fake model call")
+    parser.add_argument("--failure-rate", type=float, default=0.1)
+    parser.add_argument("--mongo", action="store_true")
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    names = [f"shop {chr(97 + i % 26)}{chr(97 + i // 26 % 26)}{chr(97 + i // 676 % 26)}" for i in range(args.merchants)]
+    answers = {name: rng.choice(AI_CATEGORIES) for name in names}
+
+    if args.mongo:
+        from pymongo import MongoClient
+        from database import require_mongo_uri
+
+        client = MongoClient(require_mongo_uri())
+        collection = client["bench_ai_categorize"]["merchant_categories"]
+        collection.drop()
+        collection.create_index("merchant", unique=True)
+    else:
+        collection = MemoryCollection()
+
+    model = FakeModel(answers, args.latency, args.failure_rate, rng)
+    # Short backoff so the benchmark doesn't mostly sleep
+    categorizer = AICategorizer(model, collection, backoff=0.05)
+
+    mismatches = 0
+    for upload in range(args.uploads):
+        pool = names[:min(len(names), (upload + 1) * args.new_per_upload)]
+        records = make_upload(rng, pool, args.rows)
+        calls_before = model.calls
+        start = time.perf_counter()
+        stats = categorizer.categorize_records(records)
+        elapsed = time.perf_counter() - start
+        for record in records:
+            expected = answers.get(merchant_key(record['desc']))
+            if record['conf'] == 'Medium' and record['cat'] != expected:
+                mismatches += 1
+
+        lookups = stats['cache_hits'] + stats['cache_misses']
+        print(f"upload {upload + 1}: rows={len(records)} merchants={stats['merchants']} "
+              f"cache_hit_rate={stats['cache_hits'] / lookups if lookups else 0:.0%} "
+              f"api_calls={stats['api_calls']} (model saw {model.calls - calls_before}) "
+              f"failures={stats['api_failures']} classified={stats['classified']} time={elapsed:.2f}s")
+
+    print(f"max model calls in flight: {model.max_in_flight}  wrong categories: {mismatches}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
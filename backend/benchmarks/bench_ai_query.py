@@ -0,0 +1,204 @@
+# bench_ai_query.py
+# Compares the prompts /analytics/query sends to the model: the old context
+# of the last 20 transactions, the same context widened to every row in the
+# question's date range (what the old approach would need to answer
+# correctly), and the planned context of aggregates plus a small sample.
+#
+# For each question it reports the prompt size in tokens and the end-to-end
+# latency (database work + model call), and the latency of asking again,
+# which the planned path answers from the cache. By default the model is a
+# fake whose latency grows with the prompt length; pass --gemini to call the
+# real model and count tokens with it (needs GOOGLE_API_KEY).
+#
+# Needs a real mongod:
+#   MONGO_URI=mongodb://localhost:27017 python benchmarks/bench_ai_query.py
+import argparse
+import asyncio
+import datetime
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import AsyncMongoClient
+
+from cache import LRUCache
+from database import require_mongo_uri
+from indexes import ensure_indexes
+from main import build_transactions_query
+from query_planner import build_prompt, normalize_question, plan_question, run_plan
+from rollups import rebuild_rollups
+from schema import as_float, to_amount
+
+ACCOUNT_ID = "bench-ai-query-account"
+MERCHANTS = {
+    "swiggy": "Food", "zomato": "Food", "blinkit": "Groceries", "zepto": "Groceries",
+    "uber": "Transport", "ola": "Transport", "amazon": "Shopping", "myntra": "Shopping",
+    "netflix": "Bills & Subscriptions", "airtel": "Bills & Subscriptions", "irctc": "Travel",
+}
+QUESTIONS = [
+    "How much did I spend on Swiggy last month?",
+    "What was my total grocery spending this year?",
+    "How much income did I receive in the last 3 months?",
+    "Which category did I spend the most on in 2025?",
+    "How much did I pay to ramesh kumar since January?",
+    "What were my biggest expenses this week?",
+]
+LEGACY_CONTEXT_ROWS = 20
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    """Answers after a delay that grows with the prompt, like a hosted model."""
+
+    def __init__(self, base_latency, seconds_per_1k_tokens):
+        self.base_latency = base_latency
+        self.seconds_per_1k_tokens = seconds_per_1k_tokens
+
+    async def generate_content_async(self, prompt):
+        await asyncio.sleep(self.base_latency + estimate_tokens(prompt) / 1000 * self.seconds_per_1k_tokens)
+        return FakeResponse("ok")
+
+
+def estimate_tokens(prompt):
+    # Roughly four characters per token for English and numbers
+    return len(prompt) // 4
+
+
+async def seed(collection, rows, today):
+    rng = random.Random(42)
+    payees = [f"UPI/{{}}/pay/{merchant}@ybl" for merchant in MERCHANTS] + ["UPI/{}/pay/ramesh kumar@okaxis"]
+    docs = []
+    for i in range(rows):
+        day = datetime.datetime.combine(today, datetime.time()) - datetime.timedelta(days=rng.randint(0, 730))
+        description = rng.choice(payees).format(rng.randint(10**9, 10**10))
+        merchant = description.split('/')[-1].split('@')[0]
+        docs.append({
+            "acct": ACCOUNT_ID,
+            "uid": "placeholder_user",
+            "date": day,
+            "amt": to_amount(-round(rng.uniform(50, 3000), 2)),
+            "desc": description,
+            "cat": MERCHANTS.get(merchant, "Miscellaneous"),
+            "conf": "High",
+        })
+    # A salary on the first of every month
+    for months in range(24):
+        index = today.year * 12 + today.month - 1 - months
+        docs.append({
+            "acct": ACCOUNT_ID, "uid": "placeholder_user",
+            "date": datetime.datetime(index // 12, index % 12 + 1, 1), "amt": to_amount(85000.0),
+            "desc": "NEFT/SALARY/ACME CORP", "cat": "Miscellaneous", "conf": "Low",
+        })
+    await collection.insert_many(docs)
+
+
+# --- The context the endpoint used to send: the latest rows as text ---
+def legacy_prompt(question, transactions):
+    transaction_context = ""
+    for t in transactions:
+        transaction_context += f"- Date: {t['date'].isoformat()}, Description: {t.get('desc', 'N/A')}, Amount: {as_float(t.get('amt')):.2f}, Category: {t.get('cat', 'N/A')}\n"
+    return f"""
+    You are a helpful personal finance assistant. Analyze the following list of transactions and answer the user's question based ONLY on this data. Do not make up information. Provide a concise, helpful answer.
+
+    Here are the user's transactions:
+    {transaction_context}
+
+    User's Question: "{question}"
+    """
+
+
+async def run_legacy(db, model, question, plan, widened):
+    start = time.perf_counter()
+    if widened:
+        query = build_transactions_query(ACCOUNT_ID, plan['start_date'], plan['end_date'])
+        transactions = await db["transactions"].find(query, sort=[("date", -1)]).to_list()
+    else:
+        query = build_transactions_query(ACCOUNT_ID)
+        transactions = await db["transactions"].find(query, sort=[("date", -1)], limit=LEGACY_CONTEXT_ROWS).to_list()
+    prompt = legacy_prompt(question, transactions)
+    await model.generate_content_async(prompt)
+    return prompt, time.perf_counter() - start
+
+
+async def run_planned(db, model, cache, question, today):
+    start = time.perf_counter()
+    plan = plan_question(question, today)
+    prompts = []
+
+    async def answer():
+        base_query = build_transactions_query(ACCOUNT_ID, plan['start_date'], plan['end_date'], plan['category'])
+        result = await run_plan(db, ACCOUNT_ID, plan, base_query)
+        prompts.append(build_prompt(question, plan, result))
+        response = await model.generate_content_async(prompts[-1])
+        return {"answer": response.text, "source": result['source']}
+
+    response = await cache.get_or_compute("ai_query", ACCOUNT_ID, {'question': normalize_question(question), 'plan': plan}, answer)
+    return (prompts[0] if prompts else None), response, time.perf_counter() - start
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", default="finance_tracker_bench_ai_query")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--base-latency", type=float, default=0.4, help="fake model seconds per call")
+    parser.add_argument("--per-1k-tokens", type=float, default=0.05, help="fake model seconds per 1000 prompt tokens")
+    parser.add_argument("--gemini", action="store_true", help="call the real model")
+    args = parser.parse_args()
+
+    count_tokens = estimate_tokens
+    if args.gemini:
+        from ai_categorize import create_model
+
+        model = create_model()
+        count_tokens = lambda prompt: model.count_tokens(prompt).total_tokens
+    else:
+        model = FakeModel(args.base_latency, args.per_1k_tokens)
+
+    today = datetime.date.today()
+    client = AsyncMongoClient(require_mongo_uri())
+    db = client[args.db]
+    await db.drop_collection("transactions")
+    await db.drop_collection("rollups")
+    await seed(db["transactions"], args.rows, today)
+    await ensure_indexes(db)
+    await rebuild_rollups(db)
+    cache = LRUCache()
+
+    results = {"last 20 rows": [], "all rows in range": [], "planned": [], "planned (cached)": []}
+    for question in QUESTIONS:
+        plan = plan_question(question, today)
+        legacy, legacy_time = await run_legacy(db, model, question, plan, widened=False)
+        widened, widened_time = await run_legacy(db, model, question, plan, widened=True)
+        planned, response, planned_time = await run_planned(db, model, cache, question, today)
+        _, _, cached_time = await run_planned(db, model, cache, question, today)
+
+        rows = [
+            ("last 20 rows", count_tokens(legacy), legacy_time),
+            ("all rows in range", count_tokens(widened), widened_time),
+            ("planned", count_tokens(planned), planned_time),
+            ("planned (cached)", 0, cached_time),
+        ]
+        print(f"\n{question}\n  plan: {plan}  source={response['source']}")
+        for label, tokens, elapsed in rows:
+            results[label].append((tokens, elapsed))
+            print(f"  {label:<18} prompt_tokens={tokens:>7}  latency={elapsed * 1000:8.1f} ms")
+
+    print("\nmedian over all questions:")
+    for label, samples in results.items():
+        print(f"  {label:<18} prompt_tokens={statistics.median(t for t, _ in samples):>9.0f}  "
+              f"latency={statistics.median(e for _, e in samples) * 1000:8.1f} ms")
+
+    await client.drop_database(args.db)
+    await client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,86 @@
+# bench_bulk_category.py
+# Clearing a review queue one PATCH at a time versus one bulk request.
+#
+# Start the API first (against a local mongod via MONGO_URI, with
+# AI_CATEGORIZATION=0 so unknown merchants stay in the review queue), then run:
+#   python benchmarks/bench_bulk_category.py --url http://127.0.0.1:8000 --items 2000
+#
+# The same statement is uploaded to two fresh accounts. The first account's
+# review queue is corrected with one PATCH /transactions/{id} per item, the
+# second's with a single POST /transactions/bulk_update/, and the script
+# prints the requests made and the wall time of each. A last bulk request
+# with apply_to_merchant shows the cost of turning a correction into a rule.
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_upload import write_statement
+
+
+async def upload(client, path, account_id):
+    with open(path, "rb") as f:
+        result = (await client.post("/uploadfile/", files={"file": ("statement.csv", f)}, data={"account_id": account_id})).json()
+    while True:
+        job = (await client.get(f"/uploads/{result['job_id']}")).json()
+        if job["status"] in ("done", "failed"):
+            return job
+        await asyncio.sleep(0.5)
+
+
+async def review_queue(client, account_id, items):
+    queue = (await client.get("/transactions/review/", params={"account_id": account_id})).json()
+    return queue[:items]
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--items", type=int, default=2000)
+    args = parser.parse_args()
+
+    run = uuid.uuid4().hex[:8]
+    single_account, bulk_account = f"bench-single-{run}", f"bench-bulk-{run}"
+    async with httpx.AsyncClient(base_url=args.url, timeout=300) as client:
+        with tempfile.TemporaryDirectory() as tmp:
+            statement = os.path.join(tmp, "statement.csv")
+            write_statement(statement, args.rows)
+            for account_id in (single_account, bulk_account):
+                job = await upload(client, statement, account_id)
+                print(f"{account_id}: status={job['status']} rows_inserted={job['rows_inserted']}")
+
+        queue = await review_queue(client, single_account, args.items)
+        start = time.perf_counter()
+        for doc in queue:
+            response = await client.patch(f"/transactions/{doc['_id']}", json={"category": "Groceries"})
+            response.raise_for_status()
+        single_time = time.perf_counter() - start
+        print(f"one PATCH per item   items={len(queue):<6} requests={len(queue):<6} time={single_time * 1000:10.1f} ms")
+
+        queue = await review_queue(client, bulk_account, args.items)
+        start = time.perf_counter()
+        result = (await client.post("/transactions/bulk_update/", json={
+            "updates": [{"id": doc["_id"], "category": "Groceries"} for doc in queue],
+        })).json()
+        bulk_time = time.perf_counter() - start
+        print(f"bulk update          items={result['updated']:<6} requests={1:<6} time={bulk_time * 1000:10.1f} ms")
+
+        queue = await review_queue(client, bulk_account, 1)
+        if queue:
+            start = time.perf_counter()
+            result = (await client.post("/transactions/bulk_update/", json={
+                "updates": [{"id": queue[0]["_id"], "category": "Bills & Subscriptions", "apply_to_merchant": True}],
+            })).json()
+            print(f"rule from one item   rules={result['rules']} time={(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
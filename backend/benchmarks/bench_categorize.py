@@ -0,0 +1,90 @@
+# bench_categorize.py
+# Times the compiled MerchantCategorizer against the original per-rule loop
+# and checks that both give identical results.
+#
+# Run from the backend folder:  python benchmarks/bench_categorize.py
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from categories import MERCHANT_CATEGORY_MAP, MerchantCategorizer, extract_merchant_from_upi
+
+MERCHANTS = ["swiggy", "Zomato", "UBER", "amazon pay", "netflix.com", "IRCTC", "local kirana",
+             "rent", "salary", "airtel", "blinkit", "atm withdrawal", "purple style labs"]
+
+
+def reference_categorize(description, compiled_rules):
+    # The original implementation: one search per rule, in map order. The
+    # patterns are precompiled so re's own cache does not skew the timing.
+    lower_description = extract_merchant_from_upi(description).lower()
+    for regex, category in compiled_rules:
+        if regex.search(lower_description):
+            return category, "High"
+    return "Miscellaneous", "Low"
+
+
+def make_descriptions(n, rng):
+    descriptions = []
+    for i in range(n):
+        merchant = rng.choice(MERCHANTS)
+        if rng.random() < 0.1:
+            merchant = f"{merchant} {rng.choice(MERCHANTS)} merchant{rng.randint(0, 1500)}"
+        if rng.random() < 0.5:
+            descriptions.append(f"UPI/{rng.randint(10**8, 10**9)}/payment/{merchant}@ybl")
+        else:
+            descriptions.append(f"POS {merchant} {rng.randint(1, 999)}")
+    return pd.Series(descriptions)
+
+
+def make_rules(extra, rng):
+    # Pads the real rule table with synthetic merchants to mimic a large map
+    rules = dict(MERCHANT_CATEGORY_MAP)
+    for i in range(extra):
+        rules[rf"\b(?:merchant{i}|store{i})\b"] = f"Category {i % 20}"
+    # Plus a couple of free-form patterns that cannot be indexed as keywords
+    rules[r"atm\s+withdrawal"] = "Cash"
+    rules[r"^rent\b"] = "Housing"
+    return rules
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--extra-rules", type=int, default=1000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    rules = make_rules(args.extra_rules, rng)
+    engine = MerchantCategorizer(rules)
+    compiled_rules = [(re.compile(pattern), category) for pattern, category in rules.items()]
+    print(f"rules: {len(rules)}")
+
+    for n in (int(size) for size in args.sizes.split(",")):
+        descriptions = make_descriptions(n, rng)
+
+        start = time.perf_counter()
+        categories, confidences = engine.categorize_many(descriptions)
+        compiled_time = time.perf_counter() - start
+
+        # The reference loop is only timed on a sample at larger sizes, it is far too slow otherwise
+        sample = descriptions.iloc[:min(n, 5000)]
+        start = time.perf_counter()
+        expected = [reference_categorize(d, compiled_rules) for d in sample]
+        reference_time = (time.perf_counter() - start) * n / len(sample)
+
+        for i, (category, confidence) in enumerate(expected):
+            assert (categories[i], confidences[i]) == (category, confidence), (sample.iloc[i], categories[i], category)
+
+        print(f"{n:>9} rows  compiled={compiled_time:8.3f}s  reference~{reference_time:9.3f}s  "
+              f"speedup~{reference_time / compiled_time:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# bench_dates.py
+# Times normalize_dates against the per-row parse_date apply it replaces, for
+# a range of date layouts. tests/test_dates.py checks that both agree.
+#
+# Run from the backend folder:  python benchmarks/bench_dates.py --rows 200000
+import argparse
+import datetime
+import os
+import random
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ingest import normalize_dates, parse_date
+
+LAYOUTS = {
+    "dd/mm/yyyy": lambda d: d.strftime("%d/%m/%Y"),
+    "dd-mm-yy": lambda d: d.strftime("%d-%m-%y"),
+    "dd Mon yyyy": lambda d: d.strftime("%d %b %Y"),
+    "dd/mm/yyyy hh:mm": lambda d: d.strftime("%d/%m/%Y %H:%M"),
+    "yyyy-mm-dd": lambda d: d.strftime("%Y-%m-%d"),
+    "yyyy-mm-ddThh:mm:ss": lambda d: d.strftime("%Y-%m-%dT%H:%M:%S"),
+    "mm/dd/yyyy": lambda d: d.strftime("%m/%d/%Y"),
+    "trailing comma": lambda d: d.strftime("%d/%m/%Y,"),
+}
+
+
+def make_dates(rows, layout, rng):
+    start = datetime.datetime(2019, 1, 1)
+    values = [LAYOUTS[layout](start + datetime.timedelta(days=rng.randint(0, 5 * 365), minutes=rng.randint(0, 1440)))
+              for _ in range(rows)]
+    # Sprinkle in blanks, missing values and junk the way real exports do
+    for i in rng.sample(range(rows), max(1, rows // 100)):
+        values[i] = rng.choice(["", "  ", np.nan, "not a date", "31/02/2024"])
+    return pd.Series(values, dtype=object)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    for layout in LAYOUTS:
+        dates = make_dates(args.rows, layout, rng)
+
+        start = time.perf_counter()
+        vectorized = normalize_dates(dates)
+        vectorized_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        expected = dates.apply(parse_date)
+        apply_time = time.perf_counter() - start
+
+        print(f"{layout:<20} rows={args.rows}  normalize_dates={vectorized_time:7.3f}s  "
+              f"apply(parse_date)={apply_time:7.3f}s  speedup={apply_time / vectorized_time:6.1f}x  "
+              f"mismatches={(vectorized != expected).sum()}")
+
+
+if __name__ == "__main__":
+    main()
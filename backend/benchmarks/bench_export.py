@@ -0,0 +1,117 @@
+# bench_export.py
+# Throughput, time to first byte and peak memory of /transactions/export.
+#
+# Seeds a collection, then runs every format in its own subprocess (so each
+# peak RSS is its own) by draining the endpoint's streaming response
+# directly, without an HTTP client buffering it. "list + json" is the old way
+# to get data out: the whole result set fetched into a list and encoded as one
+# JSON document.
+#
+# Needs a real mongod:
+#   MONGO_URI=mongodb://localhost:27017 python benchmarks/bench_export.py --rows 1000000
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ACCOUNT_ID = "bench-export-account"
+FORMATS = ["list + json", "csv", "ndjson", "parquet"]
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def seed(db_name, rows):
+    from pymongo import AsyncMongoClient
+
+    from database import require_mongo_uri
+    from indexes import ensure_indexes
+    from schema import to_amount
+
+    client = AsyncMongoClient(require_mongo_uri())
+    db = client[db_name]
+    await db.drop_collection("transactions")
+    rng = random.Random(42)
+    start = datetime.datetime(2022, 1, 1)
+    batch = []
+    for i in range(rows):
+        batch.append({
+            "acct": ACCOUNT_ID,
+            "uid": "placeholder_user",
+            "date": start + datetime.timedelta(days=rng.randint(0, 1094)),
+            "amt": to_amount(round(rng.uniform(-3000, 800), 2)),
+            "desc": f"UPI/{rng.randint(10**9, 10**10)}/pay/merchant{rng.randint(1, 300)}@ybl",
+            "cat": "Miscellaneous",
+            "conf": "Low",
+            "raw": {"Ref": f"{i:012d}"},
+        })
+        if len(batch) == 10000:
+            await db["transactions"].insert_many(batch)
+            batch = []
+    if batch:
+        await db["transactions"].insert_many(batch)
+    await ensure_indexes(db)
+    await client.close()
+
+
+async def run_format(db_name, format_name):
+    os.environ["MONGO_DB_NAME"] = db_name
+    import main
+    from database import mongo
+    from responses import dumps
+    from schema import api_pipeline
+
+    await mongo.connect()
+    start = time.perf_counter()
+    first_byte = None
+    size = 0
+    if format_name == "list + json":
+        query = main.build_transactions_query(ACCOUNT_ID)
+        cursor = await mongo.transactions.aggregate(api_pipeline(query, [('date', -1), ('_id', -1)]))
+        size = len(dumps(await cursor.to_list()))
+        first_byte = time.perf_counter() - start
+    else:
+        response = await main.export_transactions(account_id=ACCOUNT_ID, fields=None, start_date=None,
+                                                  end_date=None, category=None, format=format_name)
+        async for chunk in response.body_iterator:
+            if first_byte is None:
+                first_byte = time.perf_counter() - start
+            size += len(chunk)
+    elapsed = time.perf_counter() - start
+    await mongo.close()
+    print(json.dumps({"seconds": elapsed, "first_byte": first_byte, "bytes": size, "peak_rss_mb": peak_rss_mb()}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", default="finance_tracker_bench_export")
+    parser.add_argument("--rows", type=int, default=500000)
+    parser.add_argument("--run", choices=FORMATS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        asyncio.run(run_format(args.db, args.run))
+        return
+
+    asyncio.run(seed(args.db, args.rows))
+    for format_name in FORMATS:
+        output = subprocess.run([sys.executable, __file__, "--db", args.db, "--run", format_name],
+                                check=True, capture_output=True, text=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{format_name:<12} rows/s={args.rows / result['seconds']:>10.0f}  "
+              f"first byte={result['first_byte'] * 1000:>9.1f} ms  size={result['bytes'] / (1 << 20):>8.1f} MB  "
+              f"peak RSS={result['peak_rss_mb']:>8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
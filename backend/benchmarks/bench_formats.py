@@ -0,0 +1,91 @@
+# bench_formats.py
+# Compares parse throughput of the statement readers, one format at a time.
+#
+# The same synthetic statement is written as CSV, XLSX, Parquet and Arrow
+# IPC. For each file it times the reader alone (bytes -> DataFrame chunks)
+# and the full ingest path (chunks -> normalized records), plus the old
+# pandas CSV engine as a baseline.
+#
+# Run from the backend folder:  python benchmarks/bench_formats.py --rows 200000
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_upload import write_statement
+from ingest import UPLOAD_CHUNK_ROWS, inspect_statement, iter_upload_batches
+from readers import sniff_reader
+
+
+def write_formats(tmp, rows, include_xlsx):
+    csv_path = os.path.join(tmp, "statement.csv")
+    write_statement(csv_path, rows)
+    paths = {"csv": csv_path}
+
+    df = pd.read_csv(csv_path)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    paths["parquet"] = os.path.join(tmp, "statement.parquet")
+    pq.write_table(table, paths["parquet"])
+    paths["arrow"] = os.path.join(tmp, "statement.arrow")
+    feather.write_feather(table, paths["arrow"])
+    if include_xlsx:
+        paths["xlsx"] = os.path.join(tmp, "statement.xlsx")
+        df.to_excel(paths["xlsx"], index=False)
+    return paths
+
+
+def time_call(func):
+    start = time.perf_counter()
+    rows = func()
+    return rows, time.perf_counter() - start
+
+
+def read_only(path):
+    reader = sniff_reader(path)
+    return sum(len(df) for df in reader.iter_chunks(path, UPLOAD_CHUNK_ROWS))
+
+
+def read_pandas_csv(path):
+    return sum(len(df) for df in pd.read_csv(path, chunksize=UPLOAD_CHUNK_ROWS, encoding='utf-8-sig'))
+
+
+def full_ingest(path):
+    settings = inspect_statement(path)
+    return sum(len(batch) for batch in iter_upload_batches(path, "bench", settings=settings))
+
+
+def report(label, path, rows, elapsed):
+    size_mb = os.path.getsize(path) / 1e6
+    print(f"{label:<22} rows={rows:<9} size={size_mb:8.1f} MB  time={elapsed:7.2f}s  rows/sec={rows / elapsed:10.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--skip-xlsx", action="store_true", help="XLSX is slow to write for large row counts")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = write_formats(tmp, args.rows, not args.skip_xlsx)
+
+        print("reader only (bytes -> DataFrame chunks)")
+        report("csv (pandas engine)", paths["csv"], *time_call(lambda: read_pandas_csv(paths["csv"])))
+        for name, path in paths.items():
+            report(name, path, *time_call(lambda: read_only(path)))
+
+        print("full ingest (chunks -> normalized records)")
+        for name, path in paths.items():
+            report(name, path, *time_call(lambda: full_ingest(path)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+# bench_schema.py
+# Before/after comparison of the transaction storage layout.
+#
+# Seeds the same synthetic statement rows twice: once in the old layout
+# (long field names, ISO date strings, float amounts and every bank column
+# at the top level, with the old indexes) and once converted by
+# schema.migrate_document (short names, BSON dates, Decimal128 amounts and a
+# raw subdocument, with the current indexes). It then reports collection
+# size, average document size and index size from collStats, and the median
+# latency of the analytics pipelines and a filtered listing page on each.
+#
+# Needs a real mongod:
+#   MONGO_URI=mongodb://localhost:27017 python benchmarks/bench_schema.py --rows 200000
+import argparse
+import asyncio
+import datetime
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import ASCENDING, DESCENDING, AsyncMongoClient, IndexModel
+
+from database import require_mongo_uri
+from indexes import TRANSACTION_INDEXES
+from main import build_transactions_query
+from rollups import spending_by_category_pipeline, summary_pipeline
+from schema import api_pipeline, migrate_document
+
+ACCOUNT_ID = "bench-schema-account"
+# Statement columns that were mapped to Date/Amount/Description
+MAPPED_COLUMNS = {'Txn Date', 'Amount', 'Narration'}
+LEGACY_INDEXES = [
+    IndexModel([('user_id', ASCENDING), ('account_id', ASCENDING), ('Date', DESCENDING), ('_id', DESCENDING)], name='user_account_date'),
+    IndexModel([('user_id', ASCENDING), ('account_id', ASCENDING), ('Amount', ASCENDING), ('category', ASCENDING)], name='user_account_amount_category'),
+    IndexModel([('user_id', ASCENDING), ('confidence', ASCENDING), ('account_id', ASCENDING)], name='user_confidence_account'),
+    IndexModel([('fingerprint', ASCENDING)], name='fingerprint', unique=True, partialFilterExpression={'fingerprint': {'$exists': True}}),
+]
+
+
+def legacy_rows(rows):
+    rng = random.Random(42)
+    merchants = ["swiggy", "zomato", "blinkit", "uber", "amazon", "netflix", "irctc", "corner shop"]
+    categories = ["Food", "Food", "Groceries", "Transport", "Shopping", "Bills & Subscriptions", "Travel", "Miscellaneous"]
+    start = datetime.date(2022, 1, 1)
+    balance = 100000.0
+    docs = []
+    for i in range(rows):
+        day = start + datetime.timedelta(days=rng.randint(0, 1094))
+        pick = rng.randrange(len(merchants))
+        amount = round(rng.uniform(-4000, 1500), 2)
+        balance += amount
+        description = f"UPI/{rng.randint(10**11, 10**12)}/Payment from Ph/{merchants[pick]}@okaxis"
+        docs.append({
+            # The statement's own columns, as the old upload path kept them
+            'Txn Date': day.strftime('%d/%m/%Y'),
+            'Value Date': day.strftime('%d/%m/%Y'),
+            'Narration': description,
+            'Chq/Ref No': f"{rng.randint(10**11, 10**12)}",
+            'Amount': amount,
+            'Closing Balance': round(balance, 2),
+            # Fields the old upload path added
+            'Date': day.isoformat() + 'T00:00:00',
+            'account_id': ACCOUNT_ID,
+            'user_id': 'placeholder_user',
+            'Description': description,
+            'category': categories[pick],
+            'confidence': 'High' if pick < 7 else 'Low',
+            'fingerprint': f"{i:040x}",
+        })
+    return docs
+
+
+# --- The old layout's versions of the same pipelines ---
+def legacy_summary_pipeline(account_id):
+    return [
+        {'$match': {'account_id': account_id, 'user_id': 'placeholder_user'}},
+        {'$group': {
+            '_id': None,
+            'total_spending': {'$sum': {'$cond': [{'$lt': ['$Amount', 0]}, '$Amount', 0]}},
+            'total_income': {'$sum': {'$cond': [{'$gt': ['$Amount', 0]}, '$Amount', 0]}},
+            'transaction_count': {'$sum': 1},
+        }},
+    ]
+
+
+def legacy_spending_by_category_pipeline(account_id):
+    return [
+        {'$match': {'account_id': account_id, 'user_id': 'placeholder_user', 'Amount': {'$lt': 0}}},
+        {'$group': {'_id': '$category', 'total_amount': {'$sum': '$Amount'}}},
+    ]
+
+
+def legacy_monthly_pipeline(account_id):
+    return [
+        {'$match': {'account_id': account_id, 'user_id': 'placeholder_user'}},
+        {'$group': {'_id': {'$substrCP': ['$Date', 0, 7]}, 'total': {'$sum': '$Amount'}}},
+    ]
+
+
+def monthly_pipeline(account_id):
+    return [
+        {'$match': {'acct': account_id, 'uid': 'placeholder_user'}},
+        {'$group': {'_id': {'$dateToString': {'format': '%Y-%m', 'date': '$date'}}, 'total': {'$sum': '$amt'}}},
+    ]
+
+
+def legacy_page_pipeline(account_id):
+    query = {'account_id': account_id, 'user_id': 'placeholder_user', 'Date': {'$gte': '2023-03-01', '$lte': '2023-08-31T23:59:59'}}
+    return [{'$match': query}, {'$sort': {'Date': -1, '_id': -1}}, {'$limit': 500}]
+
+
+def page_pipeline(account_id):
+    return api_pipeline(build_transactions_query(account_id, '2023-03-01', '2023-08-31'), [('date', -1), ('_id', -1)], 500)
+
+
+async def time_pipeline(collection, pipeline, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        cursor = await collection.aggregate(pipeline)
+        await cursor.to_list()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", default="finance_tracker_bench_schema")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    client = AsyncMongoClient(require_mongo_uri())
+    db = client[args.db]
+    legacy, compact = db['transactions_legacy'], db['transactions_compact']
+    await legacy.drop()
+    await compact.drop()
+
+    docs = legacy_rows(args.rows)
+    await legacy.insert_many([dict(doc) for doc in docs])
+    await legacy.create_indexes(LEGACY_INDEXES)
+    await compact.insert_many([migrate_document({'_id': i, **doc}, MAPPED_COLUMNS) for i, doc in enumerate(docs)])
+    await compact.create_indexes(TRANSACTION_INDEXES)
+
+    print(f"{'':<24}{'old layout':>14}{'compact':>14}")
+    stats = [await db.command('collStats', name) for name in ('transactions_legacy', 'transactions_compact')]
+    for label, field, unit in [
+        ("documents", 'count', 1),
+        ("avg document (bytes)", 'avgObjSize', 1),
+        ("data size (MB)", 'size', 1 << 20),
+        ("storage size (MB)", 'storageSize', 1 << 20),
+        ("index size (MB)", 'totalIndexSize', 1 << 20),
+    ]:
+        print(f"{label:<24}{stats[0][field] / unit:>14.1f}{stats[1][field] / unit:>14.1f}")
+
+    for label, old, new in [
+        ("summary (ms)", legacy_summary_pipeline(ACCOUNT_ID), summary_pipeline(ACCOUNT_ID)),
+        ("by category (ms)", legacy_spending_by_category_pipeline(ACCOUNT_ID), spending_by_category_pipeline(ACCOUNT_ID)),
+        ("by month (ms)", legacy_monthly_pipeline(ACCOUNT_ID), monthly_pipeline(ACCOUNT_ID)),
+        ("date-range page (ms)", legacy_page_pipeline(ACCOUNT_ID), page_pipeline(ACCOUNT_ID)),
+    ]:
+        print(f"{label:<24}{await time_pipeline(legacy, old, args.repeats):>14.1f}{await time_pipeline(compact, new, args.repeats):>14.1f}")
+
+    await client.drop_database(args.db)
+    await client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
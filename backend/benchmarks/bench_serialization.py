@@ -0,0 +1,134 @@
+# bench_serialization.py
+# Throughput and peak memory of encoding transaction documents as a JSON
+# response body, old paths against the orjson ones in responses.py.
+#
+#   rewrite + jsonable   what /accounts/ and /transactions/review/ did: turn
+#                        each _id into a string, return the list, and let
+#                        FastAPI run jsonable_encoder and the stdlib encoder
+#   json.dumps per doc   the previous streaming listing: one stdlib
+#                        json.dumps(doc, cls=JSONEncoder) call per document
+#   orjson response      ORJSONResponse(docs), as a listing page is sent now
+#   orjson stream        iter_json_array over batches, as unpaginated
+#                        listings and the review queue are sent now
+#
+# Documents are shaped like api_pipeline output (ObjectId, datetime, float
+# amounts and a raw subdocument) and are built fresh for every run, outside
+# the timing. Peak memory comes from a separate tracemalloc pass. All paths
+# are checked to produce the same JSON.
+#
+# Run from the backend folder:  python benchmarks/bench_serialization.py --docs 200000
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import JSONResponse
+
+from responses import ORJSONResponse, iter_json_array
+
+BATCH_SIZE = 1000
+
+
+class StdlibJSONEncoder(json.JSONEncoder):
+    # The encoder the streaming listing used before responses.py
+    def default(self, o):
+        if isinstance(o, ObjectId):
+            return str(o)
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return json.JSONEncoder.default(self, o)
+
+
+def make_docs(count, seed=42):
+    rng = random.Random(seed)
+    start = datetime.datetime(2023, 1, 1)
+    return [{
+        "_id": ObjectId(rng.randbytes(12)),
+        "account_id": "bench-account",
+        "user_id": "placeholder_user",
+        "Date": start + datetime.timedelta(minutes=rng.randint(0, 1051200)),
+        "Amount": round(rng.uniform(-5000, 5000), 2),
+        "Description": f"UPI/{rng.randint(10**11, 10**12 - 1)}/pay/merchant{rng.randint(1, 500)}@ybl",
+        "category": rng.choice(["Food", "Transport", "Shopping", "Miscellaneous"]),
+        "confidence": rng.choice(["High", "Medium", "Low"]),
+        "raw": {"Ref": f"{rng.randint(0, 10**12):012d}", "Balance": round(rng.uniform(0, 10**6), 2)},
+    } for _ in range(count)]
+
+
+def rewrite_and_jsonable(docs):
+    result = []
+    for doc in docs:
+        doc["_id"] = str(doc["_id"])
+        result.append(doc)
+    return JSONResponse(jsonable_encoder(result)).body
+
+
+def dumps_per_doc(docs):
+    return ("[" + ",".join(json.dumps(doc, cls=StdlibJSONEncoder) for doc in docs) + "]").encode()
+
+
+def orjson_response(docs):
+    return ORJSONResponse(docs).body
+
+
+def orjson_stream(docs):
+    async def batches():
+        for start in range(0, len(docs), BATCH_SIZE):
+            yield docs[start:start + BATCH_SIZE]
+
+    async def drain():
+        return b"".join([chunk async for chunk in iter_json_array(batches())])
+    return asyncio.run(drain())
+
+
+PATHS = [
+    ("rewrite + jsonable", rewrite_and_jsonable),
+    ("json.dumps per doc", dumps_per_doc),
+    ("orjson response", orjson_response),
+    ("orjson stream", orjson_stream),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=100000)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    expected = None
+    for name, encode in PATHS:
+        timings = []
+        for _ in range(args.runs):
+            docs = make_docs(args.docs)
+            start = time.perf_counter()
+            body = encode(docs)
+            timings.append(time.perf_counter() - start)
+
+        docs = make_docs(args.docs)
+        tracemalloc.start()
+        encode(docs)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        decoded = json.loads(body)
+        if expected is None:
+            expected = decoded
+        assert decoded == expected, f"{name} produced different JSON"
+
+        seconds = statistics.median(timings)
+        print(f"{name:<20} docs/s={args.docs / seconds:>10.0f}  MB/s={len(body) / seconds / 1e6:>7.1f}  "
+              f"time={seconds * 1000:8.1f} ms  peak alloc={peak / 1e6:7.1f} MB  body={len(body) / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# bench_startup.py
+# Cold start of the API: import time, lifespan startup and time to first
+# request, each measured in a fresh interpreter.
+#
+# "lazy" is the API as it is. "eager" first imports what main.py used to load
+# at import time (pandas, numpy, pyarrow, openpyxl and the Gemini SDK, with a
+# GenerativeModel built), which is the cost every API worker paid before the
+# heavy modules moved behind first use. Each run reports which of them ended
+# up loaded, and the peak RSS.
+#
+# Needs a real mongod, since startup creates the indexes:
+#   MONGO_URI=mongodb://localhost:27017 python benchmarks/bench_startup.py --runs 5
+import argparse
+import importlib
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MODES = ["eager", "lazy"]
+HEAVY_MODULES = ["pandas", "numpy", "pyarrow", "openpyxl", "google.generativeai"]
+
+
+def eager_imports():
+    for name in ["numpy", "pandas", "pyarrow", "pyarrow.parquet", "openpyxl"]:
+        importlib.import_module(name)
+    import google.generativeai as genai
+
+    genai.configure(api_key=os.environ.get("GOOGLE_API_KEY"))
+    genai.GenerativeModel("models/gemini-2.5-flash")
+
+
+def child(mode):
+    start = time.perf_counter()
+    if mode == "eager":
+        eager_imports()
+    import main
+    from fastapi.testclient import TestClient
+
+    imported = time.perf_counter()
+    with TestClient(main.app) as client:
+        started = time.perf_counter()
+        client.get("/health").raise_for_status()
+        first_request = time.perf_counter()
+        ready = client.get("/ready").status_code
+    print(json.dumps({
+        "import": imported - start,
+        "startup": started - imported,
+        "first_request": first_request - started,
+        "total": first_request - start,
+        "ready_status": ready,
+        "loaded": [name for name in HEAVY_MODULES if name in sys.modules],
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child)
+        return
+
+    for mode in MODES:
+        runs = []
+        for _ in range(args.runs):
+            output = subprocess.run([sys.executable, __file__, "--child", mode],
+                                    check=True, capture_output=True, text=True).stdout
+            runs.append(json.loads(output.strip().splitlines()[-1]))
+
+        def median(key):
+            return statistics.median(run[key] for run in runs)
+        print(f"{mode:<6} import={median('import') * 1000:7.0f} ms  startup={median('startup') * 1000:7.0f} ms  "
+              f"first request={median('first_request') * 1000:6.1f} ms  total={median('total') * 1000:7.0f} ms  "
+              f"peak RSS={median('peak_rss_mb'):6.1f} MB  /ready={runs[-1]['ready_status']}  "
+              f"loaded={','.join(runs[-1]['loaded']) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
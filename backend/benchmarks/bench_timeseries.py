@@ -0,0 +1,101 @@
+# bench_timeseries.py
+# What it costs to chart a monthly/weekly/daily trend: downloading every
+# transaction and bucketing it in the client (the only option before
+# /analytics/timeseries), versus the server-side series.
+#
+# For each interval it reports the median latency and the JSON payload size.
+# The client-side numbers cover the database read and the JSON encoding of
+# the rows, which is what /transactions/ would send; the bucketing itself is
+# left out, so they are a lower bound.
+#
+# Needs a real mongod:
+#   MONGO_URI=mongodb://localhost:27017 python benchmarks/bench_timeseries.py --rows 200000
+import argparse
+import asyncio
+import datetime
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import AsyncMongoClient
+
+from database import require_mongo_uri
+from indexes import ensure_indexes
+from main import build_transactions_query
+from responses import dumps
+from rollups import rebuild_rollups
+from schema import api_pipeline, to_amount
+from timeseries import run_timeseries
+
+ACCOUNT_IDS = ["bench-timeseries-a", "bench-timeseries-b"]
+CATEGORIES = ["Food", "Groceries", "Transport", "Shopping", "Bills & Subscriptions", "Travel", "Miscellaneous"]
+
+
+async def seed(collection, rows):
+    rng = random.Random(42)
+    start = datetime.datetime(2023, 1, 1)
+    docs = []
+    for i in range(rows):
+        docs.append({
+            "acct": ACCOUNT_IDS[i % len(ACCOUNT_IDS)],
+            "uid": "placeholder_user",
+            "date": start + datetime.timedelta(days=rng.randint(0, 729)),
+            "amt": to_amount(round(rng.uniform(-3000, 800), 2)),
+            "desc": f"UPI/{rng.randint(10**9, 10**10)}/pay/merchant{rng.randint(1, 300)}@ybl",
+            "cat": rng.choice(CATEGORIES),
+            "conf": "High",
+        })
+    await collection.insert_many(docs)
+
+
+async def timed(compute, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = await compute()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000, len(dumps(result))
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", default="finance_tracker_bench_timeseries")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    client = AsyncMongoClient(require_mongo_uri())
+    db = client[args.db]
+    await db.drop_collection("transactions")
+    await db.drop_collection("rollups")
+    await seed(db["transactions"], args.rows)
+    await ensure_indexes(db)
+    await rebuild_rollups(db)
+
+    start_date, end_date = "2024-01-01", "2024-12-31"
+    base_query = build_transactions_query(None, start_date, end_date)
+
+    async def download_all():
+        query = {**base_query, 'acct': {'$in': ACCOUNT_IDS}}
+        cursor = await db["transactions"].aggregate(api_pipeline(query, [('date', -1), ('_id', -1)]))
+        return await cursor.to_list()
+
+    elapsed, size = await timed(download_all, args.repeats)
+    print(f"{'all rows, bucketed in client':<40} latency={elapsed:9.1f} ms  payload={size / 1024:10.1f} KiB")
+    for interval in ("month", "week", "day"):
+        for by_category in (False, True):
+            label = f"timeseries {interval}{' by category' if by_category else ''}"
+            elapsed, size = await timed(
+                lambda: run_timeseries(db, ACCOUNT_IDS, interval, base_query, start_date, end_date, by_category), args.repeats)
+            print(f"{label:<40} latency={elapsed:9.1f} ms  payload={size / 1024:10.1f} KiB")
+
+    await client.drop_database(args.db)
+    await client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,83 @@
+# bench_upload.py
+# Compares peak memory and throughput of the old whole-file upload path
+# against the streaming path used by /uploadfile/.
+#
+# Run from the backend folder:  python benchmarks/bench_upload.py --rows 1000000
+import argparse
+import io
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MERCHANTS = ["swiggy", "zomato", "uber", "amazon", "netflix", "irctc", "local kirana", "rent", "salary"]
+
+
+def write_statement(path, rows):
+    rng = random.Random(42)
+    with open(path, "w") as f:
+        f.write("Date,Transaction details,Amount,Transaction Type\n")
+        for i in range(rows):
+            merchant = rng.choice(MERCHANTS)
+            f.write(f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/2024,"
+                    f"UPI/{i}/pay/{merchant}@ybl,{rng.uniform(10, 5000):.2f},{rng.choice(['DR', 'CR'])}\n")
+
+
+def run_legacy(path):
+    # The pre-streaming path: whole file -> one string -> one DataFrame -> one records list
+    import pandas as pd
+    from ingest import detect_and_map_columns, process_chunk
+
+    with open(path, "rb") as f:
+        contents = f.read()
+    df = pd.read_csv(io.StringIO(contents.decode('utf-8-sig')))
+    df.columns = [col.strip() for col in df.columns]
+    records = process_chunk(df, detect_and_map_columns(df), "bench")
+    return len(records)
+
+
+def run_streaming(path):
+    from ingest import iter_upload_batches
+
+    count = 0
+    with open(path, "rb") as f:
+        for batch in iter_upload_batches(f, "bench"):
+            count += len(batch)  # batches are dropped here instead of being inserted
+    return count
+
+
+def child(mode, path):
+    start = time.perf_counter()
+    rows = run_legacy(path) if mode == "legacy" else run_streaming(path)
+    elapsed = time.perf_counter() - start
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{mode:<10} rows={rows:<9} time={elapsed:7.2f}s rows/sec={rows / elapsed:10.0f} peak_rss={peak_mb:8.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--child", choices=["legacy", "streaming"])
+    parser.add_argument("--path")
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.path)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "statement.csv")
+        write_statement(path, args.rows)
+        print(f"statement: {args.rows} rows, {os.path.getsize(path) / 1e6:.1f} MB")
+        # Each mode runs in its own process so peak RSS is measured independently
+        for mode in ("legacy", "streaming"):
+            subprocess.run([sys.executable, __file__, "--child", mode, "--path", path], check=True)
+
+
+if __name__ == "__main__":
+    main()
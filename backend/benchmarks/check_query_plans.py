@@ -0,0 +1,139 @@
+# check_query_plans.py
+# Runs explain() on every query and pipeline the endpoints issue and fails if
+# any of them is answered with a collection scan.
+#
+# Needs a real mongod (explain is not emulated by in-memory stand-ins):
+#   MONGO_URI=mongodb://localhost:27017 python benchmarks/check_query_plans.py
+import argparse
+import asyncio
+import datetime
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import AsyncMongoClient
+
+from database import require_mongo_uri
+from indexes import ensure_indexes
+from main import build_transactions_query, review_query
+from query_planner import plan_match, plan_question, rollups_pipeline, transactions_pipeline
+from rollups import (rebuild_rollups, spending_by_category_from_rollups_pipeline,
+                     summary_from_rollups_pipeline)
+from rules import rule_query
+from schema import api_pipeline, to_amount
+from subscriptions import rebuild_merchant_stats, subscriptions_query
+from timeseries import rollups_timeseries_pipeline, timeseries_match, transactions_timeseries_pipeline
+
+ACCOUNT_ID = "plan-check-account"
+
+
+def query_shapes():
+    # (label, collection, "find" + filter + sort) or (label, collection, "aggregate" + pipeline)
+    newest_first = [('date', -1), ('_id', -1)]
+    merchant_plan = plan_question("How much did I spend on merchant12 in March 2024?")
+    merchant_match = plan_match(build_transactions_query(ACCOUNT_ID, merchant_plan['start_date'], merchant_plan['end_date']), merchant_plan)
+    month_plan = plan_question("What did I spend on groceries in 2024?")
+    series_match = timeseries_match([ACCOUNT_ID, "other-account"], build_transactions_query())
+    series_range_match = timeseries_match([ACCOUNT_ID], build_transactions_query(None, "2024-03-01", "2024-05-15"))
+    return [
+        ("transactions", "transactions", "aggregate", api_pipeline(build_transactions_query(ACCOUNT_ID), newest_first, 100), None),
+        ("transactions (all accounts)", "transactions", "aggregate", api_pipeline(build_transactions_query(), newest_first, 100), None),
+        ("transactions (filtered)", "transactions", "aggregate",
+         api_pipeline(build_transactions_query(ACCOUNT_ID, "2024-01-01", "2024-06-30", "Food"), newest_first, 100), None),
+        ("review", "transactions", "aggregate", api_pipeline(review_query(ACCOUNT_ID)), None),
+        ("review (all accounts)", "transactions", "aggregate", api_pipeline(review_query()), None),
+        ("ai query (merchant)", "transactions", "aggregate", transactions_pipeline(merchant_match), None),
+        ("ai query sample", "transactions", "find", merchant_match, newest_first),
+        ("ai query (rollups)", "rollups", "aggregate", rollups_pipeline(ACCOUNT_ID, month_plan), None),
+        ("subscriptions", "merchant_stats", "find", subscriptions_query(ACCOUNT_ID), None),
+        ("category rule", "transactions", "find", rule_query(ACCOUNT_ID, "merchant12", "Food"), None),
+        ("summary", "rollups", "aggregate", summary_from_rollups_pipeline(ACCOUNT_ID), None),
+        ("spending by category", "rollups", "aggregate", spending_by_category_from_rollups_pipeline(ACCOUNT_ID), None),
+        ("timeseries day", "transactions", "aggregate", transactions_timeseries_pipeline(series_range_match, "day", True), None),
+        ("timeseries week (2 accounts)", "transactions", "aggregate", transactions_timeseries_pipeline(series_match, "week", False), None),
+        ("timeseries month (rollups)", "rollups", "aggregate",
+         rollups_timeseries_pipeline([ACCOUNT_ID, "other-account"], "2024-01-01", None, False), None),
+        ("timeseries oldest date", "transactions", "find", series_match, [("date", 1)]),
+        ("timeseries newest date", "transactions", "find", series_match, [("date", -1)]),
+    ]
+
+
+def winning_stages(explain):
+    # Collects every stage name under any winningPlan in an explain document
+    stages = []
+
+    def walk(node, in_plan):
+        if isinstance(node, dict):
+            if in_plan and "stage" in node:
+                stages.append(node["stage"])
+            for key, value in node.items():
+                walk(value, in_plan or key in ("winningPlan", "queryPlan"))
+        elif isinstance(node, list):
+            for value in node:
+                walk(value, in_plan)
+
+    walk(explain, False)
+    return stages
+
+
+async def seed(collection, rows):
+    rng = random.Random(42)
+    categories = ["Food", "Groceries", "Shopping", "Transport", "Miscellaneous"]
+    docs = []
+    for i in range(rows):
+        docs.append({
+            "acct": rng.choice([ACCOUNT_ID, "other-account"]),
+            "uid": "placeholder_user",
+            "date": datetime.datetime(2024, rng.randint(1, 12), rng.randint(1, 28)),
+            "amt": to_amount(round(rng.uniform(-5000, 5000), 2)),
+            "desc": f"UPI/{i}/pay/merchant{rng.randint(0, 200)}@ybl",
+            "cat": rng.choice(categories),
+            "conf": rng.choice(["High", "Low"]),
+        })
+    await collection.insert_many(docs)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", default="finance_tracker_plan_check")
+    parser.add_argument("--rows", type=int, default=20000)
+    args = parser.parse_args()
+
+    client = AsyncMongoClient(require_mongo_uri())
+    db = client[args.db]
+    await db.drop_collection("transactions")
+    await db.drop_collection("rollups")
+    await db.drop_collection("merchant_stats")
+    await seed(db["transactions"], args.rows)
+    await ensure_indexes(db)
+    await rebuild_rollups(db)
+    await rebuild_merchant_stats(db)
+
+    failures = 0
+    for label, collection, kind, spec, sort in query_shapes():
+        start = time.perf_counter()
+        if kind == "find":
+            cursor = db[collection].find(spec)
+            if sort:
+                cursor = cursor.sort(sort)
+            explain = await cursor.explain()
+        else:
+            explain = await db.command("explain", {"aggregate": collection, "pipeline": spec, "cursor": {}},
+                                       verbosity="executionStats")
+        elapsed = (time.perf_counter() - start) * 1000
+
+        stages = winning_stages(explain)
+        status = "FAIL" if "COLLSCAN" in stages else "ok"
+        failures += status == "FAIL"
+        print(f"{status:<4} {label:<28} {elapsed:7.1f} ms  {' > '.join(stages)}")
+
+    await client.drop_database(args.db)
+    await client.close()
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,97 @@
+# load_upload.py
+# Measures read latency while a large statement is being uploaded.
+#
+# Start the API first (against a local mongod via MONGO_URI), then run:
+#   python benchmarks/load_upload.py --url http://127.0.0.1:8000 --account-id <id> --rows 500000
+#
+# It samples /analytics/summary with several concurrent clients while the
+# server is idle, then again from the upload request until its background
+# ingestion job finishes, and prints p50/p99. With ingestion in worker
+# processes the two should be close.
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_upload import write_statement
+
+
+def percentile(samples, pct):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+async def poll(client, path, stop, latencies):
+    while not stop.is_set():
+        start = time.perf_counter()
+        response = await client.get(path)
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(random.uniform(0, 0.01))
+
+
+async def sample(client, path, concurrency, duration=None, until=None):
+    stop = asyncio.Event()
+    latencies = []
+    pollers = [asyncio.create_task(poll(client, path, stop, latencies)) for _ in range(concurrency)]
+    if until is not None:
+        await until
+    else:
+        await asyncio.sleep(duration)
+    stop.set()
+    await asyncio.gather(*pollers)
+    return latencies
+
+
+def report(label, latencies):
+    print(f"{label:<14} requests={len(latencies):<6} p50={statistics.median(latencies):8.1f} ms  "
+          f"p99={percentile(latencies, 99):8.1f} ms  max={max(latencies):8.1f} ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--account-id", required=True)
+    parser.add_argument("--rows", type=int, default=500000)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--idle-seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    path = f"/analytics/summary/{args.account_id}"
+    async with httpx.AsyncClient(base_url=args.url, timeout=120) as client:
+        report("idle", await sample(client, path, args.concurrency, duration=args.idle_seconds))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            statement = os.path.join(tmp, "statement.csv")
+            write_statement(statement, args.rows)
+
+            async def upload():
+                with open(statement, "rb") as f:
+                    response = await client.post("/uploadfile/", files={"file": ("statement.csv", f)},
+                                                 data={"account_id": args.account_id})
+                result = response.json()
+                print("upload:", result)
+                if "job_id" not in result:
+                    return
+                # Ingestion carries on in the background; wait for the job
+                while True:
+                    job = (await client.get(f"/uploads/{result['job_id']}")).json()
+                    if job["status"] in ("done", "failed"):
+                        break
+                    await asyncio.sleep(0.5)
+                print(f"job: status={job['status']} parts={job['parts']} rows_parsed={job['rows_parsed']} "
+                      f"rows_inserted={job['rows_inserted']} errors={job['errors']}")
+
+            report("during upload", await sample(client, path, args.concurrency, until=asyncio.create_task(upload())))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,228 @@
+# run_suite.py
+# End-to-end benchmark suite, with results saved as JSON to compare commits.
+#
+# For each statement layout and size (see synthetic.py), the scratch database
+# is emptied and the statement is uploaded through POST /uploadfile/, timed
+# until its background job finishes. Then every read endpoint is called
+# --repeat times against the uploaded account. Requests go through FastAPI's
+# TestClient, in process, so the numbers cover routing, validation, database
+# work and encoding, but no network. The analytics cache is switched off so
+# every call runs its pipeline. Micro-benchmarks of the categorization and
+# date parsing helpers run on the same synthetic descriptions and dates.
+#
+# Needs a local mongod. The suite empties the database it works in, so it
+# refuses to run without an explicit MONGO_URI:
+#   MONGO_URI=mongodb://localhost:27017 python benchmarks/run_suite.py --rows 10000 100000 1000000
+#   MONGO_URI=... python benchmarks/run_suite.py --rows 10000 --compare benchmarks/results/<earlier>.json
+import argparse
+import datetime
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import synthetic
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+# Micro-benchmarks stop at this many items; per-row costs do not change beyond it
+MICRO_MAX_ROWS = 1000000
+# parse_date is the per-row fallback, far slower than the rest
+PARSE_DATE_MAX_ROWS = 10000
+POLL_SECONDS = 0.05
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        "runs": len(ordered),
+        "min_ms": ordered[0] * 1000,
+        "median_ms": statistics.median(ordered) * 1000,
+        "p95_ms": ordered[math.ceil(0.95 * len(ordered)) - 1] * 1000,
+    }
+
+
+def read_endpoints(account_id):
+    # (name, path, params); names are the keys results are compared by
+    return [
+        ("GET /transactions/ first page", "/transactions/", {"account_id": account_id, "limit": 100}),
+        ("GET /transactions/ by category", "/transactions/", {"account_id": account_id, "limit": 100, "category": "Food"}),
+        ("GET /transactions/review/", "/transactions/review/", {"account_id": account_id}),
+        ("GET /analytics/summary", f"/analytics/summary/{account_id}", {}),
+        ("GET /analytics/spending_by_category", f"/analytics/spending_by_category/{account_id}", {}),
+        ("GET /analytics/timeseries month", f"/analytics/timeseries/{account_id}", {"interval": "month"}),
+        ("GET /analytics/timeseries day by category", f"/analytics/timeseries/{account_id}",
+         {"interval": "day", "by_category": "true"}),
+        ("GET /analytics/subscriptions", f"/analytics/subscriptions/{account_id}", {}),
+        ("GET /transactions/export csv", "/transactions/export", {"account_id": account_id, "format": "csv"}),
+        ("GET /transactions/export parquet", "/transactions/export", {"account_id": account_id, "format": "parquet"}),
+    ]
+
+
+def clear_database(db):
+    # Documents go, collections and indexes stay, so the API needs no restart
+    for name in db.list_collection_names():
+        db[name].delete_many({})
+
+
+def upload(client, path, account_id):
+    start = time.perf_counter()
+    with open(path, "rb") as f:
+        result = client.post("/uploadfile/", files={"file": ("statement.csv", f)}, data={"account_id": account_id}).json()
+    if "job_id" not in result:
+        raise RuntimeError(f"Upload was not accepted: {result}")
+    while (job := client.get(f"/uploads/{result['job_id']}").json())["status"] not in ("done", "failed"):
+        time.sleep(POLL_SECONDS)
+    elapsed = time.perf_counter() - start
+    if job["status"] == "failed":
+        raise RuntimeError(f"Upload job failed: {job['errors']}")
+    return elapsed, job
+
+
+def run_case(client, db, layout, rows, repeat, seed, tmp):
+    path = synthetic.write_statement(os.path.join(tmp, f"{layout}-{rows}.csv"), rows, layout, seed)
+    account_id = f"bench-{layout}-{rows}"
+    clear_database(db)
+
+    elapsed, job = upload(client, path, account_id)
+    results = [{
+        "name": "POST /uploadfile/", "layout": layout, "rows": rows,
+        **summarize([elapsed]),
+        "rows_per_second": rows / elapsed,
+        "rows_inserted": job["rows_inserted"],
+        "parts": job["parts"],
+        "stage_seconds": job.get("timings", {}),
+    }]
+    print(f"{layout:<14} {rows:>9} upload      {elapsed:8.2f} s  {rows / elapsed:10.0f} rows/s")
+
+    for name, url, params in read_endpoints(account_id):
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            response = client.get(url, params=params)
+            samples.append(time.perf_counter() - start)
+            response.raise_for_status()
+        summary = summarize(samples)
+        results.append({"name": name, "layout": layout, "rows": rows, **summary, "response_bytes": len(response.content)})
+        print(f"{layout:<14} {rows:>9} {name:<42} median={summary['median_ms']:9.1f} ms  p95={summary['p95_ms']:9.1f} ms")
+    return results
+
+
+def run_micro(rows, repeat, seed):
+    from categories import categorize_many, categorize_transaction
+    from ingest import normalize_dates, parse_date
+
+    items = min(rows, MICRO_MAX_ROWS)
+    transactions = list(synthetic.iter_transactions(items, seed))
+    descriptions = [description for _, description, _ in transactions]
+    dates = [date.strftime("%d/%m/%Y") for date, _, _ in transactions]
+    cases = [
+        ("categorize_many", lambda: categorize_many(descriptions), items),
+        ("categorize_transaction", lambda: [categorize_transaction(d) for d in descriptions], items),
+        ("normalize_dates", lambda: normalize_dates(dates), items),
+        ("parse_date", lambda: [parse_date(d) for d in dates[:PARSE_DATE_MAX_ROWS]], min(items, PARSE_DATE_MAX_ROWS)),
+    ]
+    results = []
+    for name, func, count in cases:
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            samples.append(time.perf_counter() - start)
+        summary = summarize(samples)
+        results.append({"name": name, "layout": None, "rows": rows, **summary, "items": count,
+                        "rows_per_second": count / (summary["median_ms"] / 1000)})
+        print(f"{'micro':<14} {rows:>9} {name:<42} {results[-1]['rows_per_second']:12.0f} rows/s")
+    return results
+
+
+def git_commit():
+    def git(*args):
+        return subprocess.run(["git", *args], cwd=BACKEND_DIR, capture_output=True, text=True).stdout.strip()
+    return git("rev-parse", "--short", "HEAD") or None, bool(git("status", "--porcelain", "--", "."))
+
+
+def compare(old, new):
+    old_results = {(r["name"], r["layout"], r["rows"]): r for r in old["results"]}
+    print(f"\ncompared with {old.get('commit')} ({old.get('created_at')}), median time:")
+    for result in new["results"]:
+        before = old_results.get((result["name"], result["layout"], result["rows"]))
+        if before is None:
+            continue
+        change = (result["median_ms"] - before["median_ms"]) / before["median_ms"] * 100 if before["median_ms"] else 0.0
+        print(f"{result['layout'] or 'micro':<14} {result['rows']:>9} {result['name']:<42} "
+              f"{before['median_ms']:10.1f} -> {result['median_ms']:10.1f} ms  {change:+7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000])
+    parser.add_argument("--layouts", nargs="+", choices=sorted(synthetic.LAYOUTS), default=sorted(synthetic.LAYOUTS))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--db", default="finance_tracker_bench_suite")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/<time>-<commit>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    if "MONGO_URI" not in os.environ:
+        parser.error("set MONGO_URI to a local mongod; the suite deletes everything in --db")
+    # Read at import time by the API modules
+    os.environ["MONGO_DB_NAME"] = args.db
+    os.environ["CACHE_BACKEND"] = "memory"
+    os.environ["CACHE_MAX_ENTRIES"] = "0"
+    os.environ["AI_CATEGORIZATION"] = "0"
+
+    from fastapi.testclient import TestClient
+
+    import main as api
+    from database import create_sync_client
+    from jobs import UPLOAD_WORKERS
+
+    commit, dirty = git_commit()
+    report = {
+        "commit": commit,
+        "dirty": dirty,
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "settings": {"rows": args.rows, "layouts": args.layouts, "repeat": args.repeat, "seed": args.seed,
+                     "upload_workers": UPLOAD_WORKERS},
+        "results": [],
+    }
+
+    sync_client = create_sync_client()
+    db = sync_client[args.db]
+    try:
+        with tempfile.TemporaryDirectory() as tmp, TestClient(api.app) as client:
+            for rows in args.rows:
+                report["results"] += run_micro(rows, args.repeat, args.seed)
+                for layout in args.layouts:
+                    report["results"] += run_case(client, db, layout, rows, args.repeat, args.seed, tmp)
+    finally:
+        sync_client.drop_database(args.db)
+        sync_client.close()
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.datetime.now():%Y%m%d-%H%M%S}-{commit or 'nogit'}{'-dirty' if dirty else ''}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nresults written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+# synthetic.py
+# Seeded generator of synthetic bank statements for the benchmarks.
+#
+# A statement covers consecutive days in date order, like a real export. Each
+# day has monthly subscriptions due that day, a salary credit on the 1st and
+# a random mix of merchant payments: mostly merchants the keyword rules know
+# (swiggy, uber, amazon...), plus a long tail of shops and people that only
+# the AI pass or a user rule would categorize. The same seed and row count
+# always give the same file, so results can be compared across commits.
+#
+# Every layout detect_and_map_columns handles is available:
+#   cr_dr          positive amounts with a DR/CR "Transaction Type" column
+#   signed         debits as negative amounts, "Narration", extra Balance column
+#   upi_reference  the description lives in a UPI_Reference column
+#   shifted        the header is one column off (see SHIFTED_COLUMNS_FIX)
+#
+# Run from the backend folder to write a file:
+#   python benchmarks/synthetic.py statement.csv --rows 1000000 --layout shifted
+import argparse
+import csv
+import datetime
+import math
+import random
+
+# Known merchants, with their share of the random payments and amount range
+KNOWN_MERCHANTS = [
+    ("swiggy", 14, (90, 900)),
+    ("zomato", 12, (90, 900)),
+    ("blinkit", 8, (50, 1500)),
+    ("zepto", 5, (50, 1200)),
+    ("uber", 9, (60, 700)),
+    ("ola", 5, (60, 600)),
+    ("rapido", 3, (30, 250)),
+    ("amazon", 7, (150, 8000)),
+    ("flipkart", 5, (150, 8000)),
+    ("myntra", 3, (300, 4000)),
+    ("irctc", 2, (200, 4500)),
+]
+# Merchants no keyword rule matches
+LONG_TAIL_MERCHANTS = [
+    "sharma general store", "ramesh kumar", "cafe coffee day", "apollo pharmacy", "decathlon",
+    "shell petrol", "big bazaar", "lenskart", "bookmyshow", "croma", "urban company", "anita joshi",
+]
+LONG_TAIL_SHARE = 27
+# (description, day of month, amount); the same amount every month
+RECURRING = [
+    ("SALARY CREDIT ACME CORP", 1, 85000.0),
+    ("RENT TRANSFER", 3, -25000.0),
+    ("NETFLIX SUBSCRIPTION", 5, -649.0),
+    ("SPOTIFY PREMIUM", 12, -119.0),
+    ("AIRTEL POSTPAID", 18, -999.0),
+]
+
+
+class Layout:
+    """One statement layout: header, date format and how a row is written."""
+
+    def __init__(self, name, header, date_format, signed=False, shifted=False):
+        self.name = name
+        self.header = header
+        self.date_format = date_format
+        self.signed = signed
+        self.shifted = shifted
+
+    def row(self, date, description, amount, balance):
+        date_text = date.strftime(self.date_format)
+        if self.signed:
+            return [date_text, description, f"{amount:.2f}", f"{balance:.2f}"]
+        kind = 'DR' if amount < 0 else 'CR'
+        if self.shifted:
+            # Values in true order, under a header that is one column off
+            return [kind, f"{abs(amount):.2f}", description, date_text]
+        return [date_text, description, f"{abs(amount):.2f}", kind]
+
+
+LAYOUTS = {
+    'cr_dr': Layout('cr_dr', ['Date', 'Transaction details', 'Amount', 'Transaction Type'], '%d/%m/%Y'),
+    'signed': Layout('signed', ['Txn Date', 'Narration', 'Amount', 'Balance'], '%d-%b-%Y', signed=True),
+    'upi_reference': Layout('upi_reference', ['Date', 'UPI_Reference', 'Amount', 'Transaction Type'], '%d/%m/%Y %H:%M'),
+    'shifted': Layout('shifted', ['Date', 'Transaction Type', 'Amount', 'UPI_Reference'], '%d-%m-%Y', shifted=True),
+}
+
+
+def describe_payment(rng, merchant):
+    # The same merchant shows up as UPI, card and net banking entries
+    style = rng.random()
+    if style < 0.7:
+        return f"UPI/{rng.randint(10**11, 10**12 - 1)}/pay/{merchant.replace(' ', '')}@ybl"
+    if style < 0.9:
+        return f"POS {rng.randint(4000, 4999)}XXXX{rng.randint(1000, 9999)} {merchant.upper()} BANGALORE"
+    return f"NEFT/{merchant.upper()}/{rng.randint(10**6, 10**7 - 1)}"
+
+
+def random_payment(rng):
+    known_weight = sum(weight for _, weight, _ in KNOWN_MERCHANTS)
+    pick = rng.uniform(0, known_weight + LONG_TAIL_SHARE)
+    for merchant, weight, (low, high) in KNOWN_MERCHANTS:
+        if pick < weight:
+            return describe_payment(rng, merchant), -round(rng.uniform(low, high), 2)
+        pick -= weight
+    merchant = rng.choice(LONG_TAIL_MERCHANTS)
+    amount = round(rng.uniform(20, 3000), 2)
+    # Some of the long tail are refunds and transfers in
+    return describe_payment(rng, merchant), amount if rng.random() < 0.1 else -amount
+
+
+def iter_transactions(rows, seed=42, start=datetime.date(2023, 1, 1), rows_per_day=40):
+    """Yields exactly ``rows`` (datetime, description, amount) tuples, in date order."""
+    rng = random.Random(seed)
+    days = max(1, math.ceil(rows / rows_per_day))
+    emitted = 0
+    for day in range(days):
+        date = datetime.datetime.combine(start + datetime.timedelta(days=day), datetime.time())
+        target = rows * (day + 1) // days
+        for description, day_of_month, amount in RECURRING:
+            if date.day == day_of_month and emitted < target:
+                yield date.replace(hour=9), description, amount
+                emitted += 1
+        while emitted < target:
+            description, amount = random_payment(rng)
+            yield date.replace(hour=rng.randint(8, 22), minute=rng.randint(0, 59)), description, amount
+            emitted += 1
+
+
+def write_statement(path, rows, layout='cr_dr', seed=42):
+    layout = LAYOUTS[layout]
+    balance = 100000.0
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(layout.header)
+        for date, description, amount in iter_transactions(rows, seed):
+            balance += amount
+            writer.writerow(layout.row(date, description, amount, balance))
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--layout", choices=sorted(LAYOUTS), default="cr_dr")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    write_statement(args.path, args.rows, args.layout, args.seed)
+
+
+if __name__ == "__main__":
+    main()
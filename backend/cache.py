@@ -0,0 +1,153 @@
+# cache.py
+# Read-through cache for the analytics endpoints.
+#
+# Keys are built from the endpoint, the account ID, the request params and a
+# per-account version counter. Writes to an account bump its version, so every
+# cached answer for that account stops being reachable at once, while other
+# accounts keep their entries. Stale entries simply age out via TTL or LRU.
+#
+# The default backend is an in-process LRU with TTL. Set CACHE_BACKEND=redis
+# (and REDIS_URL) to share the cache between workers; RedisCache accepts any
+# client with the redis.asyncio interface, so tests can hand it a fake.
+import json
+import os
+import time
+from collections import OrderedDict
+
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "memory")
+CACHE_TTL_SECONDS = int(os.environ.get("CACHE_TTL_SECONDS", 300))
+CACHE_MAX_ENTRIES = int(os.environ.get("CACHE_MAX_ENTRIES", 1024))
+REDIS_URL = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+
+MISSING = object()
+
+
+def make_cache_key(endpoint, account_id, version, params=None):
+    # Params are sorted so the same request always maps to the same key
+    suffix = json.dumps(params or {}, sort_keys=True, default=str)
+    return f"{endpoint}:{account_id}:v{version}:{suffix}"
+
+
+class CacheBase:
+    name = "base"
+
+    def __init__(self, ttl=CACHE_TTL_SECONDS):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    async def get_or_compute(self, endpoint, account_id, params, compute):
+        version = await self.get_version(account_id)
+        key = make_cache_key(endpoint, account_id, version, params)
+        value = await self.get(key)
+        if value is not MISSING:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = await compute()
+        await self.set(key, value)
+        return value
+
+    async def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": await self.evictions(),
+            "entries": await self.size(),
+        }
+
+    async def close(self):
+        pass
+
+
+class LRUCache(CacheBase):
+    """In-process LRU cache with a per-entry TTL."""
+
+    name = "memory"
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS):
+        super().__init__(ttl)
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # key -> (expires_at, value)
+        self.versions = {}
+        self.evicted = 0
+
+    async def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return MISSING
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self.entries[key]
+            self.evicted += 1
+            return MISSING
+        self.entries.move_to_end(key)
+        return value
+
+    async def set(self, key, value):
+        self.entries[key] = (time.monotonic() + self.ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evicted += 1
+
+    async def get_version(self, account_id):
+        return self.versions.get(account_id, 0)
+
+    async def bump_version(self, account_id):
+        self.versions[account_id] = self.versions.get(account_id, 0) + 1
+
+    async def evictions(self):
+        return self.evicted
+
+    async def size(self):
+        return len(self.entries)
+
+
+class RedisCache(CacheBase):
+    """Cache stored in Redis (or anything speaking its async client API)."""
+
+    name = "redis"
+
+    def __init__(self, client, ttl=CACHE_TTL_SECONDS, prefix="finance_tracker:"):
+        super().__init__(ttl)
+        self.client = client
+        self.prefix = prefix
+
+    async def get(self, key):
+        raw = await self.client.get(self.prefix + key)
+        return MISSING if raw is None else json.loads(raw)
+
+    async def set(self, key, value):
+        raw = json.dumps(value, default=lambda o: o.isoformat() if hasattr(o, "isoformat") else str(o))
+        await self.client.set(self.prefix + key, raw, ex=self.ttl)
+
+    async def get_version(self, account_id):
+        return int(await self.client.get(f"{self.prefix}version:{account_id}") or 0)
+
+    async def bump_version(self, account_id):
+        await self.client.incr(f"{self.prefix}version:{account_id}")
+
+    async def evictions(self):
+        # Server-wide counters; fakes used in tests may not implement INFO
+        try:
+            info = await self.client.info("stats")
+        except Exception:
+            return 0
+        return info.get("evicted_keys", 0) + info.get("expired_keys", 0)
+
+    async def size(self):
+        return await self.client.dbsize()
+
+    async def close(self):
+        await self.client.aclose()
+
+
+def create_cache():
+    if CACHE_BACKEND == "redis":
+        import redis.asyncio as redis
+        return RedisCache(redis.from_url(REDIS_URL))
+    return LRUCache()
@@ -0,0 +1,159 @@
+# categories.py
+# Keyword categorization of transaction descriptions, and the user rules
+# layered on top of it.
+#
+# Kept apart from ingest.py so the API process can build rule patterns and
+# read the category list without importing pandas and the statement readers.
+import re
+
+MERCHANT_CATEGORY_MAP = {
+    # High Confidence (Finds these keywords as whole words anywhere in the description)
+    r"\b(?:swiggy|zomato|eatsure)\b": "Food",
+    r"\b(?:blinkit|zepto|instamart)\b": "Groceries",
+    r"\b(?:uber|ola|rapido)\b": "Transport",
+    r"\b(?:flipkart|amazon|myntra|purple)\b": "Shopping",
+    r"\b(?:netflix|spotify|airtel)\b": "Bills & Subscriptions",
+    r"\b(?:irctc)\b": "Travel",
+}
+
+# --- Helper function to extract merchant name from UPI description ---
+def extract_merchant_from_upi(description):
+    # If it's a UPI transaction, try to extract the merchant name
+    if description.startswith('UPI/'):
+        parts = description.split('/')
+        if len(parts) > 3:
+            # Usually the merchant is in the last part or before @
+            merchant_part = parts[-1]
+            # Remove trailing commas or other artifacts
+            merchant_part = merchant_part.strip(',').strip()
+            # If it contains @, take the part before @
+            if '@' in merchant_part:
+                merchant_part = merchant_part.split('@')[0]
+            return merchant_part
+    return description
+
+# --- Merchant categorization engine ---
+class MerchantCategorizer:
+    """Compiles a merchant category map into a single keyword index.
+
+    Rules written as whole-word keyword lists, like ``\\b(?:swiggy|zomato)\\b``,
+    are folded into one dict keyed by the keyword's first word, so a description
+    is matched with one dict lookup per word no matter how many merchants the
+    map holds. Any other pattern is kept as a compiled regex and only tried when
+    it could beat the best keyword hit. Either way the result is the first rule
+    in map order that matches, exactly as if each pattern were searched in turn.
+    """
+
+    WORD = re.compile(r"\w+")
+    KEYWORD = re.compile(r"\w+(?: \w+)*")
+
+    def __init__(self, category_map):
+        self.categories = list(category_map.values())
+        self.keywords = {}  # first word -> [(keyword, rule index), ...]
+        self.patterns = []  # [(rule index, compiled regex), ...] for non-keyword rules
+
+        for index, pattern in enumerate(category_map):
+            keywords = self._literal_keywords(pattern)
+            if keywords is None:
+                self.patterns.append((index, re.compile(pattern)))
+                continue
+            for keyword in keywords:
+                self.keywords.setdefault(keyword.split(" ")[0], []).append((keyword, index))
+
+    @classmethod
+    def _literal_keywords(cls, pattern):
+        # Returns the keywords of a "\b(?:a|b c)\b" style rule, or None for anything else
+        if not (pattern.startswith(r"\b") and pattern.endswith(r"\b")):
+            return None
+        body = pattern[2:-2]
+        if body.startswith("(?:") and body.endswith(")"):
+            body = body[3:-1]
+        keywords = body.split("|")
+        if all(cls.KEYWORD.fullmatch(keyword) for keyword in keywords):
+            return keywords
+        return None
+
+    def match(self, lower_description):
+        best = None
+        for token in self.WORD.finditer(lower_description):
+            for keyword, index in self.keywords.get(token.group(), ()):
+                if best is not None and index >= best:
+                    continue
+                end = token.start() + len(keyword)
+                if end == token.end() or (
+                    lower_description.startswith(keyword, token.start())
+                    and (end == len(lower_description) or not self.WORD.match(lower_description, end))
+                ):
+                    best = index
+
+        for index, regex in self.patterns:
+            if best is not None and index >= best:
+                break
+            if regex.search(lower_description):
+                best = index
+                break
+
+        return None if best is None else self.categories[best]
+
+    def categorize(self, description, rules=None):
+        # PRIORITY 0: The user's own rules (see rule_categorizer), over the whole description
+        if rules is not None:
+            category = rules.match(description.lower())
+            if category is not None:
+                return category, "High"
+
+        # First, try to extract a cleaner merchant name if it's UPI
+        clean_description = extract_merchant_from_upi(description)
+        category = self.match(clean_description.lower())
+
+        # PRIORITY 1: High Confidence (Check for known merchant keywords)
+        if category is not None:
+            return category, "High"
+
+        # PRIORITY 2: Medium Confidence (We can add rules for transaction types later if needed)
+        # For now, this section will be empty.
+
+        # PRIORITY 3: Low Confidence (If nothing matches)
+        return "Miscellaneous", "Low"
+
+    def categorize_many(self, descriptions, rules=None):
+        # Imported here so the API process, which only categorizes one
+        # description at a time, never loads pandas
+        import numpy as np
+        import pandas as pd
+
+        # Statements repeat the same merchants over and over, so each distinct
+        # description is categorized once and the results are broadcast back
+        codes, uniques = pd.factorize(pd.Series(descriptions).astype(str))
+        results = [self.categorize(description, rules) for description in uniques]
+        categories = np.array([category for category, _ in results] or [""], dtype=object)
+        confidences = np.array([confidence for _, confidence in results] or [""], dtype=object)
+        return categories[codes], confidences[codes]
+
+categorizer = MerchantCategorizer(MERCHANT_CATEGORY_MAP)
+
+# --- User category rules ---
+# A rule maps a merchant, as letters-only lowercase words (ai_categorize.merchant_key),
+# to a category. It matches a description that contains those words in order,
+# as whole words with only digits, spaces or punctuation between them. The
+# same pattern is run as a case-insensitive regex by MongoDB when a new rule
+# recategorizes stored transactions, so both sides agree on what it covers.
+LETTERS = re.compile(r"[^\W\d_]+")
+
+def rule_pattern(merchant):
+    words = LETTERS.findall(merchant.lower())
+    return r"(?<![^\W\d_])" + r"[\W\d_]+".join(map(re.escape, words)) + r"(?![^\W\d_])"
+
+# --- Helper function to compile a user's rules, or None when there are none ---
+def rule_categorizer(rules):
+    if not rules:
+        return None
+    return MerchantCategorizer({rule_pattern(rule['merchant']): rule['category'] for rule in rules})
+
+# --- Helper function to categorize a single transaction ---
+def categorize_transaction(description, rules=None):
+    return categorizer.categorize(description, rules)
+
+# --- Helper function to categorize a whole column of descriptions ---
+def categorize_many(descriptions, rules=None):
+    return categorizer.categorize_many(descriptions, rules)
@@ -0,0 +1,116 @@
+# database.py
+# Async MongoDB access shared by every endpoint in main.py.
+#
+# The client is created once in the FastAPI lifespan handler and closed at
+# shutdown. The connection string, pool size and timeouts all come from the
+# environment (or backend/.env), so each deployment points at its own cluster
+# and sizes the pool to its worker count. There is no default cluster.
+import os
+
+from pymongo import AsyncMongoClient, MongoClient
+
+from metrics import MongoCommandListener
+
+MONGO_URI = os.environ.get("MONGO_URI")
+MONGO_DB_NAME = os.environ.get("MONGO_DB_NAME", "finance_tracker_db")
+
+# Connection pool settings
+MONGO_MAX_POOL_SIZE = int(os.environ.get("MONGO_MAX_POOL_SIZE", 100))
+MONGO_MIN_POOL_SIZE = int(os.environ.get("MONGO_MIN_POOL_SIZE", 0))
+# Timeouts, in milliseconds
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000))
+MONGO_CONNECT_TIMEOUT_MS = int(os.environ.get("MONGO_CONNECT_TIMEOUT_MS", 5000))
+MONGO_SOCKET_TIMEOUT_MS = int(os.environ.get("MONGO_SOCKET_TIMEOUT_MS", 30000))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.environ.get("MONGO_WAIT_QUEUE_TIMEOUT_MS", 10000))
+
+
+def require_mongo_uri():
+    if not MONGO_URI:
+        raise RuntimeError("MONGO_URI is not set; put the connection string in the environment or backend/.env")
+    return MONGO_URI
+
+
+def client_options():
+    return dict(
+        maxPoolSize=MONGO_MAX_POOL_SIZE,
+        minPoolSize=MONGO_MIN_POOL_SIZE,
+        serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+        socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+        waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+    )
+
+
+# Upload worker processes run blocking code with no event loop, so they
+# get a regular client with the same settings
+def create_sync_client():
+    return MongoClient(require_mongo_uri(), **client_options())
+
+
+class Database:
+    """Holds the async client and the collections the API works with.
+
+    ``connect`` optionally takes an already-built client, which is how tests
+    point the API at a local mongod or an in-memory stand-in.
+    """
+
+    def __init__(self):
+        self.client = None
+        self.db = None
+
+    async def connect(self, client=None):
+        if self.client is not None:
+            return
+        # Every command the API sends is timed for /metrics
+        self.client = client or AsyncMongoClient(require_mongo_uri(), event_listeners=[MongoCommandListener()], **client_options())
+        # Select your database (it will be created if it doesn't exist)
+        self.db = self.client[MONGO_DB_NAME]
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.close()
+        self.client = None
+        self.db = None
+
+    async def ping(self):
+        # Round trip to the server, for the readiness check
+        await self.db.command('ping')
+
+    @property
+    def transactions(self):
+        return self.db['transactions']
+
+    @property
+    def accounts(self):
+        return self.db['accounts']
+
+    @property
+    def rollups(self):
+        return self.db['rollups']
+
+    @property
+    def merchant_stats(self):
+        return self.db['merchant_stats']
+
+    @property
+    def uploads(self):
+        return self.db['uploads']
+
+    @property
+    def upload_jobs(self):
+        return self.db['upload_jobs']
+
+    @property
+    def statement_profiles(self):
+        return self.db['statement_profiles']
+
+    @property
+    def merchant_categories(self):
+        return self.db['merchant_categories']
+
+    @property
+    def category_rules(self):
+        return self.db['category_rules']
+
+
+mongo = Database()
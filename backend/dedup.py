@@ -0,0 +1,63 @@
+# dedup.py
+# Helpers that make statement uploads idempotent.
+#
+# Every normalized row gets a fingerprint from its account, date, amount and
+# description, backed by a unique index. Rows are written as unordered bulk
+# upserts keyed on that fingerprint, so re-uploading an overlapping statement
+# only inserts the rows that are actually new. Identical rows (two equal
+# payments on the same day) are numbered in file order across the whole
+# statement, so they stay distinct wherever the chunk and part boundaries fall.
+import collections
+import hashlib
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+FILE_HASH_BLOCK_SIZE = 1 << 20
+DUPLICATE_KEY_ERROR = 11000
+
+
+# --- Helper function to fingerprint every row of a normalized chunk ---
+# Computed from the ISO date string and the float amount, which the old
+# layout stored as is, so the schema migration fingerprints old rows the same
+# way (schema.legacy_fingerprints). seen, a Counter
+# shared by the chunks of one statement, holds how often each row was already
+# seen in earlier chunks, and is updated with this one.
+def row_fingerprints(account_id, dates, amounts, descriptions, seen=None):
+    base = (
+        account_id
+        + '|' + dates.astype(str)
+        + '|' + amounts.map(lambda amount: repr(float(amount))).astype(str)
+        + '|' + descriptions.astype(str)
+    )
+    occurrence = base.groupby(base).cumcount()
+    if seen is not None:
+        if seen:
+            occurrence += base.map(seen).fillna(0).astype(int)
+        seen.update(collections.Counter(base))
+    return [hashlib.sha1(key.encode()).hexdigest() for key in base + '|' + occurrence.astype(str)]
+
+
+# --- Helper function to hash a whole uploaded file without loading it ---
+def file_sha256(fileobj):
+    digest = hashlib.sha256()
+    while block := fileobj.read(FILE_HASH_BLOCK_SIZE):
+        digest.update(block)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+
+# --- Helper function to write a batch, skipping rows already stored ---
+def upsert_batch(collection, batch):
+    ops = [UpdateOne({'fp': record['fp']}, {'$setOnInsert': record}, upsert=True) for record in batch]
+    try:
+        result = collection.bulk_write(ops, ordered=False)
+        upserted = result.upserted_ids
+    except BulkWriteError as e:
+        # Two uploads racing on the same row: the loser hits the unique index,
+        # which just means the row is a duplicate
+        if any(error['code'] != DUPLICATE_KEY_ERROR for error in e.details['writeErrors']):
+            raise
+        upserted = {item['index']: item['_id'] for item in e.details.get('upserted', [])}
+    # Only the rows that were actually inserted
+    return [batch[index] for index in sorted(upserted)]
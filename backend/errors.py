@@ -0,0 +1,10 @@
+# errors.py
+# Exceptions raised in one process and handled in another.
+#
+# Upload workers raise these while parsing, and the job coordinator in the
+# API process catches them, so they live apart from ingest.py: the API can
+# recognise a bad statement without importing pandas.
+
+
+class UploadValidationError(ValueError):
+    pass
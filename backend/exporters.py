@@ -0,0 +1,159 @@
+# exporters.py
+# Output formats for /transactions/export.
+#
+# An exporter turns the cursor of API-shaped transactions (schema.api_pipeline)
+# into an async stream of bytes. Rows are pulled from the cursor a batch at a
+# time and each batch is encoded and sent before the next is read, so the
+# response starts right away and memory stays flat however many rows are
+# exported. To support a new format, write an exporter with iter_bytes and add
+# it to EXPORTERS.
+#
+# pyarrow is imported with the first Parquet export, not with the API.
+import asyncio
+import csv
+import io
+import os
+
+from responses import ndjson_lines
+
+# Rows read from the cursor and encoded together; for Parquet, one row group
+EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", 10000))
+
+# Columns of the tabular formats, in order; the raw statement columns differ
+# from bank to bank, so only NDJSON carries them
+EXPORT_COLUMNS = ['_id', 'account_id', 'Date', 'Amount', 'Description', 'category', 'confidence']
+# Arrow type names, as accepted by pyarrow.field
+PARQUET_TYPES = {
+    '_id': 'string',
+    'account_id': 'string',
+    'Date': 'timestamp[ms]',
+    'Amount': 'float64',
+    'Description': 'string',
+    'category': 'string',
+    'confidence': 'string',
+}
+
+
+async def iter_batches(cursor, batch_size):
+    while batch := await cursor.to_list(batch_size):
+        yield batch
+
+
+class Exporter:
+    name = None
+    media_type = None
+    extension = None
+    # Fields this format can hold, in output order
+    columns = EXPORT_COLUMNS
+
+    def select_columns(self, fields=None):
+        # Like /transactions/, ?fields= picks columns; _id is always kept
+        if not fields:
+            return list(self.columns)
+        return [column for column in self.columns if column == '_id' or column in fields]
+
+    async def iter_bytes(self, batches, columns):
+        raise NotImplementedError
+
+
+class CSVExporter(Exporter):
+    name = 'csv'
+    media_type = 'text/csv'
+    extension = 'csv'
+
+    @staticmethod
+    def cell(value):
+        if value is None:
+            return ''
+        if hasattr(value, 'isoformat'):
+            return value.isoformat()
+        return value
+
+    async def iter_bytes(self, batches, columns):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        async for batch in batches:
+            writer.writerows([[self.cell(doc.get(column)) for column in columns] for doc in batch])
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+        # An empty export is still a header row
+        if buffer.tell():
+            yield buffer.getvalue().encode()
+
+
+class NDJSONExporter(Exporter):
+    name = 'ndjson'
+    media_type = 'application/x-ndjson'
+    extension = 'ndjson'
+    columns = EXPORT_COLUMNS + ['raw']
+
+    async def iter_bytes(self, batches, columns):
+        async for batch in batches:
+            yield ndjson_lines(batch)
+
+
+class ParquetSink:
+    """File object that hands back whatever the Parquet writer wrote since the last drain."""
+
+    def __init__(self):
+        self.chunks = []
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+class ParquetExporter(Exporter):
+    name = 'parquet'
+    media_type = 'application/vnd.apache.parquet'
+    extension = 'parquet'
+
+    @staticmethod
+    def to_table(batch, schema):
+        import pyarrow as pa
+
+        columns = {}
+        for field in schema:
+            values = [doc.get(field.name) for doc in batch]
+            columns[field.name] = [str(value) for value in values] if field.name == '_id' else values
+        return pa.Table.from_pydict(columns, schema=schema)
+
+    def write_batch(self, writer, batch, schema):
+        writer.write_table(self.to_table(batch, schema))
+
+    async def iter_bytes(self, batches, columns):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = pa.schema([pa.field(column, PARQUET_TYPES[column]) for column in columns])
+        sink = ParquetSink()
+        writer = pq.ParquetWriter(sink, schema, compression='snappy')
+        async for batch in batches:
+            # Each batch becomes one row group; compression runs off the event loop
+            await asyncio.to_thread(self.write_batch, writer, batch, schema)
+            yield sink.drain()
+        # The footer, with the schema and row group offsets, comes last
+        writer.close()
+        yield sink.drain()
+
+
+EXPORTERS = [CSVExporter(), NDJSONExporter(), ParquetExporter()]
+EXPORTERS_BY_NAME = {exporter.name: exporter for exporter in EXPORTERS}
+
+
+def get_exporter(name):
+    return EXPORTERS_BY_NAME[name]
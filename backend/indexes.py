@@ -0,0 +1,117 @@
+# indexes.py
+# Declares the indexes behind every query shape in main.py and creates them at
+# startup. create_indexes is a no-op for indexes that already exist with the
+# same keys and options, so running this on every boot is safe.
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+TRANSACTION_INDEXES = [
+    # Transactions use the short field names from schema.py. The names differ
+    # from the indexes on the old long field names, which the migration drops.
+    # /transactions/ listing and pagination, the AI query context, the
+    # rollup rebuild and daily/weekly time series: match on user + account,
+    # newest first
+    IndexModel(
+        [('uid', ASCENDING), ('acct', ASCENDING), ('date', DESCENDING), ('_id', DESCENDING)],
+        name='uid_acct_date',
+    ),
+    # Expense-only queries (amt < 0), such as the merchant state rebuild
+    IndexModel(
+        [('uid', ASCENDING), ('acct', ASCENDING), ('amt', ASCENDING), ('cat', ASCENDING)],
+        name='uid_acct_amt_cat',
+    ),
+    # Needs-review queue, with or without an account filter
+    IndexModel(
+        [('uid', ASCENDING), ('conf', ASCENDING), ('acct', ASCENDING)],
+        name='uid_conf_acct',
+    ),
+    # Upload deduplication; rows stored before fingerprinting existed are left out
+    IndexModel(
+        [('fp', ASCENDING)],
+        name='fp',
+        unique=True,
+        partialFilterExpression={'fp': {'$exists': True}},
+    ),
+]
+
+UPLOAD_INDEXES = [
+    # Whole-file hashes of past uploads, to skip byte-identical re-uploads
+    IndexModel(
+        [('user_id', ASCENDING), ('account_id', ASCENDING), ('file_hash', ASCENDING)],
+        name='user_account_file_hash',
+        unique=True,
+    ),
+]
+
+UPLOAD_JOB_INDEXES = [
+    # Jobs left running by a crash or restart are found and failed while the API runs
+    IndexModel([('status', ASCENDING)], name='status'),
+]
+
+PROFILE_INDEXES = [
+    # Profile lookup by header, for this account first and then any account;
+    # one profile per (account, layout)
+    IndexModel(
+        [('user_id', ASCENDING), ('header_hash', ASCENDING), ('account_id', ASCENDING)],
+        name='user_header_account',
+        unique=True,
+    ),
+]
+
+MERCHANT_CATEGORY_INDEXES = [
+    # Shared merchant -> category answers from the AI categorizer
+    IndexModel([('merchant', ASCENDING)], name='merchant', unique=True),
+]
+
+CATEGORY_RULE_INDEXES = [
+    # One rule per (user, account, merchant); uploads load an account's rules
+    IndexModel(
+        [('user_id', ASCENDING), ('account_id', ASCENDING), ('merchant', ASCENDING)],
+        name='user_account_merchant',
+        unique=True,
+    ),
+]
+
+ROLLUP_INDEXES = [
+    # One document per (account, month, category) cell; upserts rely on it
+    IndexModel(
+        [('user_id', ASCENDING), ('account_id', ASCENDING), ('month', ASCENDING), ('category', ASCENDING)],
+        name='user_account_month_category',
+        unique=True,
+    ),
+]
+
+MERCHANT_STATS_INDEXES = [
+    # One running-state document per (account, merchant)
+    IndexModel(
+        [('user_id', ASCENDING), ('account_id', ASCENDING), ('merchant', ASCENDING)],
+        name='user_account_merchant',
+        unique=True,
+    ),
+]
+
+ACCOUNT_INDEXES = [
+    IndexModel([('user_id', ASCENDING)], name='user'),
+]
+
+# Indexes that older versions created and the ones above replace
+RETIRED_INDEXES = {
+    # Rules were one per (user, merchant) before they had an account
+    'category_rules': ['user_merchant'],
+}
+
+
+async def ensure_indexes(db):
+    for collection, names in RETIRED_INDEXES.items():
+        existing = [index['name'] async for index in await db[collection].list_indexes()]
+        for name in names:
+            if name in existing:
+                await db[collection].drop_index(name)
+    await db['transactions'].create_indexes(TRANSACTION_INDEXES)
+    await db['rollups'].create_indexes(ROLLUP_INDEXES)
+    await db['merchant_stats'].create_indexes(MERCHANT_STATS_INDEXES)
+    await db['uploads'].create_indexes(UPLOAD_INDEXES)
+    await db['upload_jobs'].create_indexes(UPLOAD_JOB_INDEXES)
+    await db['statement_profiles'].create_indexes(PROFILE_INDEXES)
+    await db['merchant_categories'].create_indexes(MERCHANT_CATEGORY_INDEXES)
+    await db['category_rules'].create_indexes(CATEGORY_RULE_INDEXES)
+    await db['accounts'].create_indexes(ACCOUNT_INDEXES)
@@ -0,0 +1,342 @@
+# ingest.py
+# Statement parsing, from raw statement rows to the records stored in the
+# transactions collection. File formats are handled by the readers in
+# readers.py, and descriptions are categorized by categories.py.
+#
+# Nothing here touches the web app or the database, so ingestion workers in
+# jobs.py can import it in a separate process without starting FastAPI.
+import collections
+import datetime
+import logging
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from categories import categorize_many, rule_categorizer
+from dedup import row_fingerprints
+from errors import UploadValidationError
+from metrics import StageTimer
+from readers import get_reader, sniff_reader
+from schema import STORE_RAW_COLUMNS, to_amount, to_date, to_raw_value
+
+logger = logging.getLogger(__name__)
+
+# All dates are stored in this ISO format
+ISO_DATE_FORMAT = '%Y-%m-%dT%H:%M:%S'
+YEAR_FIRST_DATE = re.compile(r'\d{4}[-/.]')
+
+# --- Helper function to parse date strings robustly ---
+def parse_date(date_str):
+    if pd.isna(date_str) or str(date_str).strip() == '':
+        return ''
+    # Excel, Parquet and Arrow files can hold real dates, which need no guessing
+    if isinstance(date_str, (datetime.date, np.datetime64)):
+        return pd.Timestamp(date_str).strftime(ISO_DATE_FORMAT)
+    date_str = str(date_str).strip().rstrip(',')
+    # Year-first dates are ISO style (year, month, day), never day-first
+    if YEAR_FIRST_DATE.match(date_str):
+        try:
+            return pd.to_datetime(date_str, dayfirst=False, errors='raise').strftime(ISO_DATE_FORMAT)
+        except (ValueError, OverflowError):
+            return ''
+    try:
+        dt = pd.to_datetime(date_str, dayfirst=True, errors='raise')
+        return dt.strftime(ISO_DATE_FORMAT)
+    except:
+        try:
+            dt = pd.to_datetime(date_str, dayfirst=False, errors='raise')
+            return dt.strftime(ISO_DATE_FORMAT)
+        except:
+            return ''
+
+# --- Vectorized date normalization ---
+# Formats tried when inferring a statement's date format. Only day-before-month
+# and year-first (ISO) layouts are listed, since those are the ones parse_date
+# always reads the same way; anything else goes through parse_date row by row.
+DATE_FORMAT_CANDIDATES = [
+    '%Y-%m-%d', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y/%m/%d',
+    '%d/%m/%Y', '%d-%m-%Y', '%d.%m.%Y',
+    '%d/%m/%Y %H:%M:%S', '%d/%m/%Y %H:%M', '%d-%m-%Y %H:%M:%S', '%d-%m-%Y %H:%M',
+    '%d %b %Y', '%d-%b-%Y', '%d/%b/%Y', '%d %B %Y', '%d-%B-%Y',
+]
+DATE_SAMPLE_SIZE = 50
+
+def clean_date_value(value):
+    return str(value).strip().rstrip(',')
+
+# --- Helper function to infer a statement's date format from a sample ---
+def infer_date_format(values):
+    sample = [v for v in pd.unique(pd.Series(values).dropna()) if clean_date_value(v)][:DATE_SAMPLE_SIZE]
+    if not sample:
+        return None
+    expected = pd.Series([parse_date(v) for v in sample])
+    cleaned = pd.Series([clean_date_value(v) for v in sample])
+    parseable = (expected != '').sum()
+    for date_format in DATE_FORMAT_CANDIDATES:
+        parsed = pd.to_datetime(cleaned, format=date_format, errors='coerce')
+        matched = parsed.notna()
+        # A format is only trusted if it agrees with parse_date wherever it applies
+        # and covers nearly all of the sample; stray junk rows are left to the fallback
+        if matched.sum() >= max(1, 0.9 * parseable) and (parsed[matched].dt.strftime(ISO_DATE_FORMAT) == expected[matched]).all():
+            return date_format
+    return None
+
+# --- Helper function to normalize a whole date column at once ---
+def normalize_dates(values, date_format=None):
+    values = pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.dt.strftime(ISO_DATE_FORMAT).astype(object).fillna('')
+    # A format saved in an older profile that is no longer a candidate is inferred again
+    if date_format not in DATE_FORMAT_CANDIDATES:
+        date_format = infer_date_format(values)
+
+    # Statements repeat the same dates many times, so work on distinct values
+    codes, uniques = pd.factorize(values)
+    results = pd.Series([''] * len(uniques), dtype=object)
+    cleaned = pd.Series([clean_date_value(v) for v in uniques], dtype=object)
+
+    remaining = cleaned != ''
+    if date_format is not None and remaining.any():
+        parsed = pd.to_datetime(cleaned, format=date_format, errors='coerce')
+        results[parsed.notna()] = parsed[parsed.notna()].dt.strftime(ISO_DATE_FORMAT)
+        remaining &= parsed.isna()
+
+    # Only the values that did not fit the inferred format are parsed one by one
+    for i in remaining[remaining].index:
+        results[i] = parse_date(uniques[i])
+
+    # Missing values have code -1; point them at a trailing empty string
+    lookup = np.append(results.to_numpy(dtype=object), '')
+    return pd.Series(lookup[codes], index=values.index, dtype=object)
+
+# --- Helper function to detect and map columns to standard names ---
+def detect_and_map_columns(df):
+    columns = df.columns.tolist()
+    mapping = {}
+
+    # Possible column names for each standard field (case insensitive)
+    date_candidates = ['date', 'transaction date', 'txn date']
+    amount_candidates = ['amount', 'txn amount', 'value']
+    description_candidates = ['description', 'narration', 'transaction details', 'particulars', 'notes', 'upi_reference']
+    transaction_type_candidates = ['transaction type', 'type', 'cr/dr', 'dr/cr']
+
+    for col in columns:
+        col_lower = col.lower().strip()
+        if any(candidate in col_lower for candidate in date_candidates) or 'date' in col_lower:
+            mapping['Date'] = col
+        elif any(candidate in col_lower for candidate in amount_candidates) or 'amount' in col_lower:
+            mapping['Amount'] = col
+        elif col_lower in description_candidates:
+            if 'Description' not in mapping:  # Take the first match
+                mapping['Description'] = col
+        elif any(candidate in col_lower for candidate in transaction_type_candidates) or 'type' in col_lower:
+            mapping['Transaction_Type'] = col
+
+    # Special handling: if no Description but UPI_Reference exists, use it
+    if 'Description' not in mapping:
+        for col in columns:
+            if 'upi' in col.lower() or 'reference' in col.lower():
+                mapping['Description'] = col
+                break
+
+    return mapping
+
+# --- Streaming upload settings ---
+# Number of CSV rows parsed into a DataFrame at a time
+UPLOAD_CHUNK_ROWS = int(os.environ.get("UPLOAD_CHUNK_ROWS", 20000))
+# Number of records sent to MongoDB per insert_many call
+UPLOAD_BATCH_SIZE = int(os.environ.get("UPLOAD_BATCH_SIZE", 5000))
+# Rows read to confirm a saved profile still fits a new upload
+PROFILE_CHECK_ROWS = int(os.environ.get("PROFILE_CHECK_ROWS", 1000))
+
+# Some bank exports put the header one column off; this undoes the shift
+SHIFTED_COLUMNS_FIX = {
+    'Date': 'Transaction Type',
+    'Transaction Type': 'Amount',
+    'Amount': 'UPI_Reference',
+    'UPI_Reference': 'Date',
+}
+
+# How a statement marks debits
+SIGN_SIGNED = 'signed'  # amounts already carry their sign
+SIGN_DEBIT_TYPE = 'debit_type'  # amounts are positive; DR rows in the type column are debits
+
+def detect_sign_convention(column_mapping):
+    return SIGN_DEBIT_TYPE if column_mapping.get('Transaction_Type') else SIGN_SIGNED
+
+# --- Helper function to detect the CR/DR column misalignment ---
+def has_shifted_columns(df):
+    # If the Date column holds 'CR'/'DR' values, the header is shifted
+    return 'Date' in df.columns and df['Date'].astype(str).str.upper().isin(['CR', 'DR']).any()
+
+# --- Helper function to turn one parsed chunk into database records ---
+# timer, a metrics.StageTimer, collects the time spent in each step; seen
+# carries the row counts for fingerprinting from one chunk to the next
+def process_chunk(df, column_mapping, account_id, date_format=None, sign_convention=None, rules=None, timer=None,
+                  seen=None):
+    timer = timer or StageTimer()
+    date_col = column_mapping['Date']
+    amount_col = column_mapping['Amount']
+    description_col = column_mapping['Description']
+    transaction_type_col = column_mapping.get('Transaction_Type')
+
+    with timer.stage('amounts'):
+        # Convert Amount to numeric
+        df[amount_col] = pd.to_numeric(df[amount_col], errors='coerce').fillna(0)
+
+        # Handle CR/DR format if Transaction_Type column exists
+        if sign_convention is None:
+            sign_convention = detect_sign_convention(column_mapping)
+        if sign_convention == SIGN_DEBIT_TYPE and transaction_type_col in df.columns:
+            df.loc[df[transaction_type_col] == 'DR', amount_col] *= -1
+
+    # Convert Date column to datetime and standardize
+    with timer.stage('dates'):
+        if date_col in df.columns:
+            df[date_col] = normalize_dates(df[date_col], date_format)
+
+    with timer.stage('records'):
+        # Fill NaNs here, at write time, so nothing read back from the database
+        # ever needs scrubbing before it is turned into JSON
+        df.fillna({amount_col: 0}, inplace=True)
+        df = df.astype(object).fillna('')
+        descriptions = df[description_col].astype(str)
+
+    with timer.stage('categorize'):
+        categories, confidences = categorize_many(descriptions, rules)
+
+    with timer.stage('records'):
+        fingerprints = row_fingerprints(account_id, df[date_col], df[amount_col], descriptions, seen)
+
+        # Columns already stored as date/amt/desc are not kept again under raw
+        mapped_columns = {date_col, amount_col, description_col, transaction_type_col}
+        raw_columns = [col for col in df.columns if col not in mapped_columns] if STORE_RAW_COLUMNS else []
+        raw_rows = df[raw_columns].to_dict('records') if raw_columns else None
+
+        records = []
+        for i, (date, amount, description, category, confidence, fingerprint) in enumerate(
+                zip(df[date_col], df[amount_col], descriptions, categories, confidences, fingerprints)):
+            record = {
+                'uid': "placeholder_user",
+                'acct': account_id,
+                'date': to_date(date),
+                'amt': to_amount(amount),
+                'desc': description,
+                'cat': category,
+                'conf': confidence,
+                'fp': fingerprint,
+            }
+            if raw_rows:
+                # Typed cells (and list cells, which cannot be compared to '') are converted
+                raw = {column: to_raw_value(value) for column, value in raw_rows[i].items()
+                       if not isinstance(value, str) or value}
+                if raw:
+                    record['raw'] = raw
+            records.append(record)
+    return records
+
+# --- Helper function to read just a statement's format and header row ---
+def statement_header(source):
+    reader = sniff_reader(source)
+    return reader.name, [str(col).strip() for col in reader.read_columns(source)]
+
+# --- Helper function to work out a statement's layout from its first rows ---
+def inspect_statement(source, sample_rows=None):
+    reader = sniff_reader(source)
+    df = next(reader.iter_chunks(source, sample_rows or UPLOAD_CHUNK_ROWS, nrows=sample_rows or UPLOAD_CHUNK_ROWS))
+    df.columns = [str(col).strip() for col in df.columns]
+
+    column_renames = SHIFTED_COLUMNS_FIX if has_shifted_columns(df) else {}
+    df.rename(columns=column_renames, inplace=True)
+    column_mapping = detect_and_map_columns(df)
+    logger.debug("Detected statement layout", extra={'format': reader.name, 'column_mapping': column_mapping})
+
+    # Validate required columns
+    required_columns = ['Date', 'Amount', 'Description']
+    missing_columns = [col for col in required_columns if col not in column_mapping]
+    if missing_columns:
+        raise UploadValidationError(f"Required columns not found: {missing_columns}. Available columns: {df.columns.tolist()}")
+
+    return {
+        'format': reader.name,
+        'column_mapping': column_mapping,
+        'column_renames': column_renames,
+        'sign_convention': detect_sign_convention(column_mapping),
+        'date_format': infer_date_format(df[column_mapping['Date']]),
+    }
+
+# --- Helpers to split a statement between workers without splitting a date ---
+# Identical rows are only numbered within one worker's range, so a range may
+# only start where a new date starts. That is safe when every date value
+# sits in one contiguous run of rows, as in a statement sorted by date.
+def source_date_column(settings):
+    # The date column under its name in the file, before any shift fix
+    date_col = settings['column_mapping']['Date']
+    original = {new: old for old, new in settings['column_renames'].items()}
+    return original.get(date_col, date_col)
+
+def date_run_starts(values):
+    # Row numbers where a new date starts, or None if a date comes back later.
+    # Blank lines (nulls) neither start nor break a run
+    values = pd.Series(values).reset_index(drop=True)
+    dated = values[values.notna()]
+    codes, uniques = pd.factorize(dated)
+    if len(codes) == 0:
+        return np.array([0])
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    return dated.index.to_numpy()[starts] if len(starts) == len(uniques) else None
+
+# --- Helper function to check saved settings against a statement's first rows ---
+# A saved profile is keyed by the header alone, and a correctly aligned file
+# can have the same header as a shifted one, so the shift fix is confirmed
+# from the data before it is reused
+def settings_fit(source, settings, sample_rows=None):
+    reader = get_reader(settings['format'])
+    sample_rows = sample_rows or PROFILE_CHECK_ROWS
+    df = next(reader.iter_chunks(source, sample_rows, nrows=sample_rows))
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    df.columns = [str(col).strip() for col in df.columns]
+    return has_shifted_columns(df) == bool(settings['column_renames'])
+
+# --- Helper function to stream an uploaded statement as fixed-size record batches ---
+# skip_rows and nrows select a range of data rows (the header is always kept),
+# which is how a large file is split between ingestion workers (see
+# date_run_starts for where a range may start)
+def iter_upload_batches(source, account_id, settings=None, skip_rows=0, nrows=None, chunk_rows=None, batch_size=None,
+                        rules=None, timer=None):
+    timer = timer or StageTimer()
+    chunk_rows = chunk_rows or UPLOAD_CHUNK_ROWS
+    batch_size = batch_size or UPLOAD_BATCH_SIZE
+    # The user's category rules are compiled once for the whole file
+    user_rules = rule_categorizer(rules)
+    # Identical rows are numbered across chunks, not within each one
+    seen = collections.Counter()
+
+    # The format, header and column mapping are the same for every chunk, so
+    # they come from a saved statement profile or are worked out once, up front
+    if settings is None:
+        settings = inspect_statement(source)
+        if hasattr(source, 'seek'):
+            source.seek(0)
+    column_mapping = settings['column_mapping']
+
+    reader = get_reader(settings['format'])
+    chunks = reader.iter_chunks(source, chunk_rows, skip_rows, nrows)
+    while True:
+        # Decoding and parsing happen together, as the reader pulls the next chunk
+        with timer.stage('read'):
+            df = next(chunks, None)
+        if df is None:
+            break
+        if df.empty:
+            continue
+        df.columns = [str(col).strip() for col in df.columns]
+        df.rename(columns=settings['column_renames'], inplace=True)
+
+        records = process_chunk(df, column_mapping, account_id, settings['date_format'], settings['sign_convention'], user_rules, timer,
+                                seen)
+        for start in range(0, len(records), batch_size):
+            yield records[start:start + batch_size]
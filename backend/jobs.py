@@ -0,0 +1,391 @@
+# jobs.py
+# Background ingestion of uploaded statements.
+#
+# /uploadfile/ only spools the file to disk and queues a job. Parsing,
+# categorization and the database writes run in a pool of worker processes,
+# so a large upload never blocks the event loop serving everyone else. Big
+# files are split into row ranges that are ingested in parallel; each worker
+# reports its progress on the job document, which /uploads/{job_id} returns.
+#
+# Rollup deltas are $inc operations, so workers apply them directly in any
+# order. Merchant states are not commutative in the same way, so workers hand
+# their partial states back and the coordinator merges them in date order.
+#
+# Set UPLOAD_WORKERS=0 to run jobs on a thread of the API process instead,
+# e.g. in tests or on a machine with a single core.
+#
+# The parsing stack (ingest.py, readers.py: pandas, pyarrow, openpyxl) is
+# only imported inside the functions that run on a worker, so the API
+# process starts without it.
+import asyncio
+import bisect
+import datetime
+import logging
+import math
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from bson import ObjectId
+
+from database import MONGO_DB_NAME, create_sync_client
+from ai_categorize import MERCHANT_CATEGORY_COLLECTION, AICategorizer, ai_enabled, create_model, new_ai_stats
+from dedup import upsert_batch
+from errors import UploadValidationError
+from logs import configure_logging
+from metrics import GEMINI_CATEGORIZE_CALLS, GEMINI_CATEGORIZE_SECONDS, UPLOAD_STAGE_SECONDS, UPLOADS, StageTimer
+from profiles import find_profile, header_fingerprint, profile_settings, save_profile
+from rules import load_rules
+from rollups import ROLLUP_COLLECTION, rollup_deltas, rollup_update_ops
+from subscriptions import batch_states, combine_partials, update_merchant_stats
+
+UPLOAD_SPOOL_DIR = os.environ.get("UPLOAD_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "finance_tracker_uploads"))
+# Leave one core for the API process itself
+UPLOAD_WORKERS = int(os.environ.get("UPLOAD_WORKERS", max(1, (os.cpu_count() or 2) - 1)))
+# Files with more data rows than this are split between workers
+UPLOAD_SPLIT_ROWS = int(os.environ.get("UPLOAD_SPLIT_ROWS", 50000))
+# A running job's coordinator refreshes heartbeat_at this often; a queued or
+# running job whose heartbeat is older than JOB_STALE_SECONDS lost its
+# process (a crash or restart) and is failed by whichever API process sees it
+JOB_HEARTBEAT_SECONDS = int(os.environ.get("JOB_HEARTBEAT_SECONDS", 30))
+JOB_STALE_SECONDS = int(os.environ.get("JOB_STALE_SECONDS", 300))
+
+JOB_COLLECTION = 'upload_jobs'
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+logger = logging.getLogger(__name__)
+
+executor = None
+# Coordinator tasks, referenced here so they are not garbage collected mid-run
+running_jobs = set()
+# One blocking client and one AI categorizer per worker process, created on first use
+worker_client = None
+worker_ai_categorizer = None
+
+
+def get_executor():
+    global executor
+    if executor is None and UPLOAD_WORKERS > 0:
+        # Spawned rather than forked: the API process has a running event
+        # loop and client threads that must not be copied into the workers
+        executor = ProcessPoolExecutor(max_workers=UPLOAD_WORKERS, mp_context=multiprocessing.get_context('spawn'),
+                                       initializer=configure_logging)
+    return executor
+
+
+def shutdown_workers():
+    global executor
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+        executor = None
+
+
+async def run_in_worker(func, *args):
+    # With no process pool, the event loop's default thread pool is used
+    return await asyncio.get_running_loop().run_in_executor(get_executor(), func, *args)
+
+
+def now():
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+# --- Worker: read a spooled statement's format and column names ---
+def read_header(path):
+    from ingest import statement_header
+
+    return statement_header(path)
+
+
+# --- Worker: work out a spooled statement's layout from its first rows ---
+# saved are a profile's settings, used if the first rows agree with them;
+# returns the settings and whether the saved ones were used
+def read_settings(path, saved=None):
+    from ingest import inspect_statement, settings_fit
+
+    if saved is not None and settings_fit(path, saved):
+        return saved, True
+    return inspect_statement(path), False
+
+
+# --- Worker: count a spooled statement's rows and how to split them ---
+def plan_parts(path, settings):
+    from ingest import date_run_starts, source_date_column
+    from readers import get_reader
+
+    reader = get_reader(settings['format'])
+    # Formats that can only be read from the start go to a single worker
+    if not reader.splittable:
+        total_rows = reader.count_rows(path)
+        return total_rows, split_row_ranges(total_rows, 1)
+    dates = reader.read_column(path, source_date_column(settings))
+    boundaries = date_run_starts(dates)
+    # A statement whose dates are not grouped together is read by one worker
+    return len(dates), split_row_ranges(len(dates), None if boundaries is not None else 1, boundaries=boundaries)
+
+
+# --- Helper function to split a file's rows between the workers ---
+# With boundaries (sorted row numbers), every range starts on one of them
+def split_row_ranges(total_rows, workers=None, min_rows=None, boundaries=None):
+    workers = max(1, workers if workers is not None else UPLOAD_WORKERS)
+    min_rows = min_rows or UPLOAD_SPLIT_ROWS
+    parts = max(1, min(workers, math.ceil(total_rows / min_rows)))
+    size = math.ceil(total_rows / parts) if total_rows else 0
+    starts = [part * size for part in range(parts)]
+    if boundaries is not None:
+        # Each part after the first moves forward to the next boundary
+        snapped = {0}
+        for start in starts[1:]:
+            index = bisect.bisect_left(boundaries, start)
+            if index < len(boundaries):
+                snapped.add(int(boundaries[index]))
+        starts = sorted(snapped)
+    # The last part reads to the end, in case a row count was an estimate
+    return [(start, end - start) for start, end in zip(starts, starts[1:])] + [(starts[-1], None)]
+
+
+def worker_db():
+    global worker_client
+    if worker_client is None:
+        worker_client = create_sync_client()
+    return worker_client[MONGO_DB_NAME]
+
+
+def worker_ai():
+    global worker_ai_categorizer
+    if worker_ai_categorizer is None and ai_enabled():
+        worker_ai_categorizer = AICategorizer(create_model(), worker_db()[MERCHANT_CATEGORY_COLLECTION])
+    return worker_ai_categorizer
+
+
+# --- Worker: ingest one row range of a spooled statement ---
+def ingest_part(path, account_id, job_id, settings, rules, skip_rows=0, nrows=None):
+    from ingest import iter_upload_batches
+
+    db = worker_db()
+    ai = worker_ai()
+    partials = {}
+    timer = StageTimer()
+    for batch in iter_upload_batches(path, account_id, settings=settings, skip_rows=skip_rows, nrows=nrows, rules=rules, timer=timer):
+        # Merchants the keyword rules missed are categorized before insert,
+        # so the rollups and merchant states see the final categories
+        with timer.stage('ai_categorize'):
+            ai_stats = ai.categorize_records(batch) if ai else {}
+        # Rows already stored from an overlapping statement are skipped,
+        # and only new rows feed the rollups and merchant states
+        with timer.stage('insert'):
+            inserted = upsert_batch(db['transactions'], batch)
+        with timer.stage('rollups'):
+            ops = rollup_update_ops(account_id, rollup_deltas(inserted))
+            if ops:
+                db[ROLLUP_COLLECTION].bulk_write(ops, ordered=False)
+            partials = combine_partials(partials, batch_states(inserted))
+        db[JOB_COLLECTION].update_one({'_id': ObjectId(job_id)}, {'$inc': {
+            'rows_parsed': len(batch),
+            'rows_inserted': len(inserted),
+            'duplicates': len(batch) - len(inserted),
+            **{f'ai.{name}': value for name, value in ai_stats.items()},
+            **timing_increments(timer),
+        }})
+    # Reading past the last batch takes time too
+    db[JOB_COLLECTION].update_one({'_id': ObjectId(job_id)}, {'$inc': timing_increments(timer)})
+    return partials
+
+
+def timing_increments(timer):
+    return {f'timings.{stage}': seconds for stage, seconds in timer.drain().items()}
+
+
+# --- Helper function to queue a job for an uploaded file ---
+async def start_upload_job(db, cache, fileobj, filename, account_id, file_hash):
+    job_id = ObjectId()
+    os.makedirs(UPLOAD_SPOOL_DIR, exist_ok=True)
+    # The format is sniffed from the contents, so the name needs no extension
+    path = os.path.join(UPLOAD_SPOOL_DIR, str(job_id))
+
+    def spool():
+        fileobj.seek(0)
+        with open(path, 'wb') as out:
+            shutil.copyfileobj(fileobj, out)
+
+    await asyncio.to_thread(spool)
+    await db[JOB_COLLECTION].insert_one({
+        '_id': job_id,
+        'user_id': 'placeholder_user',
+        'account_id': account_id,
+        'file_name': filename,
+        'file_hash': file_hash,
+        'status': JOB_QUEUED,
+        'rows_total': 0,
+        'rows_parsed': 0,
+        'rows_inserted': 0,
+        'duplicates': 0,
+        'parts': 0,
+        'ai': new_ai_stats(),
+        'timings': {},
+        'errors': [],
+        'created_at': now(),
+        'heartbeat_at': now(),
+    })
+    task = asyncio.create_task(run_upload_job(db, cache, job_id, path, account_id, file_hash))
+    running_jobs.add(task)
+    task.add_done_callback(running_jobs.discard)
+    return job_id
+
+
+# --- Coordinator: runs in the API process and drives the workers ---
+async def run_upload_job(db, cache, job_id, path, account_id, file_hash):
+    jobs = db[JOB_COLLECTION]
+    errors = []
+    timer = StageTimer()
+    start = time.perf_counter()
+    heartbeat = asyncio.create_task(keep_alive(jobs, job_id))
+    try:
+        await jobs.update_one({'_id': job_id}, {'$set': {'status': JOB_RUNNING, 'started_at': now()}})
+        with timer.stage('inspect'):
+            format_name, columns = await run_in_worker(read_header, path)
+            header_hash = header_fingerprint(format_name, columns)
+            profile = await find_profile(db, account_id, header_hash)
+            # A known layout that fits the data skips the column heuristics and date-format inference
+            settings, reused = await run_in_worker(read_settings, path, profile_settings(profile) if profile else None)
+        with timer.stage('count'):
+            total_rows, ranges = await run_in_worker(plan_parts, path, settings)
+        # The account's category rules, read once and shipped to every worker
+        rules = await load_rules(db, account_id)
+        await jobs.update_one({'_id': job_id}, {'$set': {
+            'rows_total': total_rows,
+            'parts': len(ranges),
+            'format': settings['format'],
+            'column_mapping': settings['column_mapping'],
+            'profile': 'reused' if reused else 'detected',
+        }})
+
+        results = await asyncio.gather(
+            *(run_in_worker(ingest_part, path, account_id, str(job_id), settings, rules, skip_rows, nrows) for skip_rows, nrows in ranges),
+            return_exceptions=True,
+        )
+        partials = {}
+        for result in results:
+            if isinstance(result, BaseException):
+                errors.append(f"{type(result).__name__}: {result}")
+            else:
+                partials = combine_partials(partials, result)
+        # Rows written by the parts that succeeded still count
+        with timer.stage('merchant_stats'):
+            await update_merchant_stats(db, account_id, partials)
+
+        # Remember the detected column mapping on the account
+        if ObjectId.is_valid(account_id):
+            await db['accounts'].update_one({'_id': ObjectId(account_id)}, {'$set': {'column_mapping': settings['column_mapping']}})
+    except UploadValidationError as e:
+        errors.append(str(e))
+    except Exception as e:
+        logger.exception("Upload job failed", extra={'job_id': str(job_id), 'account_id': account_id})
+        errors.append(str(e))
+    finally:
+        heartbeat.cancel()
+        job = await jobs.find_one({'_id': job_id})
+        # Even a partly failed upload may have written rows
+        if job['rows_inserted']:
+            await cache.bump_version(account_id)
+        if not errors and not job['rows_parsed']:
+            errors.append("No records to save.")
+        if not errors:
+            # A layout that uploaded cleanly becomes (or refreshes) the account's profile
+            await save_profile(db, account_id, header_hash, columns, settings)
+            await db['uploads'].update_one(
+                {'user_id': 'placeholder_user', 'account_id': account_id, 'file_hash': file_hash},
+                {'$set': {'rows': job['rows_parsed'], 'inserted': job['rows_inserted']}},
+                upsert=True,
+            )
+        status = JOB_FAILED if errors else JOB_DONE
+        timings = {**timer.drain(), 'total': time.perf_counter() - start}
+        await jobs.update_one({'_id': job_id}, {
+            '$set': {'status': status, 'errors': errors, 'finished_at': now()},
+            '$inc': {f'timings.{stage}': seconds for stage, seconds in timings.items()},
+        })
+        for stage, seconds in (job.get('timings') or {}).items():
+            timings[stage] = timings.get(stage, 0.0) + seconds
+        record_job_metrics(status, timings, job.get('ai') or {})
+        logger.info("Upload job finished", extra={
+            'job_id': str(job_id), 'status': status, 'rows_parsed': job['rows_parsed'],
+            'rows_inserted': job['rows_inserted'], 'timings': {stage: round(seconds, 3) for stage, seconds in timings.items()},
+        })
+        await asyncio.to_thread(remove_spool_file, path)
+
+
+def record_job_metrics(status, timings, ai_stats):
+    UPLOADS.inc(status=status)
+    for stage, seconds in timings.items():
+        UPLOAD_STAGE_SECONDS.observe(seconds, stage=stage)
+    GEMINI_CATEGORIZE_CALLS.inc(ai_stats.get('api_calls', 0))
+    GEMINI_CATEGORIZE_SECONDS.inc(ai_stats.get('api_seconds', 0.0))
+
+
+def remove_spool_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+# --- Helpers to tell live jobs from ones a crash or restart left unfinished ---
+async def keep_alive(jobs, job_id):
+    while True:
+        await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+        await jobs.update_one({'_id': job_id}, {'$set': {'heartbeat_at': now()}})
+
+
+# Only jobs nobody has touched for JOB_STALE_SECONDS are failed, so jobs run
+# by other API processes (several uvicorn workers, a rolling restart) are left alone
+async def fail_stale_jobs(db):
+    cutoff = now() - datetime.timedelta(seconds=JOB_STALE_SECONDS)
+    await db[JOB_COLLECTION].update_many(
+        # A missing heartbeat (a job queued before heartbeats) counts as stale
+        {'status': {'$in': [JOB_QUEUED, JOB_RUNNING]}, 'heartbeat_at': {'$not': {'$gte': cutoff}}},
+        {'$set': {'status': JOB_FAILED, 'errors': ["Interrupted by a server restart, please upload again."], 'finished_at': now()}},
+    )
+
+
+# --- Background task: keep failing stale jobs while the API runs ---
+# A job whose process died just before this one started is not stale yet at startup
+async def watch_stale_jobs(db):
+    while True:
+        try:
+            await fail_stale_jobs(db)
+        except Exception:
+            logger.exception("Failing stale upload jobs failed")
+        await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+
+
+def ai_summary(stats):
+    lookups = stats['cache_hits'] + stats['cache_misses']
+    return {**stats, 'cache_hit_rate': stats['cache_hits'] / lookups if lookups else 0.0}
+
+
+def job_summary(job):
+    return {
+        'job_id': str(job['_id']),
+        'account_id': job['account_id'],
+        'file_name': job.get('file_name'),
+        'format': job.get('format'),
+        'profile': job.get('profile'),
+        'status': job['status'],
+        'rows_total': job['rows_total'],
+        'rows_parsed': job['rows_parsed'],
+        'rows_inserted': job['rows_inserted'],
+        'duplicates': job['duplicates'],
+        'parts': job['parts'],
+        'ai_categorization': ai_summary(job.get('ai') or new_ai_stats()),
+        # Seconds per stage, summed over the parts that ran in parallel
+        'timings': job.get('timings') or {},
+        'errors': job['errors'],
+        'created_at': job['created_at'],
+        'started_at': job.get('started_at'),
+        'finished_at': job.get('finished_at'),
+    }
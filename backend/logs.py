@@ -0,0 +1,60 @@
+# logs.py
+# Logging setup for the API process and the upload workers.
+#
+# Modules log through logging.getLogger(__name__) and pass structured fields
+# with extra={...}. Records below LOG_LEVEL are dropped before any message
+# is formatted, so debug logging costs nothing when it is off. LOG_FORMAT=json
+# writes one JSON object per line for log collectors; the default text format
+# appends the fields as key=value pairs.
+import datetime
+import json
+import logging
+import os
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "text")
+
+# Attributes every LogRecord has; anything else came in through extra=
+STANDARD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+
+def record_fields(record):
+    return {key: value for key, value in vars(record).items() if key not in STANDARD_ATTRIBUTES}
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        line = super().format(record)
+        fields = record_fields(record)
+        if fields:
+            line += ' ' + ' '.join(f"{key}={json.dumps(value, default=str)}" for key, value in fields.items())
+        return line
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'time': datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            **record_fields(record),
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging():
+    root = logging.getLogger()
+    # Configured once per process, however many modules ask
+    if getattr(root, 'finance_tracker_configured', False):
+        return
+    handler = logging.StreamHandler()
+    if LOG_FORMAT == 'json':
+        handler.setFormatter(JSONFormatter())
+    else:
+        handler.setFormatter(TextFormatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+    root.addHandler(handler)
+    root.setLevel(LOG_LEVEL)
+    root.finance_tracker_configured = True
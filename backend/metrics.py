@@ -0,0 +1,210 @@
+# metrics.py
+# Latency histograms and counters, served on /metrics in the Prometheus text
+# format.
+#
+# What is measured:
+#   http_request_duration_seconds     every request, by method, route template
+#                                     and status, until the last body byte
+#   mongodb_command_duration_seconds  every command the API's client sends,
+#                                     from a PyMongo command listener
+#   upload_stage_duration_seconds     per upload, the time spent in each
+#                                     stage (read, dates, categorize, insert...)
+#   gemini_request_duration_seconds   /analytics/query model calls
+#   gemini_categorize_*_total         AI categorization calls made by the
+#                                     upload workers, reported per finished job
+#
+# Upload workers run in other processes, so their stage timings travel back
+# on the job document (see jobs.py) and are recorded here when the job ends.
+# Metrics are kept per API process.
+import threading
+import time
+from contextlib import contextmanager
+
+from pymongo import monitoring
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def key(self, labels):
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        with self.lock:
+            for values, state in sorted(self.series.items()):
+                lines.extend(self.render_series(values, state))
+        return lines
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.series[key] = self.series.get(key, 0) + amount
+
+    def render_series(self, values, total):
+        return [f"{self.name}{format_labels(self.label_names, values)} {total}"]
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self.key(labels)
+        with self.lock:
+            state = self.series.get(key)
+            if state is None:
+                state = self.series[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['counts'][i] += 1
+                    break
+            state['sum'] += value
+            state['count'] += 1
+
+    def render_series(self, values, state):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, state['counts']):
+            cumulative += count
+            lines.append(f"{self.name}_bucket{format_labels(self.label_names, values, ('le', bound))} {cumulative}")
+        lines.append(f"{self.name}_bucket{format_labels(self.label_names, values, ('le', '+Inf'))} {state['count']}")
+        lines.append(f"{self.name}_sum{format_labels(self.label_names, values)} {state['sum']}")
+        lines.append(f"{self.name}_count{format_labels(self.label_names, values)} {state['count']}")
+        return lines
+
+
+HTTP_REQUEST_SECONDS = Histogram(
+    'http_request_duration_seconds', "HTTP request latency, until the last byte of the response.", ['method', 'route', 'status'])
+MONGO_COMMAND_SECONDS = Histogram(
+    'mongodb_command_duration_seconds', "MongoDB command latency as seen by the driver.", ['command', 'outcome'])
+UPLOAD_STAGE_SECONDS = Histogram(
+    'upload_stage_duration_seconds', "Seconds spent in each stage of one upload, summed over its parts.", ['stage'])
+GEMINI_REQUEST_SECONDS = Histogram(
+    'gemini_request_duration_seconds', "Gemini call latency from the API process.", ['purpose', 'outcome'])
+GEMINI_CATEGORIZE_CALLS = Counter(
+    'gemini_categorize_calls_total', "Gemini calls made by upload workers to categorize merchants.")
+GEMINI_CATEGORIZE_SECONDS = Counter(
+    'gemini_categorize_seconds_total', "Seconds upload workers spent waiting on Gemini to categorize merchants.")
+UPLOADS = Counter('uploads_total', "Finished upload jobs, by status.", ['status'])
+
+REGISTRY = [
+    HTTP_REQUEST_SECONDS,
+    MONGO_COMMAND_SECONDS,
+    UPLOAD_STAGE_SECONDS,
+    GEMINI_REQUEST_SECONDS,
+    GEMINI_CATEGORIZE_CALLS,
+    GEMINI_CATEGORIZE_SECONDS,
+    UPLOADS,
+]
+
+
+def render_metrics():
+    return '\n'.join(line for metric in REGISTRY for line in metric.render()) + '\n'
+
+
+class StageTimer:
+    """Adds up the wall time spent in each named stage of a piece of work."""
+
+    def __init__(self):
+        self.seconds = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] = self.seconds.get(name, 0.0) + time.perf_counter() - start
+
+    def drain(self):
+        # Returns the timings so far and starts again from zero
+        seconds, self.seconds = self.seconds, {}
+        return seconds
+
+
+@contextmanager
+def timed(histogram, **labels):
+    # Records how long the block took, with outcome="error" if it raised
+    start = time.perf_counter()
+    outcome = 'ok'
+    try:
+        yield
+    except BaseException:
+        outcome = 'error'
+        raise
+    finally:
+        histogram.observe(time.perf_counter() - start, outcome=outcome, **labels)
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_COMMAND_SECONDS.observe(event.duration_micros / 1e6, command=event.command_name, outcome='ok')
+
+    def failed(self, event):
+        MONGO_COMMAND_SECONDS.observe(event.duration_micros / 1e6, command=event.command_name, outcome='error')
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing each request until its response is fully sent.
+
+    Requests are labelled with the route template (/transactions/{transaction_id}),
+    not the raw path, so the number of series stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_and_record_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_record_status)
+        finally:
+            # The router stores the matched route on the scope
+            route = scope.get('route')
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - start,
+                method=scope['method'],
+                route=getattr(route, 'path', 'unmatched'),
+                status=status,
+            )
@@ -0,0 +1,68 @@
+# profiles.py
+# Statement profiles: how to read one bank's export, learned once.
+#
+# A profile is keyed by a fingerprint of the statement's format and header
+# row and stores everything the upload path would otherwise work out from
+# the data: the column mapping, the header shift fix, the sign convention
+# and the date format. The first successful upload of a new layout saves
+# its profile for the account; later uploads with the same header skip the
+# column heuristics and date-format inference. A layout already known from
+# another of the user's accounts (the same bank) is reused too. The header
+# alone cannot tell a shifted export from an aligned one with the same
+# column names, so the first rows are checked against the saved shift fix
+# (ingest.settings_fit), and the layout is detected again if they disagree.
+#
+# A wrong profile can be deleted through the API, and the next upload
+# learns it again from the data.
+import datetime
+import hashlib
+
+PROFILE_COLLECTION = 'statement_profiles'
+# Settings stored on a profile, as produced by ingest.inspect_statement
+PROFILE_FIELDS = ['format', 'column_mapping', 'column_renames', 'sign_convention', 'date_format']
+
+
+# --- Helper function to fingerprint a statement layout ---
+def header_fingerprint(format_name, columns):
+    # The mapping refers to exact column names, so only stray spaces are ignored
+    normalized = '\x1f'.join(str(col).strip() for col in columns)
+    return hashlib.sha1(f"{format_name}\x1e{normalized}".encode()).hexdigest()
+
+
+# --- Helper function to find the profile for an upload ---
+async def find_profile(db, account_id, header_hash, user_id='placeholder_user'):
+    profile = await db[PROFILE_COLLECTION].find_one({'user_id': user_id, 'header_hash': header_hash, 'account_id': account_id})
+    if profile is None:
+        # Another account with the same bank layout
+        profile = await db[PROFILE_COLLECTION].find_one({'user_id': user_id, 'header_hash': header_hash})
+    return profile
+
+
+def profile_settings(profile):
+    return {field: profile[field] for field in PROFILE_FIELDS}
+
+
+# --- Helper function to save (or refresh) an account's profile after an upload ---
+async def save_profile(db, account_id, header_hash, columns, settings, user_id='placeholder_user'):
+    now = datetime.datetime.now(datetime.timezone.utc)
+    await db[PROFILE_COLLECTION].update_one(
+        {'user_id': user_id, 'header_hash': header_hash, 'account_id': account_id},
+        {
+            '$set': {**profile_settings(settings), 'columns': list(columns), 'last_used_at': now},
+            '$setOnInsert': {'created_at': now},
+            '$inc': {'uploads': 1},
+        },
+        upsert=True,
+    )
+
+
+def profile_summary(profile):
+    return {
+        '_id': str(profile['_id']),
+        'account_id': profile['account_id'],
+        'columns': profile['columns'],
+        **profile_settings(profile),
+        'uploads': profile['uploads'],
+        'created_at': profile['created_at'],
+        'last_used_at': profile['last_used_at'],
+    }
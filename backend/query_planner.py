@@ -0,0 +1,331 @@
+# query_planner.py
+# Turns a natural-language question into a database query for /analytics/query.
+#
+# Instead of pasting the latest rows into the prompt and hoping they cover the
+# question, the question is first parsed into a plan: a date range, a merchant
+# or category filter and whether it is about spending or income. The plan is
+# answered with one aggregation (from the monthly rollups when it lines up
+# with whole months and has no merchant filter, otherwise from the raw
+# transactions), and the prompt gets the totals, per-category and per-month
+# breakdowns and a handful of matching rows. The prompt stays small however
+# much history the question covers.
+import calendar
+import datetime
+import re
+
+from categories import MERCHANT_CATEGORY_MAP
+from rollups import ROLLUP_COLLECTION, UNDATED_MONTH
+from schema import as_float
+
+FALLBACK_CATEGORY = 'Miscellaneous'
+CATEGORIES = sorted(set(MERCHANT_CATEGORY_MAP.values())) + [FALLBACK_CATEGORY]
+# Other ways people name the categories
+CATEGORY_SYNONYMS = {
+    'grocery': 'Groceries',
+    'bills': 'Bills & Subscriptions',
+    'bill': 'Bills & Subscriptions',
+    'subscriptions': 'Bills & Subscriptions',
+    'subscription': 'Bills & Subscriptions',
+    'misc': FALLBACK_CATEGORY,
+}
+# Merchant names the keyword rules know about
+KNOWN_MERCHANTS = sorted({
+    keyword
+    for pattern in MERCHANT_CATEGORY_MAP
+    for keyword in re.sub(r"^\\b\(\?:|\)\\b$|^\\b|\\b$", "", pattern).split('|')
+    if re.fullmatch(r"[\w ]+", keyword)
+})
+
+SPENDING_WORDS = {'spend', 'spent', 'spending', 'expense', 'expenses', 'pay', 'paid', 'cost', 'costs', 'bought', 'buy', 'purchase', 'purchases'}
+INCOME_WORDS = {'earn', 'earned', 'income', 'received', 'receive', 'salary', 'credited', 'credit', 'refund', 'refunds'}
+# Words that end a merchant name in "on X", "at X", "from X"
+STOP_WORDS = {
+    'this', 'last', 'past', 'in', 'during', 'since', 'for', 'over', 'the', 'a', 'an', 'and', 'or', 'so', 'far',
+    'year', 'month', 'week', 'today', 'yesterday', 'ytd', 'per', 'each', 'every', 'by', 'total', 'overall',
+    'i', 'me', 'my', 'we', 'did', 'do', 'have', 'has', 'was', 'were', 'is', 'are',
+}
+MERCHANT_PREFIX = re.compile(r"\b(?:on|at|from|to|with)\s+([a-z][\w&'-]*(?:\s+[a-z][\w&'-]*){0,2})")
+MONTHS = {name.lower(): i for i, name in enumerate(calendar.month_name) if name}
+MONTHS.update({name.lower(): i for i, name in enumerate(calendar.month_abbr) if name})
+MONTH_PATTERN = '|'.join(sorted(MONTHS, key=len, reverse=True))
+RELATIVE_RANGE = re.compile(r"\b(?:last|past|previous)\s+(\d+)\s+(day|week|month|year)s?\b")
+# Month words are also ordinary words ("how much may I spend"), so one only
+# counts as a date after a preposition or before a year, and never as "may be"
+MONTH_RANGE = re.compile(
+    rf"\b(?:(since)|in|for|during|of|from|until|till|through)\s+({MONTH_PATTERN})\b(?:\s+(\d{{4}})\b)?(?!\s+(?:be|have|not)\b)"
+    rf"|\b({MONTH_PATTERN})\s+(\d{{4}})\b"
+)
+YEAR = re.compile(r"\b(19\d{2}|20\d{2})\b")
+
+# Matching rows quoted in the prompt, most recent first
+SAMPLE_SIZE = 10
+# Largest expenses quoted in the prompt for spending questions
+TOP_EXPENSES = 5
+
+
+def normalize_question(question):
+    return ' '.join(re.sub(r"[^\w&'\s-]", ' ', question.lower()).split())
+
+
+def month_end(year, month):
+    return datetime.date(year, month, calendar.monthrange(year, month)[1])
+
+
+def shift_months(day, months):
+    index = day.year * 12 + day.month - 1 + months
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+# --- Helper function to find the date range a question is about ---
+def parse_date_range(text, today):
+    if 'today' in text.split():
+        return today, today, 'today'
+    if 'yesterday' in text.split():
+        day = today - datetime.timedelta(days=1)
+        return day, day, 'yesterday'
+    if 'this week' in text:
+        return today - datetime.timedelta(days=today.weekday()), today, 'this week'
+    if 'last week' in text:
+        start = today - datetime.timedelta(days=today.weekday() + 7)
+        return start, start + datetime.timedelta(days=6), 'last week'
+    if 'this month' in text:
+        return today.replace(day=1), today, 'this month'
+    if 'last month' in text:
+        start = shift_months(today.replace(day=1), -1)
+        return start, month_end(start.year, start.month), 'last month'
+    if 'this year' in text or 'ytd' in text.split() or 'year to date' in text:
+        return today.replace(month=1, day=1), today, 'this year'
+    if 'last year' in text:
+        return datetime.date(today.year - 1, 1, 1), datetime.date(today.year - 1, 12, 31), 'last year'
+
+    match = RELATIVE_RANGE.search(text)
+    if match:
+        count, unit = int(match.group(1)), match.group(2)
+        if unit == 'day':
+            start = today - datetime.timedelta(days=count - 1)
+        elif unit == 'week':
+            start = today - datetime.timedelta(weeks=count) + datetime.timedelta(days=1)
+        elif unit == 'month':
+            start = shift_months(today.replace(day=1), -count + 1)
+        else:
+            start = datetime.date(today.year - count + 1, 1, 1)
+        return start, today, match.group(0)
+
+    match = MONTH_RANGE.search(text)
+    if match:
+        since, name, year = match.group(1), match.group(2) or match.group(4), match.group(3) or match.group(5)
+        period = ' '.join(word for word in (since, name, year) if word)
+        month = MONTHS[name]
+        if year:
+            year = int(year)
+        else:
+            # A bare month name means its most recent occurrence
+            year = today.year if month <= today.month else today.year - 1
+        start = datetime.date(year, month, 1)
+        if since:
+            return start, today, period
+        return start, month_end(year, month), period
+
+    match = YEAR.search(text)
+    if match:
+        year = int(match.group(1))
+        return datetime.date(year, 1, 1), datetime.date(year, 12, 31), match.group(0)
+    return None, None, 'all time'
+
+
+def parse_category(text):
+    for category in CATEGORIES:
+        if category.lower() in text:
+            return category
+    for word in text.split():
+        if word in CATEGORY_SYNONYMS:
+            return CATEGORY_SYNONYMS[word]
+    return None
+
+
+def parse_merchant(text):
+    words = set(text.split())
+    for merchant in KNOWN_MERCHANTS:
+        if merchant in words:
+            return merchant
+    # "on X", "at X", "from X": X up to the first word that can't be part of a name
+    for match in MERCHANT_PREFIX.finditer(text):
+        name = []
+        for word in match.group(1).split():
+            if word in STOP_WORDS or word in MONTHS or word.isdigit():
+                break
+            name.append(word)
+        name = ' '.join(name)
+        if name and parse_category(name) is None and name not in SPENDING_WORDS | INCOME_WORDS:
+            return name
+    return None
+
+
+# --- Parse a question into a query plan ---
+def plan_question(question, today=None):
+    today = today or datetime.date.today()
+    text = normalize_question(question)
+    words = set(text.split())
+    start, end, period = parse_date_range(text, today)
+    merchant = parse_merchant(text)
+    if words & SPENDING_WORDS:
+        flow = 'spending'
+    elif words & INCOME_WORDS:
+        flow = 'income'
+    else:
+        flow = 'all'
+    return {
+        'start_date': start.isoformat() if start else None,
+        'end_date': end.isoformat() if end else None,
+        'period': period,
+        'merchant': merchant,
+        # A merchant already pins down what is being asked about
+        'category': None if merchant else parse_category(text),
+        'flow': flow,
+        # Ranges that run up to today hold everything in the current month so far
+        'to_date': end == today,
+    }
+
+
+def covers_whole_months(plan):
+    if plan['start_date'] is None:
+        return plan['end_date'] is None
+    start = datetime.date.fromisoformat(plan['start_date'])
+    end = datetime.date.fromisoformat(plan['end_date'])
+    return start.day == 1 and (plan['to_date'] or end == month_end(end.year, end.month))
+
+
+# --- Helper function to add the plan's merchant and flow to a transactions filter ---
+def plan_match(base_query, plan):
+    match = dict(base_query)
+    if plan['merchant']:
+        match['desc'] = {'$regex': re.escape(plan['merchant']), '$options': 'i'}
+    if plan['flow'] == 'spending':
+        match['amt'] = {'$lt': 0}
+    elif plan['flow'] == 'income':
+        match['amt'] = {'$gt': 0}
+    return match
+
+
+def transactions_pipeline(match):
+    spending = {'$cond': [{'$lt': ['$amt', 0]}, {'$multiply': ['$amt', -1]}, 0]}
+    income = {'$cond': [{'$gt': ['$amt', 0]}, '$amt', 0]}
+    month = {'$ifNull': [{'$dateToString': {'format': '%Y-%m', 'date': '$date'}}, UNDATED_MONTH]}
+    return [
+        {'$match': match},
+        {
+            '$facet': {
+                'totals': [{'$group': {'_id': None, 'spending': {'$sum': spending}, 'income': {'$sum': income}, 'count': {'$sum': 1}}}],
+                'by_category': [{'$group': {'_id': '$cat', 'spending': {'$sum': spending}, 'income': {'$sum': income}, 'count': {'$sum': 1}}}],
+                'by_month': [{'$group': {'_id': month, 'spending': {'$sum': spending}, 'income': {'$sum': income}, 'count': {'$sum': 1}}}],
+            }
+        },
+    ]
+
+
+def rollups_pipeline(account_id, plan):
+    match = {'account_id': account_id, 'user_id': 'placeholder_user'}
+    if plan['start_date']:
+        match['month'] = {'$gte': plan['start_date'][:7], '$lte': plan['end_date'][:7]}
+    if plan['category']:
+        match['category'] = plan['category']
+    # Spending questions count only the expenses in each cell
+    if plan['flow'] == 'spending':
+        match['spending_count'] = {'$gt': 0}
+        cell = {'spending': {'$sum': '$spending'}, 'income': {'$sum': 0}, 'count': {'$sum': '$spending_count'}}
+    else:
+        cell = {'spending': {'$sum': '$spending'}, 'income': {'$sum': '$income'}, 'count': {'$sum': '$count'}}
+    return [
+        {'$match': match},
+        {
+            '$facet': {
+                'totals': [{'$group': {'_id': None, **cell}}],
+                'by_category': [{'$group': {'_id': '$category', **cell}}],
+                'by_month': [{'$group': {'_id': '$month', **cell}}],
+            }
+        },
+    ]
+
+
+def can_use_rollups(plan):
+    # Rollups hold whole months per category, with no per-row detail
+    # and no count of income rows
+    return plan['merchant'] is None and plan['flow'] != 'income' and covers_whole_months(plan)
+
+
+# --- Run a plan: one aggregation plus a small sample of matching rows ---
+async def run_plan(db, account_id, plan, base_query):
+    match = plan_match(base_query, plan)
+    if can_use_rollups(plan):
+        source = ROLLUP_COLLECTION
+        cursor = await db[ROLLUP_COLLECTION].aggregate(rollups_pipeline(account_id, plan))
+    else:
+        source = 'transactions'
+        cursor = await db['transactions'].aggregate(transactions_pipeline(match))
+    facets = (await cursor.to_list())[0]
+    # Sums of Decimal128 amounts come back as Decimal128
+    for rows in facets.values():
+        for row in rows:
+            row['spending'], row['income'] = as_float(row['spending']), as_float(row['income'])
+    totals = facets['totals'][0] if facets['totals'] else {'spending': 0, 'income': 0, 'count': 0}
+
+    projection = {'_id': 0, 'date': 1, 'desc': 1, 'amt': 1, 'cat': 1}
+    sample = await db['transactions'].find(match, projection, sort=[('date', -1), ('_id', -1)], limit=SAMPLE_SIZE).to_list()
+    largest = []
+    # When every match is already in the sample, the largest ones are too
+    if plan['flow'] == 'spending' and totals['count'] > SAMPLE_SIZE:
+        largest = await db['transactions'].find(match, projection, sort=[('amt', 1)], limit=TOP_EXPENSES).to_list()
+
+    return {
+        'source': source,
+        'totals': {key: totals[key] for key in ('spending', 'income', 'count')},
+        'by_category': sorted(facets['by_category'], key=lambda row: -(row['spending'] + row['income'])),
+        'by_month': sorted(facets['by_month'], key=lambda row: row['_id']),
+        'sample': sample,
+        'largest_expenses': largest,
+    }
+
+
+def describe_plan(plan):
+    parts = [plan['period']]
+    if plan['start_date']:
+        parts.append(f"{plan['start_date']} to {plan['end_date']}")
+    if plan['merchant']:
+        parts.append(f"merchant matching '{plan['merchant']}'")
+    if plan['category']:
+        parts.append(f"category {plan['category']}")
+    if plan['flow'] != 'all':
+        parts.append(f"{plan['flow']} only")
+    return ', '.join(parts)
+
+
+def format_row(row):
+    date = row['date'].date().isoformat() if row.get('date') else ''
+    return f"{date} | {row.get('desc', '')} | {as_float(row.get('amt')):.2f} | {row.get('cat', '')}"
+
+
+# --- Helper function to build the compact prompt from a plan's result ---
+def build_prompt(question, plan, result):
+    totals = result['totals']
+    lines = [
+        "You are a helpful personal finance assistant. Answer the user's question using ONLY the figures below,",
+        "which were computed from all of their matching transactions. Do not make up information. Be concise.",
+        "Spending and income are positive totals; in the transaction rows, negative amounts are spending.",
+        "",
+        f"Data selected: {describe_plan(plan)}",
+        f"Totals: spending {totals['spending']:.2f}, income {totals['income']:.2f}, {totals['count']} transactions",
+    ]
+    if result['by_category']:
+        lines.append("By category: " + "; ".join(
+            f"{row['_id']} spending {row['spending']:.2f} income {row['income']:.2f} ({row['count']})" for row in result['by_category']))
+    if len(result['by_month']) > 1:
+        lines.append("By month: " + "; ".join(
+            f"{row['_id']} spending {row['spending']:.2f} income {row['income']:.2f}" for row in result['by_month']))
+    if result['largest_expenses']:
+        lines.append("Largest expenses (date | description | amount | category):")
+        lines.extend(format_row(row) for row in result['largest_expenses'])
+    if result['sample']:
+        lines.append(f"Most recent matching transactions ({len(result['sample'])} of {totals['count']}):")
+        lines.extend(format_row(row) for row in result['sample'])
+    lines += ["", f'User\'s Question: "{question}"']
+    return "\n".join(lines)
@@ -0,0 +1,274 @@
+# readers.py
+# Statement file readers, picked by sniffing the first bytes of an upload.
+#
+# Each reader turns a file (a path or a binary file object) into DataFrame
+# chunks of a fixed number of rows, read straight from the bytes on disk.
+# ingest.py runs every chunk through the same column detection and
+# normalization whatever the format. To support a new format, write a reader
+# with sniff/iter_chunks/count_rows and add it to STATEMENT_READERS; the
+# first reader whose sniff matches wins, and CSV is the fallback.
+import itertools
+import os
+
+import openpyxl
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.ipc as pa_ipc
+import pyarrow.parquet as pq
+
+SNIFF_BYTES = 8
+PARQUET_MAGIC = b'PAR1'
+ARROW_FILE_MAGIC = b'ARROW1'
+# Arrow IPC streams start with a continuation marker
+ARROW_STREAM_MAGIC = b'\xff\xff\xff\xff'
+ZIP_MAGIC = b'PK\x03\x04'
+# Enough of a CSV to hold its header row
+HEADER_BLOCK_SIZE = 1 << 16
+
+
+def rewind(source):
+    if hasattr(source, 'seek'):
+        source.seek(0)
+
+
+def is_path(source):
+    return isinstance(source, (str, os.PathLike))
+
+
+# --- Helper function to turn Arrow record batches into fixed-size DataFrame chunks ---
+# Always yields at least one (possibly empty) chunk, so callers can see the columns
+def iter_frames(schema, batches, chunk_rows, skip_rows=0, nrows=None):
+    pending = []
+    pending_rows = 0
+    remaining = nrows
+    yielded = False
+    for batch in batches:
+        if remaining == 0:
+            break
+        if skip_rows:
+            if batch.num_rows <= skip_rows:
+                skip_rows -= batch.num_rows
+                continue
+            batch = batch.slice(skip_rows)
+            skip_rows = 0
+        if remaining is not None:
+            batch = batch.slice(0, remaining)
+            remaining -= batch.num_rows
+        pending.append(batch)
+        pending_rows += batch.num_rows
+        while pending_rows >= chunk_rows:
+            table = pa.Table.from_batches(pending, schema)
+            yield table.slice(0, chunk_rows).to_pandas()
+            yielded = True
+            rest = table.slice(chunk_rows)
+            pending = rest.to_batches()
+            pending_rows = rest.num_rows
+    if pending_rows or not yielded:
+        yield pa.Table.from_batches(pending, schema).to_pandas()
+
+
+class StatementReader:
+    name = None
+    # Whether upload workers can each read a range of rows on their own
+    splittable = False
+
+    def sniff(self, head):
+        raise NotImplementedError
+
+    def iter_chunks(self, source, chunk_rows, skip_rows=0, nrows=None):
+        raise NotImplementedError
+
+    def count_rows(self, source):
+        raise NotImplementedError
+
+    def read_columns(self, source):
+        return list(next(self.iter_chunks(source, 1, nrows=1)).columns)
+
+    def read_column(self, source, name):
+        # All values of one column, found by its name with stray spaces ignored
+        raise NotImplementedError
+
+    def column_name(self, source, name):
+        return next(column for column in self.read_columns(source) if str(column).strip() == name)
+
+
+class CSVReader(StatementReader):
+    """CSV through pyarrow's multithreaded streaming parser.
+
+    Every column is read as a string, like a bank export really is; amounts
+    and dates are converted later by the normalization in ingest.py. This
+    also keeps one odd value deep in a file from breaking type inference.
+
+    Row numbers (skip_rows, nrows, read_column) count every line after the
+    header, blank ones included, because that is how pyarrow skips rows;
+    blank lines are then dropped from the chunks.
+    """
+
+    name = 'csv'
+    splittable = True
+
+    def sniff(self, head):
+        return True
+
+    def read_columns(self, source):
+        # Only the first small block is parsed; pyarrow skips a UTF-8 BOM
+        columns = pa_csv.open_csv(source, read_options=pa_csv.ReadOptions(block_size=HEADER_BLOCK_SIZE)).schema.names
+        rewind(source)
+        return columns
+
+    def iter_chunks(self, source, chunk_rows, skip_rows=0, nrows=None):
+        columns = self.read_columns(source)
+        reader = pa_csv.open_csv(
+            source,
+            read_options=pa_csv.ReadOptions(skip_rows_after_names=skip_rows),
+            parse_options=pa_csv.ParseOptions(ignore_empty_lines=False),
+            convert_options=pa_csv.ConvertOptions(
+                column_types={column: pa.string() for column in columns},
+                strings_can_be_null=True,
+            ),
+        )
+        for df in iter_frames(reader.schema, reader, chunk_rows, nrows=nrows):
+            yield df.dropna(how='all')
+
+    def read_column(self, source, name):
+        column = self.column_name(source, name)
+        # Blank lines come back as nulls, so positions line up with skip_rows
+        table = pa_csv.read_csv(
+            source,
+            parse_options=pa_csv.ParseOptions(ignore_empty_lines=False),
+            convert_options=pa_csv.ConvertOptions(
+                include_columns=[column],
+                column_types={column: pa.string()},
+                strings_can_be_null=True,
+            ),
+        )
+        rewind(source)
+        return table.column(0).to_pandas()
+
+    def count_rows(self, source):
+        # Counting newlines is much cheaper than parsing; a quoted field that
+        # spans lines only makes the count an overestimate
+        lines = 0
+        last = b''
+        with open(source, 'rb') as f:
+            while block := f.read(1 << 20):
+                lines += block.count(b'\n')
+                last = block[-1:]
+        if last and last != b'\n':
+            lines += 1
+        # Minus the header
+        return max(lines - 1, 0)
+
+
+class ExcelReader(StatementReader):
+    """First worksheet of an XLSX workbook, streamed row by row."""
+
+    name = 'xlsx'
+
+    def sniff(self, head):
+        return head.startswith(ZIP_MAGIC)
+
+    def iter_chunks(self, source, chunk_rows, skip_rows=0, nrows=None):
+        workbook = openpyxl.load_workbook(source, read_only=True, data_only=True)
+        try:
+            rows = workbook.worksheets[0].iter_rows(values_only=True)
+            header = next(rows, None) or ()
+            columns = [str(cell) if cell is not None else f'Unnamed: {i}' for i, cell in enumerate(header)]
+            width = len(columns)
+            rows = itertools.islice(rows, skip_rows, None if nrows is None else skip_rows + nrows)
+            yielded = False
+            while chunk := list(itertools.islice(rows, chunk_rows)):
+                # Rows in a read-only sheet can be ragged
+                chunk = [tuple(row[:width]) + (None,) * (width - len(row)) for row in chunk]
+                # Skip blank rows, as the CSV parser does
+                yield pd.DataFrame(chunk, columns=columns).dropna(how='all')
+                yielded = True
+            if not yielded:
+                yield pd.DataFrame(columns=columns)
+        finally:
+            workbook.close()
+
+    def count_rows(self, source):
+        workbook = openpyxl.load_workbook(source, read_only=True)
+        try:
+            return max((workbook.worksheets[0].max_row or 1) - 1, 0)
+        finally:
+            workbook.close()
+
+
+class ParquetReader(StatementReader):
+    name = 'parquet'
+    splittable = True
+
+    def sniff(self, head):
+        return head.startswith(PARQUET_MAGIC)
+
+    def iter_chunks(self, source, chunk_rows, skip_rows=0, nrows=None):
+        parquet_file = pq.ParquetFile(source)
+        # Row groups entirely before the range are not read at all
+        row_groups = []
+        for i in range(parquet_file.num_row_groups):
+            group_rows = parquet_file.metadata.row_group(i).num_rows
+            if not row_groups and skip_rows >= group_rows:
+                skip_rows -= group_rows
+                continue
+            row_groups.append(i)
+        batches = parquet_file.iter_batches(batch_size=chunk_rows, row_groups=row_groups)
+        yield from iter_frames(parquet_file.schema_arrow, batches, chunk_rows, skip_rows, nrows)
+
+    def read_column(self, source, name):
+        parquet_file = pq.ParquetFile(source)
+        column = next(column for column in parquet_file.schema_arrow.names if str(column).strip() == name)
+        return parquet_file.read(columns=[column]).column(0).to_pandas()
+
+    def count_rows(self, source):
+        return pq.ParquetFile(source).metadata.num_rows
+
+
+class ArrowReader(StatementReader):
+    """Arrow IPC, in the file (Feather v2) or the stream format."""
+
+    name = 'arrow'
+
+    def sniff(self, head):
+        return head.startswith(ARROW_FILE_MAGIC) or head.startswith(ARROW_STREAM_MAGIC)
+
+    def open(self, source):
+        # Files on disk are memory-mapped, so batches are read without copying
+        if is_path(source):
+            source = pa.memory_map(os.fspath(source))
+        head = source.read(len(ARROW_FILE_MAGIC))
+        source.seek(0)
+        if head == ARROW_FILE_MAGIC:
+            reader = pa_ipc.open_file(source)
+            return reader.schema, (reader.get_batch(i) for i in range(reader.num_record_batches))
+        reader = pa_ipc.open_stream(source)
+        return reader.schema, reader
+
+    def iter_chunks(self, source, chunk_rows, skip_rows=0, nrows=None):
+        schema, batches = self.open(source)
+        yield from iter_frames(schema, batches, chunk_rows, skip_rows, nrows)
+
+    def count_rows(self, source):
+        schema, batches = self.open(source)
+        return sum(batch.num_rows for batch in batches)
+
+
+STATEMENT_READERS = [ParquetReader(), ArrowReader(), ExcelReader(), CSVReader()]
+READERS_BY_NAME = {reader.name: reader for reader in STATEMENT_READERS}
+
+
+# --- Helper function to pick a reader from a file's first bytes ---
+def sniff_reader(source):
+    if is_path(source):
+        with open(source, 'rb') as f:
+            head = f.read(SNIFF_BYTES)
+    else:
+        head = source.read(SNIFF_BYTES)
+        rewind(source)
+    return next(reader for reader in STATEMENT_READERS if reader.sniff(head))
+
+
+def get_reader(name):
+    return READERS_BY_NAME[name]
@@ -0,0 +1,58 @@
+# responses.py
+# JSON encoding of API responses with orjson.
+#
+# Documents come out of MongoDB holding ObjectId, datetime and Decimal128
+# values, and raw statement columns may hold NaN. orjson writes datetimes and
+# floats itself (NaN as null) and only calls encode_default for the BSON
+# types, so documents are encoded as they are read: no copy with _id turned
+# into a string, and no pass through FastAPI's jsonable_encoder when an
+# endpoint returns an ORJSONResponse itself. Streams encode a whole batch of
+# documents per call.
+import decimal
+
+import orjson
+from bson import ObjectId
+from bson.decimal128 import Decimal128
+from fastapi.responses import JSONResponse
+
+
+def encode_default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, Decimal128):
+        value = value.to_decimal()
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content):
+    return orjson.dumps(content, default=encode_default)
+
+
+def ndjson_lines(docs):
+    return b''.join(orjson.dumps(doc, default=encode_default, option=orjson.OPT_APPEND_NEWLINE) for doc in docs)
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered with orjson; takes BSON documents as well as plain data."""
+
+    def render(self, content):
+        return dumps(content)
+
+
+# --- Helper functions to stream batches of documents ---
+# batches is an async iterator of lists, like exporters.iter_batches
+async def iter_json_array(batches):
+    # Each batch is encoded as one array with its brackets trimmed, so the
+    # batches join up into a single array
+    separator = b'['
+    async for batch in batches:
+        yield separator + dumps(batch)[1:-1]
+        separator = b','
+    yield b'[]' if separator == b'[' else b']'
+
+
+async def iter_ndjson(batches):
+    async for batch in batches:
+        yield ndjson_lines(batch)
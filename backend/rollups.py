@@ -0,0 +1,382 @@
+# rollups.py
+# Per-account, per-month, per-category totals that back the analytics endpoints.
+#
+# Each rollup document holds the spending, income and counts for one
+# (account, month, category) cell. Uploads and category changes apply $inc
+# deltas to the affected cells, so the dashboard reads a handful of small
+# documents instead of aggregating every transaction. Totals are Decimal128,
+# like the transaction amounts, and are turned into doubles only on the way
+# out of the analytics pipelines.
+#
+# Existing data is backfilled with the rebuild command, and check compares
+# the rollups with a fresh aggregation over the raw transactions:
+#   python rollups.py rebuild [--account-id ID]
+#   python rollups.py check [--account-id ID]
+# The merchant states behind /analytics/subscriptions have the same kind of
+# rebuild (python subscriptions.py rebuild [--account-id ID]); the schema
+# migration (python schema.py migrate) runs both.
+# A rebuild deletes and rewrites cells, so it must not run alongside uploads
+# or category changes; the API itself only ever applies deltas.
+import argparse
+import asyncio
+import logging
+import sys
+
+from bson import ObjectId
+from pymongo import UpdateMany, UpdateOne
+from pymongo.errors import PyMongoError
+
+from schema import as_decimal, to_amount
+
+ROLLUP_COLLECTION = 'rollups'
+# Rollups written before amounts were exact may have drifted slightly
+ROLLUP_TOLERANCE = 0.01
+# Cells for transactions without a date
+UNDATED_MONTH = ''
+# Transaction fields a recategorization reads before writing
+RECATEGORIZE_PROJECTION = {'acct': 1, 'uid': 1, 'date': 1, 'amt': 1, 'desc': 1, 'cat': 1, 'conf': 1}
+# Rounds of re-reading rows that changed between the read and the write
+RECATEGORIZE_MAX_ATTEMPTS = 10
+
+logger = logging.getLogger(__name__)
+
+
+def rollup_month(date):
+    return date.strftime('%Y-%m') if date else UNDATED_MONTH
+
+
+# --- Helper function to total a batch of records by rollup cell ---
+def rollup_deltas(records, sign=1, deltas=None):
+    deltas = {} if deltas is None else deltas
+    for record in records:
+        key = (rollup_month(record.get('date')), record.get('cat', 'Miscellaneous'))
+        cell = deltas.setdefault(key, {'spending': 0, 'income': 0, 'count': 0, 'spending_count': 0})
+        amount = as_decimal(record.get('amt'))
+        if amount < 0:
+            cell['spending'] -= amount * sign
+            cell['spending_count'] += sign
+        elif amount > 0:
+            cell['income'] += amount * sign
+        cell['count'] += sign
+    return deltas
+
+
+# --- Helper function to turn deltas into upserting $inc operations ---
+def rollup_update_ops(account_id, deltas, user_id='placeholder_user'):
+    return [
+        UpdateOne(
+            {'user_id': user_id, 'account_id': account_id, 'month': month, 'category': category},
+            {'$inc': {**cell, 'spending': to_amount(cell['spending']), 'income': to_amount(cell['income'])}},
+            upsert=True,
+        )
+        for (month, category), cell in deltas.items()
+        # Moves that cancel out within a cell need no write
+        if any(cell.values())
+    ]
+
+
+# --- Helper function for a single transaction moving between categories ---
+def recategorize_ops(doc, new_category):
+    return recategorize_many_ops([doc], {doc['_id']: new_category})
+
+
+# --- Helper function for transactions moving between categories ---
+# docs are the transactions as they were before the change, new_categories
+# maps each one's _id to its new category
+def recategorize_many_ops(docs, new_categories):
+    by_account = {}
+    for doc in docs:
+        if doc.get('cat') == new_categories[doc['_id']]:
+            continue
+        deltas = by_account.setdefault((doc['acct'], doc.get('uid', 'placeholder_user')), {})
+        rollup_deltas([doc], sign=-1, deltas=deltas)
+        rollup_deltas([{**doc, 'cat': new_categories[doc['_id']]}], deltas=deltas)
+    return [op for (account_id, user_id), deltas in by_account.items() for op in rollup_update_ops(account_id, deltas, user_id)]
+
+
+async def apply_rollup_ops(db, ops):
+    if ops:
+        await db[ROLLUP_COLLECTION].bulk_write(ops, ordered=False)
+
+
+# --- Helper function to build the conditional writes for a recategorization ---
+# Each row only changes if it is still in the state it was read in. Rows read
+# in the same state and moving to the same category share one update_many.
+# Every row written is stamped with rev, so the caller can tell its own
+# writes from another request's.
+def recategorize_write_ops(docs, new_categories, rev):
+    groups = {}
+    for doc in docs:
+        groups.setdefault((doc.get('cat'), doc.get('conf'), new_categories[doc['_id']]), []).append(doc['_id'])
+    ops = []
+    for (category, confidence, new_category), ids in groups.items():
+        update = {'$set': {'cat': new_category, 'conf': 'High', 'rev': rev}}
+        if len(ids) == 1:
+            ops.append(UpdateOne({'_id': ids[0], 'cat': category, 'conf': confidence}, update))
+        else:
+            ops.append(UpdateMany({'_id': {'$in': ids}, 'cat': category, 'conf': confidence}, update))
+    return ops
+
+
+# --- Helper function to recategorize stored transactions and move their totals ---
+# docs are the rows as read (RECATEGORIZE_PROJECTION), new_categories maps
+# their _ids to categories and match narrows which rows may change. All rows
+# are written with one unordered bulk_write and the rollup deltas come from
+# the rows as read. Rows that changed in between miss their filter; only
+# those are read again (with match) and retried.
+# Returns the previous state of the rows that actually changed.
+async def recategorize_transactions(db, docs, new_categories, match=None):
+    transactions = db['transactions']
+
+    async def written_by(rev, docs):
+        ours = {doc['_id'] async for doc in transactions.find({'_id': {'$in': [doc['_id'] for doc in docs]}, 'rev': rev}, {'_id': 1})}
+        return [doc for doc in docs if doc['_id'] in ours]
+
+    changed = []
+    for _ in range(RECATEGORIZE_MAX_ATTEMPTS):
+        docs = [doc for doc in docs if (doc.get('cat'), doc.get('conf')) != (new_categories[doc['_id']], 'High')]
+        if not docs:
+            return changed
+        rev = ObjectId()
+        try:
+            result = await transactions.bulk_write(recategorize_write_ops(docs, new_categories, rev), ordered=False)
+        except PyMongoError:
+            # Rows the failed write did change still move their totals
+            await apply_rollup_ops(db, recategorize_many_ops(await written_by(rev, docs), new_categories))
+            raise
+
+        written = docs
+        if result.modified_count < len(docs):
+            # The rows not stamped with this write's rev missed their filter
+            written = await written_by(rev, docs)
+            if len(written) < result.modified_count:
+                # Another request changed some rows again right after this write
+                logger.warning("Recategorized rows changed again before they were counted, check the rollups",
+                               extra={'rows': result.modified_count - len(written)})
+
+        # Totals move right after each write, so no row is left without its delta
+        await apply_rollup_ops(db, recategorize_many_ops(written, new_categories))
+        changed += written
+        missed = [doc['_id'] for doc in docs if doc not in written]
+        if not missed:
+            return changed
+        docs = await transactions.find({**(match or {}), '_id': {'$in': missed}}, RECATEGORIZE_PROJECTION).to_list()
+    raise RuntimeError(f"{len(docs)} transactions kept changing and were not recategorized.")
+
+
+# --- Pipelines that answer the analytics endpoints from the rollups ---
+def summary_from_rollups_pipeline(account_id):
+    return [
+        {'$match': {'account_id': account_id, 'user_id': 'placeholder_user'}},
+        {
+            '$group': {
+                '_id': None,
+                'total_spending': {'$sum': '$spending'},
+                'total_income': {'$sum': '$income'},
+                'transaction_count': {'$sum': '$count'},
+            }
+        },
+        {
+            '$project': {
+                '_id': 0,
+                'total_spending': {'$toDouble': '$total_spending'},
+                'total_income': {'$toDouble': '$total_income'},
+                'net_cash_flow': {'$toDouble': {'$subtract': ['$total_income', '$total_spending']}},
+                'transaction_count': '$transaction_count',
+            }
+        },
+    ]
+
+
+def spending_by_category_from_rollups_pipeline(account_id):
+    return [
+        # Only cells that saw at least one expense, like the raw Amount < 0 match
+        {'$match': {'account_id': account_id, 'user_id': 'placeholder_user', 'spending_count': {'$gt': 0}}},
+        {'$group': {'_id': '$category', 'total': {'$sum': '$spending'}}},
+        {'$project': {'_id': 0, 'category': '$_id', 'total': {'$toDouble': '$total'}}},
+    ]
+
+
+# --- The same answers aggregated from the raw transactions ---
+# What the analytics endpoints ran before rollups, kept for check_rollups
+def summary_pipeline(account_id):
+    return [
+        {
+            # Stage 1: Match documents for the specified account and user
+            '$match': {
+                'acct': account_id,
+                'uid': 'placeholder_user'
+            }
+        },
+        {
+            # Stage 2: Group the documents to calculate summaries
+            '$group': {
+                '_id': None,  # Group all matched documents together
+                'total_spending': {
+                    # Sum amounts that are negative (expenses)
+                    '$sum': {
+                        '$cond': [{'$lt': ['$amt', 0]}, '$amt', 0]
+                    }
+                },
+                'total_income': {
+                    # Sum amounts that are positive (income)
+                    '$sum': {
+                        '$cond': [{'$gt': ['$amt', 0]}, '$amt', 0]
+                    }
+                },
+                'transaction_count': {'$sum': 1} # Count the total number of documents
+            }
+        },
+        {
+            # Stage 3: Project to reshape the output
+            '$project': {
+                '_id': 0, # Exclude the default _id field
+                'total_spending': {'$toDouble': {'$multiply': ['$total_spending', -1]}}, # Make spending a positive number
+                'total_income': {'$toDouble': '$total_income'},
+                'net_cash_flow': {'$toDouble': {'$add': ['$total_income', '$total_spending']}},
+                'transaction_count': '$transaction_count'
+            }
+        }
+    ]
+
+
+def spending_by_category_pipeline(account_id):
+    return [
+        {
+            # Stage 1: Match only expenses for the specified account
+            '$match': {
+                'acct': account_id,
+                'uid': 'placeholder_user',
+                'amt': {'$lt': 0} # Filter for expenses only
+            }
+        },
+        {
+            # Stage 2: Group by category and sum the amounts
+            '$group': {
+                '_id': '$cat', # Group documents by the category field
+                'total_amount': {'$sum': '$amt'}
+            }
+        },
+        {
+            # Stage 3: Project to reshape the output
+            '$project': {
+                '_id': 0, # Exclude the default _id field
+                'category': '$_id', # Rename _id to category
+                'total': {'$toDouble': {'$multiply': ['$total_amount', -1]}} # Make the total a positive number
+            }
+        }
+    ]
+
+
+# --- Rebuild: recompute the rollups from the raw transactions ---
+# Totals per rollup cell of the transactions matching a filter
+def rollup_cells_pipeline(match):
+    return [
+        {'$match': match},
+        {
+            '$group': {
+                '_id': {
+                    'user_id': '$uid',
+                    'account_id': '$acct',
+                    'month': {'$ifNull': [{'$dateToString': {'format': '%Y-%m', 'date': '$date'}}, UNDATED_MONTH]},
+                    'category': '$cat',
+                },
+                'spending': {'$sum': {'$cond': [{'$lt': ['$amt', 0]}, {'$multiply': ['$amt', -1]}, 0]}},
+                'income': {'$sum': {'$cond': [{'$gt': ['$amt', 0]}, '$amt', 0]}},
+                'count': {'$sum': 1},
+                'spending_count': {'$sum': {'$cond': [{'$lt': ['$amt', 0]}, 1, 0]}},
+            }
+        },
+        {
+            '$project': {
+                '_id': 0,
+                'user_id': '$_id.user_id',
+                'account_id': '$_id.account_id',
+                'month': '$_id.month',
+                'category': '$_id.category',
+                'spending': 1,
+                'income': 1,
+                'count': 1,
+                'spending_count': 1,
+            }
+        },
+    ]
+
+
+def rebuild_pipeline(match):
+    return rollup_cells_pipeline(match) + [
+        {
+            '$merge': {
+                'into': ROLLUP_COLLECTION,
+                'on': ['user_id', 'account_id', 'month', 'category'],
+                'whenMatched': 'replace',
+                'whenNotMatched': 'insert',
+            }
+        },
+    ]
+
+
+async def rebuild_rollups(db, account_id=None):
+    match = {'uid': 'placeholder_user'}
+    rollup_match = {'user_id': 'placeholder_user'}
+    if account_id:
+        match['acct'] = account_id
+        rollup_match['account_id'] = account_id
+    await db[ROLLUP_COLLECTION].delete_many(rollup_match)
+    cursor = await db['transactions'].aggregate(rebuild_pipeline(match))
+    await cursor.to_list()
+
+
+# --- Check: compare the rollup answers with the raw aggregations ---
+async def check_rollups(db, account_id=None):
+    async def run(collection, pipeline):
+        cursor = await db[collection].aggregate(pipeline)
+        return await cursor.to_list()
+
+    if account_id:
+        account_ids = [account_id]
+    else:
+        account_ids = await db['transactions'].distinct('acct', {'uid': 'placeholder_user'})
+
+    mismatches = []
+    for account in account_ids:
+        raw = (await run('transactions', summary_pipeline(account)) or [{}])[0]
+        rolled = (await run(ROLLUP_COLLECTION, summary_from_rollups_pipeline(account)) or [{}])[0]
+        for field in ('total_spending', 'total_income', 'net_cash_flow', 'transaction_count'):
+            if abs(raw.get(field, 0) - rolled.get(field, 0)) > ROLLUP_TOLERANCE:
+                mismatches.append((account, field, raw.get(field, 0), rolled.get(field, 0)))
+
+        raw_categories = {r['category']: r['total'] for r in await run('transactions', spending_by_category_pipeline(account))}
+        rolled_categories = {r['category']: r['total'] for r in await run(ROLLUP_COLLECTION, spending_by_category_from_rollups_pipeline(account))}
+        for category in raw_categories.keys() | rolled_categories.keys():
+            if abs(raw_categories.get(category, 0) - rolled_categories.get(category, 0)) > ROLLUP_TOLERANCE:
+                mismatches.append((account, f'category {category}', raw_categories.get(category), rolled_categories.get(category)))
+    return mismatches
+
+
+async def main():
+    from database import mongo
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('command', choices=['rebuild', 'check'])
+    parser.add_argument('--account-id')
+    args = parser.parse_args()
+
+    await mongo.connect()
+    try:
+        if args.command == 'rebuild':
+            await rebuild_rollups(mongo.db, args.account_id)
+            print("Rollups rebuilt.")
+        else:
+            mismatches = await check_rollups(mongo.db, args.account_id)
+            for account, field, raw, rolled in mismatches:
+                print(f"MISMATCH account={account} {field}: raw={raw} rollup={rolled}")
+            print("Rollups are consistent." if not mismatches else f"{len(mismatches)} mismatches found.")
+            if mismatches:
+                sys.exit(1)
+    finally:
+        await mongo.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
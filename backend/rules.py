@@ -0,0 +1,70 @@
+# rules.py
+# Category rules: a user's "always file this merchant under X".
+#
+# A correction sent with apply_to_merchant becomes a rule for the
+# transaction's account, keyed by its merchant (ai_categorize.merchant_key).
+# Rules are loaded when an upload to the account starts and checked before
+# the built-in keyword map, so future statements come in already
+# categorized. Saving a rule also recategorizes the account's stored
+# transactions it matches, found with the same pattern run in MongoDB (see
+# categories.rule_pattern) and moved with update_many. Rules saved before
+# rules had an account apply to every account.
+#
+# Deleting a rule only stops it applying to future uploads; transactions it
+# already recategorized keep their category.
+import datetime
+
+from categories import rule_pattern
+from rollups import RECATEGORIZE_PROJECTION, recategorize_transactions
+
+RULE_COLLECTION = 'category_rules'
+
+
+async def load_rules(db, account_id, user_id='placeholder_user'):
+    query = {'user_id': user_id, 'account_id': {'$in': [account_id, None]}}
+    return await db[RULE_COLLECTION].find(query, {'_id': 0, 'merchant': 1, 'category': 1}).to_list()
+
+
+# --- Helper function to save (or change) the rule for a merchant ---
+async def save_rule(db, account_id, merchant, category, user_id='placeholder_user'):
+    now = datetime.datetime.now(datetime.timezone.utc)
+    await db[RULE_COLLECTION].update_one(
+        {'user_id': user_id, 'account_id': account_id, 'merchant': merchant},
+        {'$set': {'category': category, 'updated_at': now}, '$setOnInsert': {'created_at': now}},
+        upsert=True,
+    )
+
+
+# --- Helper function to find the stored transactions a rule would change ---
+# The regex only runs over one account's rows (the uid_acct_date index prefix)
+def rule_query(account_id, merchant, category, user_id='placeholder_user'):
+    return {
+        'uid': user_id,
+        'acct': account_id,
+        'desc': {'$regex': rule_pattern(merchant), '$options': 'i'},
+        # Rows already in the category are still confirmed by the rule
+        '$or': [{'cat': {'$ne': category}}, {'conf': {'$ne': 'High'}}],
+    }
+
+
+# --- Apply a rule to the transactions already stored ---
+# Returns how many transactions changed
+async def apply_rule(db, account_id, merchant, category, user_id='placeholder_user'):
+    query = rule_query(account_id, merchant, category, user_id)
+    docs = await db['transactions'].find(query, RECATEGORIZE_PROJECTION).to_list()
+    # All matching rows move with one update_many per category they were
+    # read in; a row that changed in between is only retried if the rule
+    # still applies to it
+    changed = await recategorize_transactions(db, docs, {doc['_id']: category for doc in docs}, match=query)
+    return len(changed)
+
+
+def rule_summary(rule):
+    return {
+        '_id': str(rule['_id']),
+        'account_id': rule.get('account_id'),
+        'merchant': rule['merchant'],
+        'category': rule['category'],
+        'created_at': rule['created_at'],
+        'updated_at': rule['updated_at'],
+    }
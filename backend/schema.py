@@ -0,0 +1,250 @@
+# schema.py
+# How a transaction is stored, and how it is shown through the API.
+#
+# Stored transactions are compact and typed:
+#   uid   user id                 date  BSON date (UTC midnight), null if unparseable
+#   acct  account id              amt   Decimal128, negative for spending
+#   desc  description             cat   category
+#   conf  confidence              fp    dedup fingerprint
+#   raw   the statement's other columns, under their original names
+#   rev   id of the bulk category change that last wrote the row, if any
+# Dates sort and compare as dates, amounts add up exactly, and the date,
+# amount and description columns are not kept a second time under their
+# bank-specific names. Set STORE_RAW_COLUMNS=0 to drop the other columns.
+#
+# API responses keep their long names (Date, Amount, Description, ...).
+# The database renames fields with a $project stage (api_projection), so
+# documents are not rewritten one by one in Python.
+#
+# Data stored in the old layout (long names, ISO date strings, float amounts
+# and every raw column) is converted in place by the migrate command. Run it
+# while no uploads are in progress:
+#   python schema.py migrate [--batch-size N]
+# The old rows get the fingerprints an upload would give them, so uploading
+# an old statement again adds nothing, and the rollups and merchant states
+# (subscriptions.py) are rebuilt from the converted data.
+import argparse
+import asyncio
+import collections
+import datetime
+import decimal
+import os
+
+from bson.decimal128 import Decimal128
+from pymongo import ReplaceOne
+
+STORE_RAW_COLUMNS = os.environ.get("STORE_RAW_COLUMNS", "1") == "1"
+MIGRATION_BATCH_SIZE = int(os.environ.get("MIGRATION_BATCH_SIZE", 1000))
+
+# Stored field -> API field
+API_FIELDS = {
+    'acct': 'account_id',
+    'uid': 'user_id',
+    'date': 'Date',
+    'amt': 'Amount',
+    'desc': 'Description',
+    'cat': 'category',
+    'conf': 'confidence',
+    'raw': 'raw',
+}
+# Fields the old layout added to a statement's own columns
+LEGACY_FIELDS = {'_id', 'user_id', 'account_id', 'Date', 'Amount', 'Description', 'category', 'confidence', 'fingerprint'}
+
+
+# --- Helper functions to convert values to the stored types ---
+def to_amount(value):
+    if isinstance(value, Decimal128):
+        return value
+    return Decimal128(as_decimal(value))
+
+
+def as_decimal(value):
+    if isinstance(value, Decimal128):
+        return value.to_decimal()
+    if isinstance(value, decimal.Decimal):
+        return value
+    if isinstance(value, float):
+        # NaN amounts were stored as 0 by the upload path too
+        # float() first: numpy floats repr as "np.float64(...)"
+        return decimal.Decimal(repr(float(value))) if value == value else decimal.Decimal(0)
+    if value is None or value == '':
+        return decimal.Decimal(0)
+    return decimal.Decimal(str(value))
+
+
+def as_float(value):
+    return float(as_decimal(value))
+
+
+def to_date(value):
+    if isinstance(value, datetime.datetime):
+        return value
+    if not value or not isinstance(value, str):
+        return None
+    try:
+        return datetime.datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+# Typed statement cells (Parquet, Arrow and Excel) under raw, as BSON can store them
+def to_raw_value(value):
+    if value is None or isinstance(value, (str, bool, int, float, bytes, datetime.datetime, Decimal128)):
+        return value
+    if isinstance(value, datetime.date):
+        return datetime.datetime.combine(value, datetime.time())
+    if isinstance(value, decimal.Decimal):
+        try:
+            return Decimal128(value)
+        except decimal.DecimalException:
+            # More digits than Decimal128 holds
+            return float(value)
+    if isinstance(value, dict):
+        return {str(key): to_raw_value(item) for key, item in value.items()}
+    if hasattr(value, 'tolist'):
+        # numpy scalars and the arrays Arrow list columns turn into
+        value = value.tolist()
+    if isinstance(value, (list, tuple)):
+        return [to_raw_value(item) for item in value]
+    # Times of day, durations and anything else are kept as text
+    return str(value)
+
+
+# --- Helpers to read transactions in the API's shape ---
+def api_projection(fields=None):
+    projection = {'_id': 1}
+    for stored, api in API_FIELDS.items():
+        if fields is None or api in fields:
+            # Decimal128 is exact in storage but JSON only has doubles
+            projection[api] = {'$toDouble': f'${stored}'} if stored == 'amt' else f'${stored}'
+    return projection
+
+
+def api_pipeline(query, sort=None, limit=None, fields=None):
+    pipeline = [{'$match': query}]
+    if sort:
+        pipeline.append({'$sort': dict(sort)})
+    if limit:
+        pipeline.append({'$limit': limit})
+    pipeline.append({'$project': api_projection(fields)})
+    return pipeline
+
+
+# --- Migration from the old layout ---
+# fingerprint is the row's dedup fingerprint (see legacy_fingerprints), for
+# rows stored before uploads fingerprinted them
+def migrate_document(doc, mapped_columns=(), fingerprint=None):
+    migrated = {
+        '_id': doc['_id'],
+        'uid': doc.get('user_id'),
+        'acct': doc.get('account_id'),
+        'date': to_date(doc.get('Date')),
+        'amt': to_amount(doc.get('Amount')),
+        'desc': str(doc.get('Description') or ''),
+        'cat': doc.get('category', 'Miscellaneous'),
+        'conf': doc.get('confidence', 'Low'),
+    }
+    if doc.get('fingerprint') or fingerprint:
+        migrated['fp'] = doc.get('fingerprint') or fingerprint
+    if STORE_RAW_COLUMNS:
+        # The columns that were mapped to Date/Amount/Description are dropped
+        raw = {
+            column: value for column, value in doc.items()
+            if column not in LEGACY_FIELDS and column not in mapped_columns and value != ''
+        }
+        if raw:
+            migrated['raw'] = raw
+    return migrated
+
+
+# --- Helper function to fingerprint old-layout rows as an upload does ---
+# The old layout kept the ISO date string and the float amount that uploads
+# fingerprint, so a statement stored before the migration is recognized when
+# it is uploaded again. seen is shared by all batches, so identical rows of
+# an account are numbered in _id (that is, upload) order.
+def legacy_fingerprints(docs, seen):
+    import pandas as pd
+
+    from dedup import row_fingerprints
+
+    by_account = {}
+    for doc in docs:
+        by_account.setdefault(doc.get('account_id'), []).append(doc)
+    fingerprints = {}
+    for account_id, rows in by_account.items():
+        fingerprints.update(zip((row['_id'] for row in rows), row_fingerprints(
+            str(account_id),
+            pd.Series([row.get('Date') or '' for row in rows], dtype=object),
+            pd.Series([as_float(row.get('Amount')) for row in rows], dtype=float),
+            pd.Series([str(row.get('Description') or '') for row in rows], dtype=object),
+            seen,
+        )))
+    return fingerprints
+
+
+async def migrate_transactions(db, batch_size=None):
+    from indexes import TRANSACTION_INDEXES, ensure_indexes
+    from rollups import rebuild_rollups
+    from subscriptions import rebuild_merchant_stats
+
+    batch_size = batch_size or MIGRATION_BATCH_SIZE
+    # Each account remembers the statement columns its last upload mapped
+    mapped_columns = {}
+    async for account in db['accounts'].find({}, {'column_mapping': 1}):
+        mapped_columns[str(account['_id'])] = set((account.get('column_mapping') or {}).values())
+
+    migrated = 0
+    last_id = None
+    seen = collections.Counter()
+    while True:
+        # Walk the _id index, so each batch starts where the last one ended
+        query = {'user_id': {'$exists': True}}
+        if last_id is not None:
+            query['_id'] = {'$gt': last_id}
+        batch = await db['transactions'].find(query, sort=[('_id', 1)], limit=batch_size).to_list()
+        if not batch:
+            break
+        fingerprints = legacy_fingerprints(batch, seen)
+        ops = [
+            ReplaceOne(
+                {'_id': doc['_id'], 'user_id': {'$exists': True}},
+                migrate_document(doc, mapped_columns.get(doc.get('account_id'), ()), fingerprints[doc['_id']]),
+            )
+            for doc in batch
+        ]
+        await db['transactions'].bulk_write(ops, ordered=False)
+        migrated += len(batch)
+        last_id = batch[-1]['_id']
+
+    # Indexes on the old field names are dead weight now
+    current = {index.document['name'] for index in TRANSACTION_INDEXES} | {'_id_'}
+    existing = [index['name'] async for index in await db['transactions'].list_indexes()]
+    for name in existing:
+        if name not in current:
+            await db['transactions'].drop_index(name)
+    await ensure_indexes(db)
+    # Totals summed again from exact amounts, and the merchant states that
+    # /analytics/subscriptions reads built for every existing account
+    await rebuild_rollups(db)
+    await rebuild_merchant_stats(db)
+    return migrated
+
+
+async def main():
+    from database import mongo
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('command', choices=['migrate'])
+    parser.add_argument('--batch-size', type=int)
+    args = parser.parse_args()
+
+    await mongo.connect()
+    try:
+        migrated = await migrate_transactions(mongo.db, args.batch_size)
+        print(f"Migrated {migrated} transactions to the compact schema.")
+    finally:
+        await mongo.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
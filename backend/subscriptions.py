@@ -0,0 +1,233 @@
+# subscriptions.py
+# Incremental recurring-payment detection.
+#
+# Instead of regrouping an account's whole history on every request, we keep
+# one small state document per (account, merchant) with the running count,
+# mean and variance of the amounts (Welford), the first and last payment date
+# and a histogram of the gaps between payments. Uploads merge each batch into
+# these states, so /analytics/subscriptions only reads one document per
+# merchant.
+#
+# Gaps are measured against the last payment already on record, so states
+# assume statements are uploaded roughly in date order. If older history is
+# uploaded later, rebuild the states from the raw transactions:
+#   python subscriptions.py rebuild [--account-id ID]
+# Transactions stored before merchant states existed are backfilled by the
+# schema migration (python schema.py migrate), which runs this rebuild for
+# every account; until then /analytics/subscriptions returns nothing for them.
+import argparse
+import asyncio
+import datetime
+
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from dedup import DUPLICATE_KEY_ERROR
+from schema import as_float
+
+SUBSCRIPTION_COLLECTION = 'merchant_stats'
+# A payment counts as monthly if it follows the previous one by 28-31 days
+MONTHLY_MIN_DAYS = 28
+MONTHLY_MAX_DAYS = 31
+# Allow for a very small variance in amount (e.g., a few rupees/cents)
+MAX_AMOUNT_STD_DEV = 5.0
+# Rounds of re-reading states that a concurrent upload changed first
+MERGE_MAX_ATTEMPTS = 10
+
+
+def normalize_merchant(description):
+    # Use the first part of the description as a potential merchant
+    return str(description).lower().replace('/', ' ').split(' ')[0]
+
+
+def new_state(merchant):
+    return {
+        'merchant': merchant,
+        'count': 0,
+        'mean': 0.0,
+        'm2': 0.0,
+        'first_date': None,
+        'last_date': None,
+        'interval_days': {},
+        'monthly_intervals': 0,
+    }
+
+
+def add_interval(state, earlier, later):
+    days = (later - earlier).total_seconds() / 86400
+    bucket = str(int(days))
+    state['interval_days'][bucket] = state['interval_days'].get(bucket, 0) + 1
+    if MONTHLY_MIN_DAYS <= days <= MONTHLY_MAX_DAYS:
+        state['monthly_intervals'] += 1
+
+
+# --- Helper function to fold one payment into a state (Welford's update) ---
+def add_payment(state, date, amount):
+    state['count'] += 1
+    delta = amount - state['mean']
+    state['mean'] += delta / state['count']
+    state['m2'] += delta * (amount - state['mean'])
+
+    if state['last_date'] is not None and date >= state['last_date']:
+        add_interval(state, state['last_date'], date)
+    if state['first_date'] is None or date < state['first_date']:
+        state['first_date'] = date
+    if state['last_date'] is None or date > state['last_date']:
+        state['last_date'] = date
+
+
+# --- Helper function to combine two states (Chan et al.'s parallel merge) ---
+def merge_states(earlier, later):
+    if earlier['count'] == 0:
+        return {**later}
+    if later['count'] == 0:
+        return {**earlier}
+
+    count = earlier['count'] + later['count']
+    delta = later['mean'] - earlier['mean']
+    merged = {
+        'merchant': earlier['merchant'],
+        'count': count,
+        'mean': earlier['mean'] + delta * later['count'] / count,
+        'm2': earlier['m2'] + later['m2'] + delta * delta * earlier['count'] * later['count'] / count,
+        'first_date': min(earlier['first_date'], later['first_date']),
+        'last_date': max(earlier['last_date'], later['last_date']),
+        'interval_days': dict(earlier['interval_days']),
+        'monthly_intervals': earlier['monthly_intervals'] + later['monthly_intervals'],
+    }
+    for bucket, hits in later['interval_days'].items():
+        merged['interval_days'][bucket] = merged['interval_days'].get(bucket, 0) + hits
+    # The gap between the two runs of payments
+    if later['first_date'] >= earlier['last_date']:
+        add_interval(merged, earlier['last_date'], later['first_date'])
+    return merged
+
+
+# --- Helper function to merge two partial state maps in date order ---
+# Batches (and upload workers) may see a statement's rows newest first, so
+# whichever state starts earlier is merged as the earlier one
+def combine_partials(first, second):
+    combined = dict(first)
+    for merchant, state in second.items():
+        if merchant not in combined:
+            combined[merchant] = state
+            continue
+        earlier, later = sorted((combined[merchant], state), key=lambda s: s['first_date'] or datetime.datetime.min)
+        combined[merchant] = merge_states(earlier, later)
+    return combined
+
+
+# --- Helper function to build per-merchant states from a batch of records ---
+def batch_states(records):
+    payments = []
+    for record in records:
+        # Running statistics don't need exact amounts
+        amount = as_float(record.get('amt'))
+        date = record.get('date')
+        # Only dated expenses can be subscription payments
+        if amount < 0 and date:
+            payments.append((normalize_merchant(record.get('desc', '')), date, amount))
+
+    states = {}
+    for merchant, date, amount in sorted(payments, key=lambda p: (p[0], p[1])):
+        add_payment(states.setdefault(merchant, new_state(merchant)), date, amount)
+    return states
+
+
+# --- Helper function to merge a batch into the stored states ---
+# Two uploads to the same account may merge into the same states at once.
+# Each write is conditional on the revision the state was read at, and an
+# upsert whose revision no longer matches collides with the unique index,
+# so the merchants that lost the race are read again and merged again.
+async def update_merchant_stats(db, account_id, partials, user_id='placeholder_user'):
+    collection = db[SUBSCRIPTION_COLLECTION]
+    pending = dict(partials)
+    for _ in range(MERGE_MAX_ATTEMPTS):
+        if not pending:
+            return
+        stored = {}
+        async for doc in collection.find({'user_id': user_id, 'account_id': account_id, 'merchant': {'$in': list(pending)}}):
+            stored[doc['merchant']] = doc
+
+        merchants = list(pending)
+        ops = []
+        for merchant in merchants:
+            doc = stored.get(merchant)
+            state = merge_states(doc, pending[merchant]) if doc else pending[merchant]
+            state = {field: state[field] for field in new_state(merchant)}
+            ops.append(UpdateOne(
+                # A missing revision (a new state, or one stored before revisions) matches None
+                {'user_id': user_id, 'account_id': account_id, 'merchant': merchant, 'rev': doc.get('rev') if doc else None},
+                {'$set': {**state, 'rev': ObjectId()}},
+                upsert=True,
+            ))
+        try:
+            await collection.bulk_write(ops, ordered=False)
+            return
+        except BulkWriteError as e:
+            if any(error['code'] != DUPLICATE_KEY_ERROR for error in e.details['writeErrors']):
+                raise
+            lost = {merchants[error['index']] for error in e.details['writeErrors']}
+            pending = {merchant: pending[merchant] for merchant in lost}
+    raise RuntimeError(f"Merchant states for account {account_id} kept changing, {len(pending)} not merged.")
+
+
+# --- Query used by /analytics/subscriptions ---
+def subscriptions_query(account_id):
+    return {
+        'account_id': account_id,
+        'user_id': 'placeholder_user',
+        # Merchants with 2 or more payments, at least one about a month apart
+        'count': {'$gte': 2},
+        'monthly_intervals': {'$gt': 0},
+        # Population std dev <= MAX_AMOUNT_STD_DEV, i.e. m2 / count <= MAX^2
+        '$expr': {'$lte': ['$m2', {'$multiply': ['$count', MAX_AMOUNT_STD_DEV ** 2]}]},
+    }
+
+
+def subscription_summary(state):
+    return {
+        'merchant': state['merchant'],
+        'transaction_count': state['count'],
+        'avg_amount': state['mean'],
+        'last_payment_date': state['last_date'],
+    }
+
+
+# --- Rebuild: recompute every state from the raw transactions ---
+async def rebuild_merchant_stats(db, account_id=None):
+    match = {'uid': 'placeholder_user', 'amt': {'$lt': 0}, 'date': {'$ne': None}}
+    if account_id:
+        match['acct'] = account_id
+    account_ids = [account_id] if account_id else await db['transactions'].distinct('acct', match)
+
+    for account in account_ids:
+        states = {}
+        cursor = db['transactions'].find({**match, 'acct': account}, {'date': 1, 'amt': 1, 'desc': 1}, sort=[('date', 1)])
+        async for doc in cursor:
+            merchant = normalize_merchant(doc.get('desc', ''))
+            add_payment(states.setdefault(merchant, new_state(merchant)), doc['date'], as_float(doc['amt']))
+
+        await db[SUBSCRIPTION_COLLECTION].delete_many({'user_id': 'placeholder_user', 'account_id': account})
+        await update_merchant_stats(db, account, states)
+
+
+async def main():
+    from database import mongo
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('command', choices=['rebuild'])
+    parser.add_argument('--account-id')
+    args = parser.parse_args()
+
+    await mongo.connect()
+    try:
+        await rebuild_merchant_stats(mongo.db, args.account_id)
+        print("Merchant states rebuilt.")
+    finally:
+        await mongo.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,32 @@
+# The backend modules are imported as top-level modules, as the API runs them
+import asyncio
+import os
+import sys
+import uuid
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Tests that need MongoDB run against a scratch database on this server
+TEST_MONGO_URI = os.environ.get("TEST_MONGO_URI")
+
+
+# --- Fixture to run an async scenario against a throwaway database ---
+@pytest.fixture
+def run_with_db():
+    if not TEST_MONGO_URI:
+        pytest.skip("set TEST_MONGO_URI to a local mongod to run the database tests")
+    from pymongo import AsyncMongoClient
+
+    def run(scenario):
+        async def main():
+            client = AsyncMongoClient(TEST_MONGO_URI)
+            db = client[f"test_{uuid.uuid4().hex[:12]}"]
+            try:
+                return await scenario(db)
+            finally:
+                await client.drop_database(db.name)
+                await client.close()
+        return asyncio.run(main())
+    return run
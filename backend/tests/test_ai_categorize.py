@@ -0,0 +1,57 @@
+import random
+
+from ai_categorize import AI_CATEGORIES, AICategorizer
+from benchmarks.bench_ai_categorize import FakeModel, MemoryCollection
+
+MERCHANTS = [f"shop {name}" for name in "abcdefgh"]
+ANSWERS = {merchant: AI_CATEGORIES[i % len(AI_CATEGORIES)] for i, merchant in enumerate(MERCHANTS)}
+
+
+def make_categorizer(collection=None, latency=0.0, **kwargs):
+    model = FakeModel(ANSWERS, latency, failure_rate=0.0, rng=random.Random(1))
+    return AICategorizer(model, collection or MemoryCollection(), backoff=0.0, **kwargs), model
+
+
+def test_known_merchants_are_not_sent_again():
+    categorizer, model = make_categorizer(batch_size=3)
+    found, stats = categorizer.categorize(MERCHANTS)
+    assert found == ANSWERS
+    assert (stats['cache_hits'], stats['cache_misses'], stats['api_calls']) == (0, 8, 3)
+
+    found, stats = categorizer.categorize(MERCHANTS)
+    assert found == ANSWERS
+    assert (stats['cache_hits'], stats['api_calls']) == (8, 0)
+    assert model.calls == 3
+
+
+def test_other_workers_hit_the_shared_table():
+    collection = MemoryCollection()
+    make_categorizer(collection)[0].categorize(MERCHANTS)
+    categorizer, model = make_categorizer(collection)
+    found, stats = categorizer.categorize(MERCHANTS)
+    assert found == ANSWERS
+    assert stats['cache_hits'] == 8
+    assert model.calls == 0
+
+
+def test_memo_keeps_only_the_most_recent_merchants():
+    categorizer, model = make_categorizer(memo_size=3)
+    categorizer.categorize(MERCHANTS[:3])
+    # Using a merchant again keeps it over the older ones
+    categorizer.categorize(MERCHANTS[:1])
+    categorizer.categorize(MERCHANTS[3:5])
+    assert list(categorizer.known) == [MERCHANTS[0], MERCHANTS[3], MERCHANTS[4]]
+
+    # An evicted merchant is read back from the table, not asked again
+    found, stats = categorizer.categorize(MERCHANTS[1:2])
+    assert found == {MERCHANTS[1]: ANSWERS[MERCHANTS[1]]}
+    assert stats['api_calls'] == 0
+    assert len(categorizer.known) == 3
+
+
+def test_model_calls_in_flight_are_capped():
+    categorizer, model = make_categorizer(latency=0.02, batch_size=1, concurrency=2)
+    found, stats = categorizer.categorize(MERCHANTS)
+    assert found == ANSWERS
+    assert stats['api_calls'] == 8
+    assert model.max_in_flight <= 2
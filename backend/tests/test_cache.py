@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+
+from cache import MISSING, LRUCache, RedisCache
+
+
+def make_cache(backend):
+    if backend == "redis":
+        fakeredis = pytest.importorskip("fakeredis")
+        return RedisCache(fakeredis.FakeAsyncRedis(), ttl=60)
+    return LRUCache(max_entries=100, ttl=60)
+
+
+def run(backend, scenario):
+    async def main():
+        cache = make_cache(backend)
+        try:
+            return await scenario(cache)
+        finally:
+            await cache.close()
+    return asyncio.run(main())
+
+
+def counting(value):
+    calls = []
+
+    async def compute():
+        calls.append(value)
+        return value
+    return compute, calls
+
+
+@pytest.mark.parametrize("backend", ["memory", "redis"])
+def test_write_bumps_version_and_next_read_misses(backend):
+    async def scenario(cache):
+        compute, calls = counting({"total": 1})
+        assert await cache.get_or_compute("summary", "a", None, compute) == {"total": 1}
+        assert await cache.get_or_compute("summary", "a", None, compute) == {"total": 1}
+        assert len(calls) == 1
+
+        await cache.bump_version("a")
+        assert await cache.get_version("a") == 1
+        await cache.get_or_compute("summary", "a", None, compute)
+        assert len(calls) == 2
+        return await cache.stats()
+
+    stats = run(backend, scenario)
+    assert (stats["hits"], stats["misses"]) == (1, 2)
+
+
+@pytest.mark.parametrize("backend", ["memory", "redis"])
+def test_other_accounts_keep_their_entries(backend):
+    async def scenario(cache):
+        compute_a, calls_a = counting("a")
+        compute_b, calls_b = counting("b")
+        await cache.get_or_compute("summary", "a", None, compute_a)
+        await cache.get_or_compute("summary", "b", None, compute_b)
+
+        await cache.bump_version("a")
+        await cache.get_or_compute("summary", "a", None, compute_a)
+        await cache.get_or_compute("summary", "b", None, compute_b)
+        assert await cache.get_version("b") == 0
+        return len(calls_a), len(calls_b)
+
+    assert run(backend, scenario) == (2, 1)
+
+
+@pytest.mark.parametrize("backend", ["memory", "redis"])
+def test_params_are_part_of_the_key(backend):
+    async def scenario(cache):
+        compute, calls = counting([])
+        await cache.get_or_compute("timeseries", "a", {"interval": "week", "start": None}, compute)
+        await cache.get_or_compute("timeseries", "a", {"start": None, "interval": "week"}, compute)
+        await cache.get_or_compute("timeseries", "a", {"interval": "month", "start": None}, compute)
+        return len(calls)
+
+    assert run(backend, scenario) == 2
+
+
+def test_lru_evicts_least_recently_used():
+    async def scenario():
+        cache = LRUCache(max_entries=2, ttl=60)
+        await cache.set("one", 1)
+        await cache.set("two", 2)
+        await cache.get("one")
+        await cache.set("three", 3)
+        return [await cache.get(key) for key in ("one", "two", "three")], await cache.evictions()
+
+    values, evictions = asyncio.run(scenario())
+    assert values == [1, MISSING, 3]
+    assert evictions == 1
@@ -0,0 +1,57 @@
+import datetime
+import random
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ingest import infer_date_format, normalize_dates, parse_date
+
+LAYOUTS = {
+    "dd/mm/yyyy": "%d/%m/%Y",
+    "dd-mm-yy": "%d-%m-%y",
+    "dd Mon yyyy": "%d %b %Y",
+    "dd/mm/yyyy hh:mm": "%d/%m/%Y %H:%M",
+    "yyyy-mm-dd": "%Y-%m-%d",
+    "yyyy-mm-dd hh:mm:ss": "%Y-%m-%d %H:%M:%S",
+    "yyyy-mm-ddThh:mm:ss": "%Y-%m-%dT%H:%M:%S",
+    "yyyy/mm/dd": "%Y/%m/%d",
+    "mm/dd/yyyy": "%m/%d/%Y",
+    "trailing comma": "%d/%m/%Y,",
+}
+
+
+def make_dates(layout, rows=500, seed=42):
+    rng = random.Random(seed)
+    start = datetime.datetime(2019, 1, 1)
+    values = [(start + datetime.timedelta(days=rng.randint(0, 5 * 365), minutes=rng.randint(0, 1440))).strftime(LAYOUTS[layout])
+              for _ in range(rows)]
+    # Blanks, missing values and junk, the way real exports have them
+    for i in rng.sample(range(rows), rows // 100):
+        values[i] = rng.choice(["", "  ", np.nan, "not a date", "31/02/2024"])
+    return pd.Series(values, dtype=object)
+
+
+@pytest.mark.parametrize("layout", LAYOUTS)
+def test_normalize_dates_matches_parse_date(layout):
+    dates = make_dates(layout)
+    with warnings.catch_warnings():
+        # pandas warns when dayfirst parsing meets month-first dates
+        warnings.simplefilter("ignore", UserWarning)
+        expected = dates.apply(parse_date)
+        assert normalize_dates(dates).tolist() == expected.tolist()
+
+
+def test_iso_dates_are_year_month_day_and_vectorized():
+    assert parse_date("2024-02-01") == "2024-02-01T00:00:00"
+    assert infer_date_format(["2024-02-01", "2024-03-15"]) == "%Y-%m-%d"
+    # A sample where day and month are equal cannot pick a swapped format
+    assert infer_date_format(["2024-01-01"]) == "%Y-%m-%d"
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        assert normalize_dates(["2024-02-01", "2024-03-15"]).tolist() == ["2024-02-01T00:00:00", "2024-03-15T00:00:00"]
+
+
+def test_retired_profile_format_is_inferred_again():
+    assert normalize_dates(["2024-02-01"], date_format="%Y-%d-%m").tolist() == ["2024-02-01T00:00:00"]
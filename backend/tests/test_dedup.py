@@ -0,0 +1,61 @@
+import numpy as np
+
+import jobs
+from ingest import date_run_starts, iter_upload_batches
+from jobs import plan_parts, read_settings, split_row_ranges
+
+STATEMENT = """Date,Description,Amount
+01/02/2024,UPI/swiggy,-250.00
+01/02/2024,UPI/uber,-120.00
+01/02/2024,UPI/swiggy,-250.00
+02/02/2024,UPI/swiggy,-250.00
+"""
+
+
+def fingerprints(path, **kwargs):
+    return [record['fp'] for batch in iter_upload_batches(str(path), 'acct', **kwargs) for record in batch]
+
+
+def test_identical_rows_in_different_chunks_get_distinct_fingerprints(tmp_path):
+    path = tmp_path / 'statement.csv'
+    path.write_text(STATEMENT)
+    chunked = fingerprints(path, chunk_rows=2)
+    assert len(chunked) == 4
+    assert len(set(chunked)) == 4
+    # Chunk boundaries do not change the fingerprints, so re-uploads still match
+    assert chunked == fingerprints(path, chunk_rows=1000)
+
+
+def test_date_run_starts():
+    assert list(date_run_starts(['a', 'a', 'b', 'c', 'c'])) == [0, 2, 3]
+    # A date that comes back later cannot be split on
+    assert date_run_starts(['a', 'b', 'a']) is None
+    # Blank lines inside or between runs are skipped over
+    assert list(date_run_starts(['a', None, 'a', 'b', None, 'c'])) == [0, 3, 5]
+
+
+def test_split_row_ranges_starts_parts_on_boundaries():
+    ranges = split_row_ranges(10, workers=3, min_rows=2, boundaries=np.array([0, 3, 5, 9]))
+    assert ranges == [(0, 5), (5, 4), (9, None)]
+    # One date covering the whole file stays in one part
+    assert split_row_ranges(10, workers=3, min_rows=2, boundaries=np.array([0])) == [(0, None)]
+
+
+def test_csv_parts_with_blank_lines_cover_every_row_once(tmp_path, monkeypatch):
+    lines = []
+    for i in range(40):
+        if i and i % 10 == 0:
+            lines.append('')
+        # Four rows per date, two of them identical
+        lines.append(f"{i // 4 + 1:02d}/03/2024,UPI/shop{i % 2},-{10 + i % 2}.00")
+    path = tmp_path / 'statement.csv'
+    path.write_text('Date,Description,Amount\n' + '\n'.join(lines) + '\n')
+    monkeypatch.setattr(jobs, 'UPLOAD_WORKERS', 3)
+    monkeypatch.setattr(jobs, 'UPLOAD_SPLIT_ROWS', 5)
+
+    settings, _ = read_settings(str(path))
+    _, ranges = plan_parts(str(path), settings)
+    assert len(ranges) == 3
+    parts = [fingerprints(path, settings=settings, skip_rows=skip_rows, nrows=nrows) for skip_rows, nrows in ranges]
+    assert sum(len(part) for part in parts) == 40
+    assert [fp for part in parts for fp in part] == fingerprints(path, settings=settings)
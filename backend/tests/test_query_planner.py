@@ -0,0 +1,30 @@
+import datetime
+
+import pytest
+
+from query_planner import plan_question
+
+TODAY = datetime.date(2026, 10, 18)
+
+
+@pytest.mark.parametrize("question", [
+    "how much may I spend on groceries",
+    "what in may be left over",
+    "I may not have paid rent",
+])
+def test_month_words_without_date_context(question):
+    plan = plan_question(question, TODAY)
+    assert plan["start_date"] is None
+    assert plan["period"] == "all time"
+
+
+@pytest.mark.parametrize("question, start, end", [
+    ("what did I spend in may", "2026-05-01", "2026-05-31"),
+    ("spent in may 2024", "2024-05-01", "2024-05-31"),
+    ("may 2024 expenses", "2024-05-01", "2024-05-31"),
+    ("spending since jan", "2026-01-01", "2026-10-18"),
+    ("paid for dec on netflix", "2025-12-01", "2025-12-31"),
+])
+def test_month_words_with_date_context(question, start, end):
+    plan = plan_question(question, TODAY)
+    assert (plan["start_date"], plan["end_date"]) == (start, end)
@@ -0,0 +1,36 @@
+import datetime
+import decimal
+
+import bson
+import pyarrow as pa
+import pyarrow.parquet as pq
+from bson.decimal128 import Decimal128
+
+from ingest import iter_upload_batches
+from readers import ParquetReader, sniff_reader
+
+
+def test_typed_parquet_cells_are_stored_as_bson(tmp_path):
+    path = tmp_path / 'statement.parquet'
+    pq.write_table(pa.table({
+        'Date': pa.array([datetime.date(2024, 2, 1), datetime.date(2024, 3, 15)], pa.date32()),
+        'Description': ['UPI/swiggy', 'UPI/uber'],
+        'Amount': pa.array([decimal.Decimal('-250.50'), decimal.Decimal('100.00')], pa.decimal128(10, 2)),
+        'Balance': pa.array([decimal.Decimal('1000.25'), None], pa.decimal128(10, 2)),
+        'Posted': pa.array([datetime.date(2024, 2, 2), datetime.date(2024, 3, 16)], pa.date32()),
+        'Time': pa.array([datetime.time(10, 30), datetime.time(11, 0)], pa.time64('us')),
+        'Tags': pa.array([['food'], []], pa.list_(pa.string())),
+    }), path)
+    assert isinstance(sniff_reader(str(path)), ParquetReader)
+
+    records = [record for batch in iter_upload_batches(str(path), 'acct') for record in batch]
+    assert [record['date'] for record in records] == [datetime.datetime(2024, 2, 1), datetime.datetime(2024, 3, 15)]
+    assert [record['amt'] for record in records] == [Decimal128('-250.5'), Decimal128('100.0')]
+    assert records[0]['raw'] == {
+        'Balance': Decimal128('1000.25'),
+        'Posted': datetime.datetime(2024, 2, 2),
+        'Time': '10:30:00',
+        'Tags': ['food'],
+    }
+    for record in records:
+        bson.encode(record)
@@ -0,0 +1,102 @@
+import datetime
+
+from rollups import ROLLUP_COLLECTION, RECATEGORIZE_PROJECTION, recategorize_many_ops, recategorize_ops, recategorize_transactions, rollup_cells_pipeline
+from rules import apply_rule
+from schema import as_float, to_amount
+
+
+def transaction(account_id, day, amount, description, category, confidence='Low'):
+    return {
+        'uid': 'placeholder_user',
+        'acct': account_id,
+        'date': datetime.datetime(2024, 1 + day // 31, 1 + day % 31) if day is not None else None,
+        'amt': to_amount(amount),
+        'desc': description,
+        'cat': category,
+        'conf': confidence,
+    }
+
+
+TRANSACTIONS = [
+    transaction('a', 3, -250, 'UPI/SWIGGY/4411/lunch', 'Miscellaneous'),
+    transaction('a', 5, -90.5, 'UPI-SWIGGY-8812', 'Miscellaneous', 'Medium'),
+    transaction('a', 40, -120, 'UPI/SWIGGYSTORES/2231', 'Shopping'),
+    transaction('a', None, 5000, 'NEFT salary', 'Income', 'High'),
+    transaction('b', 3, -300, 'UPI/SWIGGY/9001/dinner', 'Miscellaneous'),
+    transaction('b', 35, -75.25, 'UPI/UBER/7761', 'Miscellaneous'),
+]
+
+
+async def seed(db):
+    await db['transactions'].insert_many([dict(doc) for doc in TRANSACTIONS])
+    await db[ROLLUP_COLLECTION].insert_many(await cells(db))
+
+
+async def cells(db):
+    cursor = await db['transactions'].aggregate(rollup_cells_pipeline({'uid': 'placeholder_user'}))
+    return await cursor.to_list()
+
+
+def totals(cells):
+    # Cells a move emptied stay in the rollups with zero counts
+    return {
+        (cell['account_id'], cell['month'], cell['category']):
+            (round(as_float(cell['spending']), 2), round(as_float(cell['income']), 2), cell['count'], cell['spending_count'])
+        for cell in cells if cell['count']
+    }
+
+
+async def rollups_match_transactions(db):
+    rollups = await db[ROLLUP_COLLECTION].find({}, {'_id': 0}).to_list()
+    return totals(rollups) == totals(await cells(db))
+
+
+def test_no_op_moves_have_no_deltas():
+    doc = {**TRANSACTIONS[0], '_id': 1}
+    assert recategorize_ops(doc, doc['cat']) == []
+    # Two moves that cancel out within a cell need no write either
+    swapped = {**TRANSACTIONS[0], '_id': 2, 'cat': 'Food'}
+    assert recategorize_many_ops([doc, swapped], {1: 'Food', 2: 'Miscellaneous'}) == []
+
+
+def test_no_op_move_only_confirms_the_category(run_with_db):
+    async def scenario(db):
+        await seed(db)
+        docs = await db['transactions'].find({'acct': 'b'}, RECATEGORIZE_PROJECTION).to_list()
+        changed = await recategorize_transactions(db, docs, {doc['_id']: doc['cat'] for doc in docs})
+        stored = await db['transactions'].find({'acct': 'b'}).to_list()
+        return len(changed), {(doc['cat'], doc['conf']) for doc in stored}, await rollups_match_transactions(db)
+
+    changed, states, matched = run_with_db(scenario)
+    assert changed == 2
+    assert states == {('Miscellaneous', 'High')}
+    assert matched
+
+
+def test_mixed_account_batch_moves_match_the_cells(run_with_db):
+    async def scenario(db):
+        await seed(db)
+        docs = await db['transactions'].find({}, RECATEGORIZE_PROJECTION).to_list()
+        moves = {doc['_id']: 'Food' if 'SWIGGY' in doc['desc'] else 'Travel' if 'UBER' in doc['desc'] else doc['cat'] for doc in docs}
+        changed = await recategorize_transactions(db, docs, moves)
+        return {doc['desc'] for doc in changed}, await rollups_match_transactions(db)
+
+    changed, matched = run_with_db(scenario)
+    # The salary row is already confirmed in its category, so it is not written
+    assert changed == {doc['desc'] for doc in TRANSACTIONS} - {'NEFT salary'}
+    assert matched
+
+
+def test_rule_only_changes_its_own_account(run_with_db):
+    async def scenario(db):
+        await seed(db)
+        count = await apply_rule(db, 'a', 'swiggy', 'Food')
+        stored = await db['transactions'].find({}, {'_id': 0, 'acct': 1, 'desc': 1, 'cat': 1}).to_list()
+        return count, stored, await rollups_match_transactions(db)
+
+    count, stored, matched = run_with_db(scenario)
+    assert count == 2
+    food = {(doc['acct'], doc['desc']) for doc in stored if doc['cat'] == 'Food'}
+    # Neither the other account's row nor a longer merchant name is matched
+    assert food == {('a', 'UPI/SWIGGY/4411/lunch'), ('a', 'UPI-SWIGGY-8812')}
+    assert matched
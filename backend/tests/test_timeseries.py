@@ -0,0 +1,83 @@
+import asyncio
+import datetime
+
+import pytest
+
+import timeseries
+from timeseries import TooManyBucketsError, bucket_count, bucket_label, bucket_labels, check_bucket_count, columnar
+
+
+class FakeTransactions:
+    """Just enough of a collection for data_date_range: find_one sorted by date."""
+
+    def __init__(self, dates):
+        self.dates = sorted(dates)
+
+    async def find_one(self, match, projection, sort):
+        if not self.dates:
+            return None
+        date = self.dates[0] if sort[0][1] == 1 else self.dates[-1]
+        return {'date': datetime.datetime.combine(date, datetime.time())}
+
+
+def fake_db(*dates):
+    return {'transactions': FakeTransactions(dates)}
+
+
+def test_iso_weeks_at_year_boundaries():
+    # 2020 has 53 ISO weeks; 2024-12-30 already belongs to 2025
+    assert bucket_label(datetime.date(2021, 1, 1), 'week') == '2020-W53'
+    assert bucket_label(datetime.date(2024, 12, 30), 'week') == '2025-W01'
+    assert bucket_label(datetime.date(2024, 3, 9), 'week') == '2024-W10'
+    assert bucket_labels('week', '2020-W52', '2021-W02') == ['2020-W52', '2020-W53', '2021-W01', '2021-W02']
+    assert bucket_labels('week', '2024-W52', '2025-W01') == ['2024-W52', '2025-W01']
+
+
+def test_month_and_day_labels():
+    assert bucket_label(datetime.date(2024, 3, 9), 'month') == '2024-03'
+    assert bucket_label(datetime.date(2024, 3, 9), 'day') == '2024-03-09'
+    assert bucket_labels('month', '2023-11', '2024-02') == ['2023-11', '2023-12', '2024-01', '2024-02']
+    assert bucket_labels('day', '2024-02-28', '2024-03-01') == ['2024-02-28', '2024-02-29', '2024-03-01']
+
+
+def test_bucket_count_matches_labels():
+    for interval, start, end in [('day', '2024-02-28', '2024-03-01'), ('week', '2020-12-31', '2021-01-04'),
+                                 ('month', '2023-11-15', '2024-02-01')]:
+        first = bucket_label(datetime.date.fromisoformat(start), interval)
+        last = bucket_label(datetime.date.fromisoformat(end), interval)
+        assert bucket_count(interval, start, end) == len(bucket_labels(interval, first, last))
+
+
+def test_columnar_fills_empty_buckets():
+    rows = [
+        {'_id': {'bucket': '2020-W53'}, 'spending': 12.5, 'income': 0, 'count': 2},
+        {'_id': {'bucket': '2021-W02'}, 'spending': 0, 'income': 100, 'count': 1},
+    ]
+    series = columnar(rows, 'week', False)
+    assert series == {
+        'buckets': ['2020-W53', '2021-W01', '2021-W02'],
+        'spending': [12.5, 0.0, 0.0],
+        'income': [0.0, 0.0, 100.0],
+        'count': [2, 0, 1],
+    }
+
+
+def test_empty_range_has_no_buckets():
+    assert columnar([], 'month', True) == {'buckets': [], 'spending': [], 'income': [], 'count': [], 'by_category': {}}
+    # Without any matching transactions there is no span to check
+    assert asyncio.run(check_bucket_count(fake_db(), {}, 'day', None, None)) is None
+
+
+def test_too_many_buckets_is_refused(monkeypatch):
+    monkeypatch.setattr(timeseries, 'TIMESERIES_MAX_BUCKETS', 10)
+    asyncio.run(check_bucket_count(fake_db(), {}, 'day', '2024-01-01', '2024-01-10'))
+    with pytest.raises(TooManyBucketsError):
+        asyncio.run(check_bucket_count(fake_db(), {}, 'day', '2024-01-01', '2024-01-11'))
+    # The same span fits in weeks
+    asyncio.run(check_bucket_count(fake_db(), {}, 'week', '2024-01-01', '2024-01-11'))
+
+    # An open-ended range is measured from the data
+    db = fake_db(datetime.date(2023, 1, 1), datetime.date(2024, 6, 30))
+    asyncio.run(check_bucket_count(db, {}, 'month', '2024-01-01', None))
+    with pytest.raises(TooManyBucketsError):
+        asyncio.run(check_bucket_count(db, {}, 'month', None, '2024-06-30'))
@@ -0,0 +1,199 @@
+# timeseries.py
+# Spending and income over time, for the trend charts.
+#
+# A series is one aggregation over one or more accounts, bucketed by day,
+# ISO week or month, optionally split by category. Monthly series over whole
+# months are summed from the rollups; anything else runs over the raw
+# transactions on the (uid, acct, date) index. Buckets are labelled like
+# "2024-03-09", "2024-W10" and "2024-03", and the result is columnar: one
+# array of labels and one array per measure, with empty buckets filled with
+# zeros so the arrays line up with a chart's x axis. A series spanning more
+# than TIMESERIES_MAX_BUCKETS buckets is refused; without both bounds, the
+# span is taken from the oldest and newest matching transactions.
+import datetime
+import os
+
+from rollups import ROLLUP_COLLECTION, UNDATED_MONTH
+from schema import as_float
+
+# Largest number of buckets a single series may span
+TIMESERIES_MAX_BUCKETS = int(os.environ.get("TIMESERIES_MAX_BUCKETS", 3660))
+
+
+
+class TooManyBucketsError(ValueError):
+    pass
+
+
+# $dateToString formats; rollup months use the same "%Y-%m" labels
+BUCKET_FORMATS = {'day': '%Y-%m-%d', 'week': '%G-W%V', 'month': '%Y-%m'}
+
+
+# --- Helpers to label buckets and list every bucket between two labels ---
+def bucket_label(day, interval):
+    if interval == 'week':
+        year, week, _ = day.isocalendar()
+        return f"{year}-W{week:02d}"
+    return day.strftime(BUCKET_FORMATS[interval])
+
+
+def bucket_start(label, interval):
+    if interval == 'day':
+        return datetime.date.fromisoformat(label)
+    if interval == 'week':
+        year, week = label.split('-W')
+        return datetime.date.fromisocalendar(int(year), int(week), 1)
+    return datetime.date.fromisoformat(label + '-01')
+
+
+def next_bucket(day, interval):
+    if interval == 'day':
+        return day + datetime.timedelta(days=1)
+    if interval == 'week':
+        return day + datetime.timedelta(weeks=1)
+    return datetime.date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+def bucket_labels(interval, first, last):
+    labels = []
+    day, end = bucket_start(first, interval), bucket_start(last, interval)
+    while day <= end:
+        labels.append(bucket_label(day, interval))
+        day = next_bucket(day, interval)
+    return labels
+
+
+def bucket_count(interval, start_date, end_date):
+    start = bucket_start(bucket_label(datetime.date.fromisoformat(start_date[:10]), interval), interval)
+    end = datetime.date.fromisoformat(end_date[:10])
+    if interval == 'day':
+        return (end - start).days + 1
+    if interval == 'week':
+        return (end - start).days // 7 + 1
+    return (end.year - start.year) * 12 + end.month - start.month + 1
+
+
+# --- Pipelines: one over the raw transactions, one over the rollups ---
+def timeseries_match(account_ids, base_query):
+    # Transactions without a parseable date belong to no bucket
+    return {**base_query, 'acct': {'$in': account_ids}, 'date': {'$ne': None, **base_query.get('date', {})}}
+
+
+def transactions_timeseries_pipeline(match, interval, by_category):
+    group_id = {'bucket': {'$dateToString': {'format': BUCKET_FORMATS[interval], 'date': '$date'}}}
+    if by_category:
+        group_id['category'] = '$cat'
+    return [
+        {'$match': match},
+        {
+            '$group': {
+                '_id': group_id,
+                'spending': {'$sum': {'$cond': [{'$lt': ['$amt', 0]}, {'$multiply': ['$amt', -1]}, 0]}},
+                'income': {'$sum': {'$cond': [{'$gt': ['$amt', 0]}, '$amt', 0]}},
+                'count': {'$sum': 1},
+            }
+        },
+    ]
+
+
+def rollups_timeseries_pipeline(account_ids, start_date, end_date, by_category):
+    match = {'user_id': 'placeholder_user', 'account_id': {'$in': account_ids}, 'month': {'$ne': UNDATED_MONTH}}
+    if start_date:
+        match['month']['$gte'] = start_date[:7]
+    if end_date:
+        match['month']['$lte'] = end_date[:7]
+    group_id = {'bucket': '$month'}
+    if by_category:
+        group_id['category'] = '$category'
+    return [
+        {'$match': match},
+        {'$group': {'_id': group_id, 'spending': {'$sum': '$spending'}, 'income': {'$sum': '$income'}, 'count': {'$sum': '$count'}}},
+    ]
+
+
+def can_use_rollups(interval, start_date, end_date):
+    # Rollups hold whole calendar months
+    if interval != 'month':
+        return False
+    if start_date and (len(start_date) != 10 or not start_date.endswith('-01')):
+        return False
+    if end_date:
+        if len(end_date) != 10:
+            return False
+        end = datetime.date.fromisoformat(end_date)
+        if next_bucket(end, 'day').day != 1:
+            return False
+    return True
+
+
+# --- Helper function to turn grouped rows into columnar arrays ---
+def columnar(rows, interval, by_category, start_date=None, end_date=None):
+    labels = {row['_id']['bucket'] for row in rows}
+    first = bucket_label(datetime.date.fromisoformat(start_date[:10]), interval) if start_date else min(labels, default=None)
+    last = bucket_label(datetime.date.fromisoformat(end_date[:10]), interval) if end_date else max(labels, default=None)
+    buckets = bucket_labels(interval, first, last) if first and last else []
+    position = {label: i for i, label in enumerate(buckets)}
+
+    series = {'buckets': buckets, 'spending': [0.0] * len(buckets), 'income': [0.0] * len(buckets), 'count': [0] * len(buckets)}
+    categories = {}
+    for row in rows:
+        i = position.get(row['_id']['bucket'])
+        if i is None:
+            continue
+        # Sums of Decimal128 amounts come back as Decimal128
+        spending, income = as_float(row['spending']), as_float(row['income'])
+        series['spending'][i] += spending
+        series['income'][i] += income
+        series['count'][i] += row['count']
+        if by_category:
+            category = categories.setdefault(row['_id']['category'], {'spending': [0.0] * len(buckets), 'income': [0.0] * len(buckets)})
+            category['spending'][i] = round(spending, 2)
+            category['income'][i] = round(income, 2)
+    series['spending'] = [round(value, 2) for value in series['spending']]
+    series['income'] = [round(value, 2) for value in series['income']]
+    if by_category:
+        series['by_category'] = dict(sorted(categories.items()))
+    return series
+
+
+# --- Helper function to find the dates a series actually spans ---
+# Read from the ends of the (uid, acct, date) index, so only two documents are fetched
+async def data_date_range(db, match):
+    oldest = await db['transactions'].find_one(match, {'date': 1}, sort=[('date', 1)])
+    if oldest is None:
+        return None, None
+    newest = await db['transactions'].find_one(match, {'date': 1}, sort=[('date', -1)])
+    return oldest['date'].date().isoformat(), newest['date'].date().isoformat()
+
+
+async def check_bucket_count(db, match, interval, start_date, end_date):
+    first, last = start_date, end_date
+    if not (first and last):
+        oldest, newest = await data_date_range(db, match)
+        if oldest is None:
+            return
+        first, last = first or oldest, last or newest
+    if bucket_count(interval, first, last) > TIMESERIES_MAX_BUCKETS:
+        raise TooManyBucketsError(
+            f"Too many buckets, use a shorter range or a longer interval (at most {TIMESERIES_MAX_BUCKETS}).")
+
+
+# --- Run a series over some accounts ---
+# base_query is the transactions filter for the date range, from main.build_transactions_query.
+# Raises TooManyBucketsError before any grouping if the series would be too long.
+async def run_timeseries(db, account_ids, interval, base_query, start_date=None, end_date=None, by_category=False):
+    match = timeseries_match(account_ids, base_query)
+    await check_bucket_count(db, match, interval, start_date, end_date)
+    if can_use_rollups(interval, start_date, end_date):
+        source = ROLLUP_COLLECTION
+        cursor = await db[ROLLUP_COLLECTION].aggregate(rollups_timeseries_pipeline(account_ids, start_date, end_date, by_category))
+    else:
+        source = 'transactions'
+        cursor = await db['transactions'].aggregate(transactions_timeseries_pipeline(match, interval, by_category))
+    rows = await cursor.to_list()
+    return {
+        'accounts': account_ids,
+        'interval': interval,
+        'source': source,
+        **columnar(rows, interval, by_category, start_date, end_date),
+    }
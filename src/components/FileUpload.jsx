@@ -2,6 +2,19 @@ import React, { useState, useEffect, useRef } from 'react';
 import { UploadCloud } from 'lucide-react';
 import axios from 'axios';
 
+// Poll an upload job until the backend has finished processing it
+const UPLOAD_POLL_INTERVAL_MS = 1000;
+
+async function waitForUploadJob(jobId) {
+  while (true) {
+    const response = await axios.get(`http://127.0.0.1:8000/uploads/${jobId}`);
+    if (response.data.status === 'done' || response.data.status === 'failed') {
+      return response.data;
+    }
+    await new Promise((resolve) => setTimeout(resolve, UPLOAD_POLL_INTERVAL_MS));
+  }
+}
+
 function FileUpload({onUploadSuccess, accounts = []}) {
   // Add state for the selected account
   const [selectedAccount, setSelectedAccount] = useState('');
@@ -38,6 +51,16 @@ function FileUpload({onUploadSuccess, accounts = []}) {
 
       // Log the server's response to the console to confirm success
       console.log('File uploaded successfully:', response.data);
+
+      // The file is processed in the background; wait for its job to finish
+      const jobId = response.data.job_id;
+      if (jobId) {
+        const job = await waitForUploadJob(jobId);
+        console.log('Upload job finished:', job);
+        if (job.status === 'failed') {
+          alert(`Upload failed: ${job.errors.join(', ')}`);
+        }
+      }
       onUploadSuccess(selectedAccount);
 
       // Clear the file input to allow subsequent uploads
@@ -89,13 +112,13 @@ function FileUpload({onUploadSuccess, accounts = []}) {
             <p className="mb-2 text-sm text-gray-500 group-hover:text-blue-500">
               <span className="font-semibold">Click to upload</span> or drag and drop
             </p>
-            <p className="text-xs text-gray-500">CSV, TXT, or other statement files</p>
+            <p className="text-xs text-gray-500">CSV, Excel, Parquet or Arrow statement files</p>
           </div>
           <input 
             ref={fileInputRef}
             id="csv-upload" 
             type="file" 
-            accept=".csv"
+            accept=".csv,.xlsx,.parquet,.arrow,.feather"
             onChange={handleFileChange} 
             className="hidden" 
           />